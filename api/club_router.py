@@ -1,42 +1,150 @@
 # api/club_router.py
+import os
+import re
+import csv
+import gzip
 import json
-from fastapi import APIRouter, HTTPException, Query
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pathlib import Path
-
-CLUB_CACHE: dict[str, dict] = {}
+from src.lazy_resource import LazyResource
+from src.single_flight import SingleFlight
 
 # Path to local JSON files
 CLUB_DATA_DIR = Path(__file__).resolve().parent.parent / "lovable_website" / "src" / "data" / "clubs"
+# FPL team tables, their names ("Man City", "Spurs") and codes ("MCI") are accepted as club aliases
+TEAM_TABLES = [Path(__file__).resolve().parent.parent / "data_artifacts" / name for name in ("teams25.csv", "teams24.csv")]
+
+# clubs kept encoded in memory, least recently requested evicted first
+CLUB_CACHE_SIZE = int(os.environ.get("CLUB_CACHE_SIZE", 32))
+
+
+@dataclass(frozen=True)
+class ClubPayload:
+    body: bytes
+    gzipped: bytes
+    etag: str
+    # the gzipped bytes are another representation, so they carry their own strong tag
+    etag_gzip: str
+
+
+CLUB_CACHE: "OrderedDict[str, ClubPayload]" = OrderedDict()
+_CLUB_CACHE_LOCK = threading.Lock()
+_CLUB_LOADS = SingleFlight()
 
 router = APIRouter(prefix="/api/v1")
 
-def preload_club_data():
-    global CLUB_CACHE
-    CLUB_CACHE = {}
 
+# accepts any spelling of a club name, returns its lookup key ("Brighton & Hove Albion" -> "brightonhovealbion")
+def club_key(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+# accepts an alias key and the club file stems, returns the one stem it names (None if none or several)
+def _match_stem(key: str, stems: list[str]) -> str | None:
+    if key in stems:
+        return key
+    # "westhamunited" -> westham, "afcbournemouth" -> bournemouth, "ipswich" -> ipswichtown
+    matches = [stem for stem in stems if stem in key or key in stem]
+    return matches[0] if len(matches) == 1 else None
+
+
+# returns {alias key: file stem} for every club file: the stems themselves plus the names and codes of the team tables
+# (teams25.csv also carries the full name, which is what ties "Man City" or "Spurs" to its file)
+def build_club_alias_index() -> dict[str, str]:
     if not CLUB_DATA_DIR.exists():
         raise RuntimeError(f"Club data directory not found: {CLUB_DATA_DIR}")
+    stems = sorted(file.stem for file in CLUB_DATA_DIR.glob("*.json"))
+    aliases = {stem: stem for stem in stems}
+
+    full_names: dict[str, str] = {}
+    for table in TEAM_TABLES:
+        if not table.exists():
+            continue
+        with open(table, "r", encoding="utf-8") as f:
+            for team in csv.DictReader(f):
+                if team.get("fotmob_name"):
+                    full_names[team["code"]] = team["fotmob_name"]
+                candidates = [full_names.get(team["code"]), team["name"]]
+                stem = next((s for s in (_match_stem(club_key(c), stems) for c in candidates if c) if s), None)
+                if stem is None:
+                    continue
+                for alias in (team["name"], team["short_name"], full_names.get(team["code"])):
+                    if alias:
+                        aliases.setdefault(club_key(alias), stem)
+    return aliases
 
-    for file in CLUB_DATA_DIR.glob("*.json"):
+
+_ALIAS_RESOURCE = LazyResource("club_aliases", build_club_alias_index)
+
+
+# accepts a club name, returns the file stem it resolves to (None for an unknown club)
+def resolve_club(club: str) -> str | None:
+    aliases = _ALIAS_RESOURCE.get()
+    key = club_key(club)
+    if key in aliases:
+        return aliases[key]
+    # unambiguous prefix of a file stem or alias ("Tottenham", "Leicester")
+    return _match_stem(key, sorted(set(aliases.values())))
+
+
+def _encode_club(stem: str) -> ClubPayload:
+    with open(CLUB_DATA_DIR / f"{stem}.json", "r", encoding="utf-8") as f:
+        data = json.load(f)
+    # the same bytes JSONResponse would produce for the parsed file
+    body = json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return ClubPayload(body=body, gzipped=gzip.compress(body, compresslevel=9, mtime=0),
+                       etag=f'"{digest}"', etag_gzip=f'"{digest}-gz"')
+
+
+# accepts a file stem, returns its encoded payload: from the LRU, or read once (concurrent misses share the read)
+def get_club_payload(stem: str) -> ClubPayload:
+    with _CLUB_CACHE_LOCK:
+        payload = CLUB_CACHE.get(stem)
+        if payload is not None:
+            CLUB_CACHE.move_to_end(stem)
+            return payload
+
+    payload = _CLUB_LOADS.do(stem, lambda: _encode_club(stem))
+    with _CLUB_CACHE_LOCK:
+        CLUB_CACHE[stem] = payload
+        CLUB_CACHE.move_to_end(stem)
+        while len(CLUB_CACHE) > CLUB_CACHE_SIZE:
+            CLUB_CACHE.popitem(last=False)
+    return payload
+
+
+def preload_club_data():
+    # optional warm-up, clubs are otherwise loaded on first request
+    for stem in sorted(set(_ALIAS_RESOURCE.get().values()))[:CLUB_CACHE_SIZE]:
         try:
-            with open(file, "r", encoding="utf-8") as f:
-                CLUB_CACHE[file.stem] = json.load(f)
+            get_club_payload(stem)
         except Exception as e:
-            print(f"⚠️ Failed to load {file.name}: {e}")
+            print(f"⚠️ Failed to load {stem}.json: {e}")
 
-def load_local_club_file(club: str):
-    key = club.lower().replace(" ", "").replace("&", "")
-    if key not in CLUB_CACHE:
+def load_local_club_file(club: str) -> ClubPayload:
+    try:
+        stem = resolve_club(club)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if stem is None:
         raise HTTPException(
             status_code=404,
             detail=f"No local data found for club: {club}"
         )
-    return CLUB_CACHE[key]
+    try:
+        return get_club_payload(stem)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load {stem}.json: {e}")
 
 
 
 @router.get("/club")
-def get_club(club: str = Query(..., description="Club name")):
+def get_club(request: Request, club: str = Query(..., description="Club name")):
     """
     Returns the EXACT full JSON file content for the club.
     No extra fields, just the keys and values from the JSON file.
@@ -46,8 +154,17 @@ def get_club(club: str = Query(..., description="Club name")):
 
     club_clean = club.strip()
 
-    # Load the JSON file
-    data = load_local_club_file(club_clean)
+    # Load the (pre-encoded) JSON file
+    payload = load_local_club_file(club_clean)
+
+    gzipped = "gzip" in request.headers.get("accept-encoding", "").lower()
+    headers = {"ETag": payload.etag_gzip if gzipped else payload.etag, "Vary": "Accept-Encoding",
+               "Cache-Control": "public, max-age=3600"}
+    # either tag names the same content: a cached copy in one encoding is still fresh in the other
+    if {payload.etag, payload.etag_gzip} & {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}:
+        return Response(status_code=304, headers=headers)
+    if gzipped:
+        return Response(payload.gzipped, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
 
     # Return exactly the JSON contents
-    return data
+    return Response(payload.body, media_type="application/json", headers=headers)
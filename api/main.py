@@ -1,19 +1,20 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from datetime import date
 
 from .stats_router import router as stats_router
 from .stats_router import ensure_stats_loaded
 from .club_router import router as club_router
 from .club_router import preload_club_data
 
-from src.live_feature_calculation import (
-    load_data_once,
-    load_model_once,
-    get_all_teams,
-    predict_match
-)
+from src.lazy_resource import LazyModule, resource_metrics
+
+# pandas / sklearn / xgboost come in with these, on the first request that needs them rather than at
+# startup, so /health and / answer as soon as the process is up (the service scales to zero)
+live_feature_calculation = LazyModule("src.live_feature_calculation")
+season_simulation = LazyModule("src.season_simulation")
 
 app = FastAPI(
     title="Football Prediction API",
@@ -37,11 +38,18 @@ app.include_router(stats_router)
 class MatchRequest(BaseModel):
     home_team: str
     away_team: str
+    # point-in-time prediction: both teams as they were before this date
+    as_of: Optional[date] = None
+
+
+class ScorelineRequest(MatchRequest):
+    top_n: int = 10
 
 
 @app.on_event("startup")
 async def startup_event():
     print("Initializing backend...")
+    # nothing is loaded here: the registry watcher starts with the first model load (see _load_models)
 
 @app.get("/health")
 async def health_check():
@@ -53,17 +61,77 @@ async def root():
     return {"message": "API is running. Visit /docs"}
 
 
+@app.get("/api/v1/model/version")
+def model_version():
+    manifest = live_feature_calculation.ACTIVE_MANIFEST
+    return {
+        "version": live_feature_calculation.ACTIVE_VERSION,
+        "created_at": manifest.get("created_at"),
+        "feature_list_hash": manifest.get("feature_list_hash"),
+        "training_metadata": manifest.get("training_metadata", {}),
+    }
+
+
+@app.get("/api/v1/metrics")
+async def metrics():
+    # never the reason the prediction module gets imported
+    live_loaded = live_feature_calculation.loaded
+    return {
+        "prediction_single_flight": live_feature_calculation.PREDICTION_FLIGHT.metrics() if live_loaded else None,
+        "prediction_batching": live_feature_calculation.PREDICTION_BATCHER.metrics() if live_loaded else None,
+        "matrix_single_flight": live_feature_calculation.MATRIX_FLIGHT.metrics() if live_loaded else None,
+        "lazy_resources": resource_metrics(),
+    }
+
+
 @app.get("/api/v1/teams", response_model=List[str])
-async def teams():
+def teams():
     print("Loading Data...")
-    load_data_once()
-    return get_all_teams()
+    live_feature_calculation.load_data_once()
+    return live_feature_calculation.get_all_teams()
 
 
 @app.post("/api/v1/predict")
-async def predict(req: MatchRequest):
+def predict(req: MatchRequest):
+    # sync endpoint: runs on the worker threadpool, so identical concurrent requests can be coalesced
     print("Loading Data...")
-    load_data_once()
+    live_feature_calculation.load_data_once()
     print("Loading Models...")
-    load_model_once()
-    return predict_match(req.home_team, req.away_team)
\ No newline at end of file
+    live_feature_calculation.load_model_once()
+    try:
+        return live_feature_calculation.predict_match(req.home_team, req.away_team, as_of=req.as_of)
+    except ValueError as e:
+        # unknown team, or no matches played before as_of
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.post("/api/v1/predict/scorelines")
+def predict_scoreline_markets(req: ScorelineRequest):
+    if not 1 <= req.top_n <= 121:
+        raise HTTPException(status_code=422, detail="top_n must be between 1 and 121")
+    # loaded outside the try: a broken artifact (FeaturePlanError is a ValueError) is a 500, not an unknown team
+    live_feature_calculation.load_data_once()
+    live_feature_calculation.load_model_once()
+    try:
+        return live_feature_calculation.predict_scorelines(req.home_team, req.away_team, top_n=req.top_n, as_of=req.as_of)
+    except ValueError as e:
+        # unknown team, or no matches played before as_of
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/api/v1/predict/matrix")
+def prediction_matrix():
+    # cached per model version (and day)
+    return live_feature_calculation.predict_matrix()
+
+
+@app.get("/api/v1/simulation/season")
+def season_simulation_results(
+    n_sims: Optional[int] = Query(None, ge=1000, le=1_000_000, description="Defaults to 100,000"),
+    seed: Optional[int] = Query(None, description="Defaults to 42")
+):
+    # the defaults live in src/season_simulation.py, which is not imported until a simulation is requested
+    n_sims = season_simulation.DEFAULT_SIMULATIONS if n_sims is None else n_sims
+    seed = season_simulation.DEFAULT_SEED if seed is None else seed
+    # cached per (model version, n_sims, seed)
+    return season_simulation.simulate_season(n_sims=n_sims, seed=seed)
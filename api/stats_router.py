@@ -1,46 +1,86 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict
-import numpy as np
-import pandas as pd
-from src.stats_data_loader import (
-    load_all_data,
-    prepare_master_data,
-    prepare_players_match_data
-)
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Optional, TYPE_CHECKING
+from src.lazy_resource import LazyModule, LazyResource
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from src.player_index import PlayerSeasonIndex
+
+# the loaders and indexes (and pandas with them) are imported with the first stats request, not at startup
+np = LazyModule("numpy")
+stats_data_loader = LazyModule("src.stats_data_loader")
+player_index = LazyModule("src.player_index")
+team_timeline_module = LazyModule("src.team_timeline")
+h2h_index = LazyModule("src.h2h_index")
+bulk_export = LazyModule("src.bulk_export")
+stats_projection = LazyModule("src.stats_projection")
+frame_json = LazyModule("src.frame_json")
 
 router = APIRouter(
     prefix="/api/v1/stats",
     tags=["Match Statistics"]
 )
-STATS_MASTER: pd.DataFrame | None = None
-STATS_MASTER_BASIC: pd.DataFrame | None = None
-STATS_MASTER_ROLLING: pd.DataFrame | None = None
-PLAYERS_MATCHES_24: pd.DataFrame | None = None
-PLAYERS_MATCHES_25: pd.DataFrame | None = None
+STATS_MASTER: "pd.DataFrame | None" = None
+STATS_MASTER_BASIC: "pd.DataFrame | None" = None
+STATS_MASTER_ROLLING: "pd.DataFrame | None" = None
+PLAYERS_MATCHES_24: "pd.DataFrame | None" = None
+PLAYERS_MATCHES_25: "pd.DataFrame | None" = None
 STATS : List | None = None
+# season -> player search / leaderboard indexes, built with the player frames
+PLAYER_INDEX: "Dict[int, PlayerSeasonIndex] | None" = None
+# lower-cased team -> columnar match series of the team, built with the stats master
+TEAM_TIMELINES: "Dict[str, Dict[str, np.ndarray]] | None" = None
+# MatchUp -> chronological meetings over the full history (h2h_index.pkl, written by the pipeline)
+H2H_INDEX: Dict | None = None
 
 
-def ensure_stats_loaded():
-    global STATS_MASTER, STATS_MASTER_BASIC, STATS_MASTER_ROLLING, STATS, PLAYERS_MATCHES_24, PLAYERS_MATCHES_25
-    if STATS_MASTER is not None:
-        return
-    try:
-        raw = load_all_data()
-        STATS_MASTER, STATS_MASTER_BASIC, STATS_MASTER_ROLLING, STATS = prepare_master_data(
-            raw["master"],
-            raw["teams_matches"]
-        )
+def _load_stats():
+    global STATS_MASTER, STATS_MASTER_BASIC, STATS_MASTER_ROLLING, STATS, PLAYERS_MATCHES_24, PLAYERS_MATCHES_25, PLAYER_INDEX, TEAM_TIMELINES, H2H_INDEX
+    raw = stats_data_loader.load_all_data()
+    stats_master, stats_master_basic, stats_master_rolling, stats = stats_data_loader.prepare_master_data(
+        raw["master"],
+        raw["teams_matches"]
+    )
 
-        PLAYERS_MATCHES_24, PLAYERS_MATCHES_25 = prepare_players_match_data(
-            raw["pms_24"],
-            raw["pms_25"],
-            raw["players_24"],
-            raw["players_25"],
-            raw["teams_24"],
-            raw["teams_25"]
-        )
+    # match Elos are not part of the stats master, they are joined in for the timelines only
+    elo_cols = [c for c in ("ht_match_elo", "at_match_elo") if c in raw["master"].columns]
+    timelines = team_timeline_module.build_team_timelines(stats_master, raw["master"][elo_cols])
+
+    # without the persisted index, fall back to the seasons of the stats master
+    h2h = h2h_index.load_h2h_index(str(stats_data_loader.DATA_DIR / h2h_index.H2H_INDEX_FILE)) or h2h_index.build_h2h_index(stats_master)
 
+    players_matches_24, players_matches_25 = stats_data_loader.prepare_players_match_data(
+        raw["pms_24"],
+        raw["pms_25"],
+        raw["players_24"],
+        raw["players_25"],
+        raw["teams_24"],
+        raw["teams_25"]
+    )
 
+    # season totals come from every match played, PLAYERS_MATCHES_* only holds the goal contributions
+    indexes = {
+        2024: player_index.build_player_index(
+            stats_data_loader.prepare_player_season_rows(raw["pms_24"], raw["players_24"], raw["teams_24"], by_gameweek=False), 2024),
+        2025: player_index.build_player_index(
+            stats_data_loader.prepare_player_season_rows(raw["pms_25"], raw["players_25"], raw["teams_25"], by_gameweek=True), 2025)
+    }
+
+    # published together once everything is built, a request never sees a partly loaded set
+    STATS_MASTER, STATS_MASTER_BASIC, STATS_MASTER_ROLLING, STATS = stats_master, stats_master_basic, stats_master_rolling, stats
+    TEAM_TIMELINES = {team.lower(): timeline for team, timeline in timelines.items()}
+    H2H_INDEX = h2h
+    PLAYERS_MATCHES_24, PLAYERS_MATCHES_25 = players_matches_24, players_matches_25
+    PLAYER_INDEX = indexes
+
+
+_STATS_RESOURCE = LazyResource('stats_data', _load_stats)
+
+
+def ensure_stats_loaded():
+    try:
+        _STATS_RESOURCE.get()
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -60,28 +100,55 @@ def stats_health():
         "players_2025_rows": int(len(PLAYERS_MATCHES_25))
     }
 
+MATCH_LIST_FIELDS = "match_id,HomeTeam,AwayTeam,FTHG,FTAG"
+
+
+def _page(df, rows, fields: Optional[str], cursor: int, limit: Optional[int]) -> Response:
+    try:
+        page, next_cursor = stats_projection.project_page(df, rows, fields, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # the body stays a plain list, paging information travels in headers
+    headers = {"X-Total-Count": str(len(rows))}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+    return frame_json.DataFrameJSONResponse(page, headers=headers)
+
+
 @router.get("/matches")
-def get_matches(season: int, gameweek: int):
+def get_matches(
+    season: int,
+    gameweek: int,
+    fields: Optional[str] = Query(None, description="Comma separated columns, defaults to match_id,HomeTeam,AwayTeam,FTHG,FTAG"),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: int = Query(0, ge=0)
+):
     ensure_stats_loaded()
 
-    df = STATS_MASTER[
-        (STATS_MASTER["season"] == season) &
-        (STATS_MASTER["gameweek"] == gameweek)
-    ]
+    rows = np.flatnonzero(
+        (STATS_MASTER["season"].to_numpy() == season) &
+        (STATS_MASTER["gameweek"].to_numpy() == gameweek)
+    )
 
-    if df.empty:
+    if len(rows) == 0:
         raise HTTPException(
             status_code=404,
             detail="No matches found for given season and gameweek"
         )
 
-    return df[[
-        "match_id",
-        "HomeTeam",
-        "AwayTeam",
-        "FTHG",
-        "FTAG"
-    ]].to_dict(orient="records")
+    return _page(STATS_MASTER, rows, stats_projection.normalize_fields(fields) or MATCH_LIST_FIELDS, cursor, limit)
+
+
+def _match_row(season: int, gameweek: int, home: str, away: str) -> int:
+    rows = np.flatnonzero(
+        (STATS_MASTER["season"].to_numpy() == season) &
+        (STATS_MASTER["gameweek"].to_numpy() == gameweek) &
+        (STATS_MASTER["HomeTeam"].to_numpy() == home) &
+        (STATS_MASTER["AwayTeam"].to_numpy() == away)
+    )
+    if len(rows) == 0:
+        raise HTTPException(status_code=404, detail="Match not found")
+    return int(rows[0])
 
 
 @router.get("/match/basic")
@@ -89,21 +156,15 @@ def get_basic_match_stats(
     season: int,
     gameweek: int,
     home: str,
-    away: str
+    away: str,
+    fields: Optional[str] = Query(None, description="Comma separated columns, defaults to all")
 ):
     ensure_stats_loaded()
-
-    row = STATS_MASTER[
-        (STATS_MASTER["season"] == season) &
-        (STATS_MASTER["gameweek"] == gameweek) &
-        (STATS_MASTER["HomeTeam"] == home) &
-        (STATS_MASTER["AwayTeam"] == away)
-    ]
-
-    if row.empty:
-        raise HTTPException(status_code=404, detail="Match not found")
-    
-    return row.iloc[0].to_dict()
+    row = _match_row(season, gameweek, home, away)
+    try:
+        return frame_json.DataFrameJSONResponse(stats_projection.project_row(STATS_MASTER, row, fields), single_row=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 def resolve_match_id(
     season: int,
@@ -111,22 +172,17 @@ def resolve_match_id(
     home: str,
     away: str
 ) -> str:
-    row = STATS_MASTER[
-        (STATS_MASTER["season"] == season) &
-        (STATS_MASTER["gameweek"] == gameweek) &
-        (STATS_MASTER["HomeTeam"] == home) &
-        (STATS_MASTER["AwayTeam"] == away)
-    ]
-    if row.empty:
-        raise HTTPException(status_code=404, detail="Match not found")
-    return str(row.iloc[0]["match_id"])
+    return str(STATS_MASTER["match_id"].iat[_match_row(season, gameweek, home, away)])
 
 @router.get("/players")
 def get_player_stats(
     season: int,
     gameweek: int,
     home: str,
-    away: str
+    away: str,
+    fields: Optional[str] = Query(None, description="Comma separated columns, defaults to all"),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: int = Query(0, ge=0)
 ):
     ensure_stats_loaded()
     match_id = resolve_match_id(season, gameweek, home, away)
@@ -136,11 +192,132 @@ def get_player_stats(
         df = PLAYERS_MATCHES_25
     else:
         raise HTTPException(status_code=400, detail="Invalid season")
-    players = df[df["match_id"] == match_id]
-    if players.empty:
+    rows = np.flatnonzero(df["match_id"].to_numpy() == match_id)
+    if len(rows) == 0:
         raise HTTPException(
             status_code=404,
             detail="No player data found for this match"
         )
-    return players.to_dict(orient="records")
+    return _page(df, rows, fields, cursor, limit)
+
+
+def get_player_index(season: int) -> "PlayerSeasonIndex":
+    if season not in PLAYER_INDEX:
+        raise HTTPException(status_code=400, detail="Invalid season")
+    return PLAYER_INDEX[season]
+
+@router.get("/players/search")
+def player_search(
+    q: str = Query(..., min_length=1),
+    season: int = 2025,
+    limit: int = Query(10, ge=1, le=100)
+):
+    ensure_stats_loaded()
+    # prefix of the full name or the surname, case and accent insensitive
+    return player_index.search_players(get_player_index(season), q, limit)
+
+@router.get("/players/leaderboard")
+def player_leaderboard_stats(
+    season: int = 2025,
+    stat: str = "goals",
+    gw_from: int = Query(1, ge=1),
+    gw_to: Optional[int] = Query(None, ge=1),
+    club: Optional[str] = None,
+    position: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200)
+):
+    ensure_stats_loaded()
+    if stat not in player_index.LEADERBOARD_STATS:
+        raise HTTPException(status_code=400, detail=f"stat must be one of {player_index.LEADERBOARD_STATS}")
+    index = get_player_index(season)
+    if club is not None and club.lower() not in index.club_partitions:
+        raise HTTPException(status_code=404, detail="Club not found")
+    return player_index.player_leaderboard(index, stat, gw_from, gw_to, club, position, limit)
+
+@router.get("/team/{team}/timeline")
+def team_timeline(
+    team: str,
+    season: Optional[int] = None,
+    fields: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=2)
+):
+    ensure_stats_loaded()
+    timeline = TEAM_TIMELINES.get(team.lower())
+    if timeline is None:
+        raise HTTPException(status_code=404, detail="Team not found")
+
+    selected = None
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in team_timeline_module.TIMELINE_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}, expected any of {list(team_timeline_module.TIMELINE_FIELDS)}")
+
+    series = team_timeline_module.slice_timeline(timeline, season, selected, max_points)
+    if season is not None and not series["date"]:
+        raise HTTPException(status_code=404, detail="No matches found for given season")
+    return {
+        "team": team,
+        "points": len(series["date"]),
+        "series": series
+    }
+
+@router.get("/h2h")
+def head_to_head_stats(
+    team_a: str,
+    team_b: str,
+    last_n: int = Query(5, ge=0, le=100),
+    since_season: Optional[int] = None
+):
+    ensure_stats_loaded()
+    if team_a.lower() == team_b.lower():
+        raise HTTPException(status_code=400, detail="team_a and team_b must differ")
+    h2h = h2h_index.head_to_head(H2H_INDEX, team_a, team_b, last_n, since_season)
+    if h2h is None:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return h2h
+
+
+@router.get("/export/{dataset}")
+def export_stats(
+    dataset: str,
+    request: Request,
+    season: int,
+    gw_from: int = Query(1, ge=1),
+    gw_to: int = Query(38, ge=1),
+    format: Optional[str] = Query(None, description="ndjson, csv or arrow; defaults to the Accept header, then ndjson")
+):
+    """
+    Streams a season (or gameweek range) of match rows (dataset=matches) or player match rows
+    (dataset=players) in one response, chunk by chunk.
+    """
+    ensure_stats_loaded()
+    try:
+        fmt = bulk_export.negotiate_export_format(format, request.headers.get("accept"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if fmt == "arrow" and not bulk_export.arrow_available():
+        raise HTTPException(status_code=406, detail="Arrow export needs pyarrow, use format=ndjson or csv")
+    if gw_from > gw_to:
+        raise HTTPException(status_code=400, detail="gw_from must not be after gw_to")
+
+    if dataset == "matches":
+        df = STATS_MASTER
+        rows = bulk_export.select_export_rows(df, season, gw_from, gw_to)
+    elif dataset == "players":
+        if season == 2024:
+            df = PLAYERS_MATCHES_24
+        elif season == 2025:
+            df = PLAYERS_MATCHES_25
+        else:
+            raise HTTPException(status_code=400, detail="Invalid season")
+        rows = bulk_export.select_export_rows(df, None, gw_from, gw_to)
+    else:
+        raise HTTPException(status_code=404, detail="dataset must be matches or players")
 
+    filename = f"{dataset}_{season}_gw{gw_from}-{gw_to}.{fmt}"
+    return StreamingResponse(
+        bulk_export.stream_export(df, rows, fmt),
+        media_type=bulk_export.EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Row-Count": str(len(rows))}
+    )
@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+import joblib
+
+# -----------------------------
+# Registry Layout
+# -----------------------------
+# model_registry/
+#   CURRENT                       <- version id of the live artifacts (replaced atomically)
+#   versions/<version_id>/        <- immutable once published
+#       manifest.json             <- feature list hash, training metadata, file checksums
+#       xgb_model1.joblib, rfr_home1.joblib, rfr_away1.joblib, scaler1.joblib,
+#       master_data_transformed.pkl, final_features.pkl
+REGISTRY_DIR = 'model_registry'
+VERSIONS_DIR = 'versions'
+CURRENT_POINTER = 'CURRENT'
+MANIFEST = 'manifest.json'
+
+MODEL_FILES = {
+    'classification_model': 'xgb_model1.joblib',
+    'regression_home_model': 'rfr_home1.joblib',
+    'regression_away_model': 'rfr_away1.joblib',
+    'scaler': 'scaler1.joblib',
+}
+MASTER_DATA_FILE = 'master_data_transformed.pkl'
+FEATURES_FILE = 'final_features.pkl'
+
+REGISTRY_POLL_SECONDS = 60
+
+
+class RegistryError(Exception):
+    pass
+
+
+def feature_list_hash(features: List[str]) -> str:
+    return hashlib.sha256('\n'.join(features).encode('utf-8')).hexdigest()
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, text: str):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# -----------------------------
+# Publishing (training side)
+# -----------------------------
+# accepts the artifacts to publish as {file name: python object}, the final feature list and the training metadata
+# writes them into a staging folder, renames it into place and only then moves the CURRENT pointer
+# returns the new version id
+def publish_version(artifacts: Dict[str, Any], features: List[str], training_metadata: Optional[Dict[str, Any]] = None,
+                    registry_dir: str = REGISTRY_DIR, make_current: bool = True) -> str:
+    versions_dir = os.path.join(registry_dir, VERSIONS_DIR)
+    os.makedirs(versions_dir, exist_ok=True)
+
+    version = time.strftime('%Y%m%d-%H%M%S')
+    suffix = 1
+    while os.path.exists(os.path.join(versions_dir, version)):
+        version = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+        suffix += 1
+
+    staging_dir = os.path.join(versions_dir, f".staging-{version}")
+    os.makedirs(staging_dir)
+    try:
+        artifacts = {**artifacts, FEATURES_FILE: list(features)}
+        files = {}
+        for file_name, obj in artifacts.items():
+            path = os.path.join(staging_dir, file_name)
+            joblib.dump(obj, path)
+            files[file_name] = {'sha256': _file_sha256(path), 'bytes': os.path.getsize(path)}
+
+        manifest = {
+            'version': version,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'feature_list_hash': feature_list_hash(list(features)),
+            'n_features': len(features),
+            'training_metadata': training_metadata or {},
+            'files': files,
+        }
+        with open(os.path.join(staging_dir, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        os.rename(staging_dir, os.path.join(versions_dir, version))
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    if make_current:
+        set_current_version(version, registry_dir)
+    return version
+
+
+# accepts a published version id, points CURRENT at it (readers see either the old or the new id, never a partial write)
+def set_current_version(version: str, registry_dir: str = REGISTRY_DIR):
+    if not os.path.isfile(os.path.join(registry_dir, VERSIONS_DIR, version, MANIFEST)):
+        raise RegistryError(f"Version {version} is not published in {registry_dir}.")
+    _write_atomic(os.path.join(registry_dir, CURRENT_POINTER), version + '\n')
+
+
+def list_versions(registry_dir: str = REGISTRY_DIR) -> List[str]:
+    versions_dir = os.path.join(registry_dir, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(v for v in os.listdir(versions_dir) if not v.startswith('.'))
+
+
+# -----------------------------
+# Loading (serving side)
+# -----------------------------
+def read_current_version(registry_dir: str = REGISTRY_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(registry_dir, CURRENT_POINTER)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+# accepts a version id, verifies every file against the manifest and loads it
+# returns {'version', 'manifest', 'models', 'master_df', 'features'}
+def load_version(version: str, registry_dir: str = REGISTRY_DIR) -> Dict[str, Any]:
+    version_dir = os.path.join(registry_dir, VERSIONS_DIR, version)
+    manifest_path = os.path.join(version_dir, MANIFEST)
+    if not os.path.isfile(manifest_path):
+        raise RegistryError(f"Version {version} has no manifest.")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    loaded = {}
+    for file_name, meta in manifest['files'].items():
+        path = os.path.join(version_dir, file_name)
+        if not os.path.isfile(path) or _file_sha256(path) != meta['sha256']:
+            raise RegistryError(f"Checksum mismatch for {file_name} in version {version}.")
+        loaded[file_name] = joblib.load(path)
+
+    features = loaded.get(FEATURES_FILE)
+    if features is None or MASTER_DATA_FILE not in loaded:
+        raise RegistryError(f"Version {version} is missing its data artifacts.")
+    if feature_list_hash(features) != manifest['feature_list_hash']:
+        raise RegistryError(f"Feature list of version {version} does not match its manifest.")
+
+    models = {name: loaded[file_name] for name, file_name in MODEL_FILES.items() if file_name in loaded}
+    return {
+        'version': version,
+        'manifest': manifest,
+        'models': models,
+        'master_df': loaded[MASTER_DATA_FILE],
+        'features': features,
+    }
+
+
+# -----------------------------
+# Hot Swap Support
+# -----------------------------
+class SwapLock:
+    """
+    Readers (requests) share the lock, the swap takes it alone. A swap waits for in-flight
+    requests to finish and holds new ones back only for the few assignments of the swap itself.
+    Reading is reentrant per thread, so helpers that lock can be called from locked code.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._swapping = False
+        self._local = threading.local()
+
+    @contextmanager
+    def reading(self):
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+
+        with self._cond:
+            while self._swapping:
+                self._cond.wait()
+            self._readers += 1
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def swapping(self):
+        with self._cond:
+            while self._swapping:
+                self._cond.wait()
+            self._swapping = True
+            while self._readers:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._swapping = False
+                self._cond.notify_all()
+
+
+class RegistryWatcher(threading.Thread):
+    """
+    Polls the CURRENT pointer and hands every new version to `on_new_version` (which loads
+    and swaps it). Runs as a daemon thread so it never blocks shutdown.
+    """
+    def __init__(self, on_new_version, get_active_version, registry_dir: str = REGISTRY_DIR,
+                 interval: float = REGISTRY_POLL_SECONDS):
+        super().__init__(name='registry-watcher', daemon=True)
+        self.on_new_version = on_new_version
+        self.get_active_version = get_active_version
+        self.registry_dir = registry_dir
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            version = read_current_version(self.registry_dir)
+            if version is None or version == self.get_active_version():
+                continue
+            try:
+                self.on_new_version(version)
+            except Exception as e:
+                # keep serving the old version, retry on the next poll
+                print(f"Warning: could not activate model version {version}: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# migrates the flat model_artifacts/ + data_artifacts/ layout into a new registry version
+def publish_existing_artifacts(model_dir: str = 'model_artifacts', data_dir: str = 'data_artifacts',
+                               registry_dir: str = REGISTRY_DIR) -> str:
+    artifacts = {}
+    for file_name in MODEL_FILES.values():
+        path = os.path.join(model_dir, file_name)
+        if os.path.exists(path):
+            artifacts[file_name] = joblib.load(path)
+        else:
+            print(f"Warning: Model file {path} not found.")
+    artifacts[MASTER_DATA_FILE] = joblib.load(os.path.join(data_dir, MASTER_DATA_FILE))
+    features = joblib.load(os.path.join(data_dir, FEATURES_FILE))
+
+    training_metadata = {}
+    metadata_path = os.path.join(model_dir, 'model_metadata.json')
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            training_metadata = json.load(f)
+    return publish_version(artifacts, features, training_metadata, registry_dir)
+
+
+if __name__ == "__main__":
+    print(f"Published version {publish_existing_artifacts()}")
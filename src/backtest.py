@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src import live_feature_calculation as live
+from src.inference_threads import run_inference
+
+# -----------------------------
+# Configuration
+# -----------------------------
+OUTPUT_BACKTEST_DIR = 'backtest_artifacts'
+HISTORY_WINDOW = 12             # longest look-back of the live feature path (season xG base)
+MIN_HISTORY = 1                 # fixtures where a team has fewer prior matches are skipped
+EPS = 1e-15
+
+# FTR -> column of the (home_win, draw, away_win) probability arrays
+RESULT_INDEX = {'H': 0, 'D': 1, 'A': 2}
+
+
+# accepts MAIN_DF (sorted by Date), returns the match days as (date, row positions), in date order
+# a day is replayed as one batch: every fixture on it only sees matches played on earlier days, so a
+# rescheduled fixture becomes history on the day it was played, not with the rest of its gameweek
+def date_batches(df: pd.DataFrame) -> List[Tuple[pd.Timestamp, np.ndarray]]:
+    dates = df['Date'].to_numpy()
+    if len(dates) and (dates[1:] < dates[:-1]).any():
+        raise ValueError("MAIN_DF must be sorted by Date for the replay")
+    starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]]) if len(dates) else np.zeros(0, dtype=np.int64)
+    stops = np.r_[starts[1:], len(dates)]
+    return [(pd.Timestamp(dates[start]), np.arange(start, stop)) for start, stop in zip(starts, stops)]
+
+
+class TeamHistory:
+    """
+    Row positions of every team's matches replayed so far, in date order. Appending a day is O(matches in it)
+    and a team's state only ever reads its last HISTORY_WINDOW rows, so the whole replay is O(matches).
+    """
+    def __init__(self, df: pd.DataFrame):
+        self.home_teams = df['HomeTeam'].to_numpy()
+        self.away_teams = df['AwayTeam'].to_numpy()
+        self.dates = df['Date'].to_numpy()
+        self.rows: Dict[str, List[int]] = defaultdict(list)
+        self.is_home: Dict[str, List[bool]] = defaultdict(list)
+
+    def count(self, team: str) -> int:
+        return len(self.rows[team])
+
+    # accepts the team, the feature plan and the fixture's kick-off; no row of the state may be dated on or after it
+    def state(self, team: str, plan, kickoff: pd.Timestamp) -> Dict[str, Any]:
+        rows = np.array(self.rows[team][-HISTORY_WINDOW:], dtype=np.int64)
+        if len(rows) and self.dates[rows].max() >= kickoff.to_datetime64():
+            raise RuntimeError(f"Replay leak: state of {team} for {kickoff.date()} contains a match played on or after it")
+        is_home = np.array(self.is_home[team][-HISTORY_WINDOW:], dtype=bool)
+        return live.team_state_from_rows(rows, is_home, plan)
+
+    def append(self, positions: np.ndarray):
+        for pos in positions:
+            home, away = self.home_teams[pos], self.away_teams[pos]
+            self.rows[home].append(int(pos))
+            self.is_home[home].append(True)
+            self.rows[away].append(int(pos))
+            self.is_home[away].append(False)
+
+
+# accepts MAIN_DF and the compiled feature plan
+# returns the unscaled feature matrix of every replayed fixture plus its row position, gameweek and team Elos
+def replay_features(df: pd.DataFrame, plan, seasons: Optional[List[int]] = None,
+                    min_history: int = MIN_HISTORY) -> Tuple[np.ndarray, pd.DataFrame]:
+    history = TeamHistory(df)
+    season_col, gameweek_col = df['season'].to_numpy(), df['gameweek'].to_numpy()
+    blocks, meta = [], []
+    for day, positions in date_batches(df):
+        fixtures = [pos for pos in positions
+                    if (seasons is None or season_col[pos] in seasons)
+                    and history.count(history.home_teams[pos]) >= min_history
+                    and history.count(history.away_teams[pos]) >= min_history]
+        if fixtures:
+            # one state per team playing that day, built from earlier days only
+            teams = dict.fromkeys(t for pos in fixtures for t in (history.home_teams[pos], history.away_teams[pos]))
+            states = {team: history.state(team, plan, day) for team in teams}
+            h_states = [states[history.home_teams[pos]] for pos in fixtures]
+            a_states = [states[history.away_teams[pos]] for pos in fixtures]
+            blocks.append(live.assemble_feature_matrix(h_states, a_states, day))
+            meta.extend({'row': pos, 'season': int(season_col[pos]), 'gameweek': int(gameweek_col[pos]),
+                         'home_elo': h['elo'], 'away_elo': a['elo']} for pos, h, a in zip(fixtures, h_states, a_states))
+        # the day's results only become history once all of its fixtures have been predicted
+        history.append(positions)
+
+    X = np.vstack(blocks) if blocks else np.zeros((0, plan.n_features))
+    return X, pd.DataFrame(meta, columns=['row', 'season', 'gameweek', 'home_elo', 'away_elo'])
+
+
+# accepts the blended probabilities (home_win, draw, away_win), the actual FTR and the predicted/actual goals
+# returns accuracy, log loss, Brier score and goal MAE
+def score_predictions(probs: np.ndarray, class_probs: np.ndarray, results: np.ndarray,
+                      pred_goals: np.ndarray, actual_goals: np.ndarray) -> Dict[str, float]:
+    n = len(results)
+    if n == 0:
+        return {'matches': 0}
+    truth = np.zeros_like(probs)
+    truth[np.arange(n), results] = 1.0
+    return {
+        'matches': n,
+        'accuracy_blended': float((probs.argmax(axis=1) == results).mean()),
+        'accuracy_classifier': float((class_probs.argmax(axis=1) == results).mean()),
+        'log_loss_blended': float(-np.log(np.clip(probs[np.arange(n), results], EPS, 1)).mean()),
+        'log_loss_classifier': float(-np.log(np.clip(class_probs[np.arange(n), results], EPS, 1)).mean()),
+        'brier_blended': float(((probs - truth) ** 2).sum(axis=1).mean()),
+        'goal_mae': float(np.abs(pred_goals - actual_goals).mean()),
+    }
+
+
+# returns the date of the last match the served models were trained on (None when the metadata does not say)
+# read from the active registry version, else from the model_metadata.json next to the flat model files
+def training_cutoff() -> Optional[pd.Timestamp]:
+    metadata = live.ACTIVE_MANIFEST.get('training_metadata', {})
+    if not metadata:
+        metadata_path = os.path.join(live.MODEL_ARTIFACTS, 'model_metadata.json')
+        if os.path.exists(metadata_path):
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+    cutoff = metadata.get('train_end_date')
+    return pd.Timestamp(cutoff) if cutoff else None
+
+
+# main function!
+# accepts the seasons to score (all by default) and optional overrides of the blending logic
+# replays the live feature path day by day over MAIN_DF and scores the blended predictions, separately for
+# the matches after the training cutoff (held out) and the ones the models were trained on (in sample)
+# returns {'predictions', 'gameweeks', 'summary'}
+def run_backtest(seasons: Optional[List[int]] = None, min_history: int = MIN_HISTORY,
+                 weight_fn: Callable[[float, float], Tuple[float, str]] = live.compute_dynamic_weight,
+                 mode_temperature: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    live.load_model_once()
+    live.load_data_once()
+    mode_temperature = live.MODE_TEMPERATURE if mode_temperature is None else mode_temperature
+
+    start = time.perf_counter()
+    with live.ARTIFACT_LOCK.reading():
+        df, plan, models = live.MAIN_DF, live.FEATURE_PLAN, live.MODELS
+        X, meta = replay_features(df, plan, seasons, min_history)
+        feature_seconds = time.perf_counter() - start
+        # one scaler call and one call per model for the whole replay
+        X_scaled = live.scale_features(X)
+        c_probs = run_inference(models['classification_model'].predict_proba, X_scaled)[:, ::-1]
+        h_goals = run_inference(models['regression_home_model'].predict, X_scaled)
+        a_goals = run_inference(models['regression_away_model'].predict, X_scaled)
+        version = live.get_artifact_version()
+        cutoff = training_cutoff()
+
+    markets = live.scoreline_markets(h_goals, a_goals)
+    reg_probs = np.column_stack([markets['home_win'], markets['draw'], markets['away_win']])
+    weights, temperatures = np.empty(len(meta)), np.empty(len(meta))
+    for i, (h_elo, a_elo) in enumerate(zip(meta['home_elo'], meta['away_elo'])):
+        weights[i], mode = weight_fn(h_elo, a_elo)
+        temperatures[i] = mode_temperature.get(mode, 1)
+    blended = live.blend_probabilities_batch(c_probs, reg_probs, weights, temperatures)
+
+    played = df.iloc[meta['row'].to_numpy()]
+    results = played['FTR'].map(RESULT_INDEX).to_numpy()
+    pred_goals = np.column_stack([h_goals, a_goals])
+    actual_goals = played[['FTHG', 'FTAG']].to_numpy(dtype=np.float64)
+    if cutoff is None:
+        print("Warning: no train_end_date in the training metadata, every match is reported as in sample.")
+        held_out = np.zeros(len(played), dtype=bool)
+    else:
+        held_out = played['Date'].to_numpy() > cutoff.to_datetime64()
+
+    predictions = pd.DataFrame({
+        'Date': played['Date'].to_numpy(),
+        'season': meta['season'],
+        'gameweek': meta['gameweek'],
+        'HomeTeam': played['HomeTeam'].to_numpy(),
+        'AwayTeam': played['AwayTeam'].to_numpy(),
+        'FTHG': actual_goals[:, 0],
+        'FTAG': actual_goals[:, 1],
+        'FTR': played['FTR'].to_numpy(),
+        'home_xg': h_goals,
+        'away_xg': a_goals,
+        'home_win': blended[:, 0],
+        'draw': blended[:, 1],
+        'away_win': blended[:, 2],
+        'class_home_win': c_probs[:, 0],
+        'class_draw': c_probs[:, 1],
+        'class_away_win': c_probs[:, 2],
+        'weight_class': weights,
+        'held_out': held_out,
+    })
+
+    gameweeks = []
+    for (season, gameweek, is_held_out), idx in predictions.groupby(['season', 'gameweek', 'held_out'], sort=False).indices.items():
+        gameweeks.append({'season': season, 'gameweek': gameweek, 'held_out': is_held_out,
+                          **score_predictions(blended[idx], c_probs[idx], results[idx], pred_goals[idx], actual_goals[idx])})
+
+    def score(mask: np.ndarray) -> Dict[str, float]:
+        return score_predictions(blended[mask], c_probs[mask], results[mask], pred_goals[mask], actual_goals[mask])
+
+    summary = {
+        'model_version': version,
+        'train_end_date': None if cutoff is None else str(cutoff.date()),
+        # only the held-out metrics measure the models on matches they have not seen
+        'held_out': score(held_out),
+        'in_sample': score(~held_out),
+        'feature_seconds': round(feature_seconds, 3),
+        'elapsed_seconds': round(time.perf_counter() - start, 3),
+    }
+    return {'predictions': predictions, 'gameweeks': pd.DataFrame(gameweeks), 'summary': summary}
+
+
+# writes the per-match predictions and the per-gameweek metrics
+def save_backtest(backtest: Dict[str, Any], output_dir: str = OUTPUT_BACKTEST_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    backtest['predictions'].to_csv(os.path.join(output_dir, 'backtest_predictions.csv'), index=False)
+    backtest['gameweeks'].to_csv(os.path.join(output_dir, 'backtest_gameweeks.csv'), index=False)
+    print(f"Backtest saved to {output_dir}/")
+
+
+if __name__ == "__main__":
+    print("="*156)
+    print("BACKTEST: replaying the live feature path day by day")
+    backtest = run_backtest()
+    for key, value in backtest['summary'].items():
+        print(f"{key:<22}: {value}")
+    save_backtest(backtest)
+    print("="*156)
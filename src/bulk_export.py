@@ -0,0 +1,94 @@
+import io
+import importlib.util
+import numpy as np
+import pandas as pd
+from typing import Iterator, Optional
+
+# -----------------------------
+# Configuration
+# -----------------------------
+EXPORT_CHUNK_ROWS = 2000
+
+# format -> media type of the streamed response
+EXPORT_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+
+# accepts an explicit format (query parameter) and the Accept header
+# returns the export format: the explicit one if given, else the first supported media type accepted, else NDJSON
+def negotiate_export_format(fmt: Optional[str], accept: Optional[str]) -> str:
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in EXPORT_MEDIA_TYPES:
+            raise ValueError(f"format must be one of {list(EXPORT_MEDIA_TYPES)}")
+        return fmt
+    for media_range in (accept or '').split(','):
+        media_type = media_range.split(';')[0].strip().lower()
+        for name, supported in EXPORT_MEDIA_TYPES.items():
+            if media_type == supported:
+                return name
+    return 'ndjson'
+
+
+# accepts a stats frame with season / gameweek columns (the player frames have no season, pass season=None)
+# returns the positions of its rows in the season and gameweek range, in frame order (no rows are copied)
+def select_export_rows(df: pd.DataFrame, season: Optional[int], gw_from: int, gw_to: int) -> np.ndarray:
+    gameweek = df['gameweek'].to_numpy()
+    mask = (gameweek >= gw_from) & (gameweek <= gw_to)
+    if season is not None:
+        mask &= df['season'].to_numpy() == season
+    return np.flatnonzero(mask)
+
+
+def _chunks(df: pd.DataFrame, rows: np.ndarray, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(rows), chunk_rows):
+        yield df.iloc[rows[start:start + chunk_rows]]
+
+
+def iter_ndjson(df: pd.DataFrame, rows: np.ndarray, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    for chunk in _chunks(df, rows, chunk_rows):
+        # one JSON object per line, NaN as null, dates in ISO 8601
+        yield chunk.to_json(orient='records', lines=True, date_format='iso').rstrip('\n').encode('utf-8') + b'\n'
+
+
+def iter_csv(df: pd.DataFrame, rows: np.ndarray, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    yield df.iloc[:0].to_csv(index=False).encode('utf-8')
+    for chunk in _chunks(df, rows, chunk_rows):
+        yield chunk.to_csv(index=False, header=False).encode('utf-8')
+
+
+def arrow_available() -> bool:
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def iter_arrow(df: pd.DataFrame, rows: np.ndarray, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    # optional dependency, only needed for this format (check arrow_available() before streaming)
+    import pyarrow as pa
+    # types inferred from the first chunk; a column that is all missing there is exported as string
+    schema = pa.Schema.from_pandas(df.iloc[rows[:chunk_rows]], preserve_index=False)
+    schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in schema])
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for chunk in _chunks(df, rows, chunk_rows):
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+            # hand over what this batch wrote, the sink never holds more than one batch
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+EXPORT_WRITERS = {
+    'ndjson': iter_ndjson,
+    'csv': iter_csv,
+    'arrow': iter_arrow,
+}
+
+
+# accepts a stats frame, the selected row positions and the export format
+# returns a generator of encoded chunks, the whole export is never held in memory
+def stream_export(df: pd.DataFrame, rows: np.ndarray, fmt: str, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    return EXPORT_WRITERS[fmt](df, rows, chunk_rows)
@@ -1,13 +1,56 @@
 # this file is majorly responsible for maintaining one consistent dataframe by merging historical match data with the teams-matches data
 # also aggregating the player based rolling features
 
+import numpy as np
 import pandas as pd
-from typing import Tuple
+from typing import Dict, Tuple
 import joblib
 import os
 
 OUTPUT_DIR = "data_artifacts"
 
+# converting player-level rolling form into team-level positional strength
+# every position fills its own block of columns in one wide matrix (NaN outside its block), so a single groupby mean over
+# (match_id, team_code) averages each block over the players of that position only
+def aggregate_positional_stats(player_stats_df: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    rolling_cols = {
+        position: [col for col in stats.columns if col.startswith('L5_Avg')]
+        for position, stats in player_stats_df.items()
+    }
+    columns = [f'{position}_{col}' for position, cols in rolling_cols.items() for col in cols]
+    values = np.full((sum(len(stats) for stats in player_stats_df.values()), len(columns)), np.nan)
+
+    row, col = 0, 0
+    for position, stats in player_stats_df.items():
+        print(f"Aggregating {position} stats...")
+        n_rows, n_cols = len(stats), len(rolling_cols[position])
+        values[row:row + n_rows, col:col + n_cols] = stats[rolling_cols[position]].to_numpy(dtype=float)
+        row += n_rows
+        col += n_cols
+
+    keys = pd.concat([stats[['match_id', 'team_code']] for stats in player_stats_df.values()], ignore_index=True)
+    wide_stats = pd.DataFrame(values, columns=columns)
+    return wide_stats.groupby([keys['match_id'], keys['team_code']]).mean().fillna(0)
+
+# attaching the team-level positional strength to the home and away side of every fixture
+# the (match_id, team code) keys are resolved to integer row positions of the aggregated stats instead of merging them twice
+def attach_positional_stats(merged_df: pd.DataFrame, final_players_stats: pd.DataFrame) -> pd.DataFrame:
+    # an extra all-NaN row at the end is picked up by the -1 position of fixtures without player data (like a left merge)
+    values = np.vstack([
+        final_players_stats.to_numpy(dtype=float),
+        np.full((1, final_players_stats.shape[1]), np.nan)
+    ])
+    side_stats = []
+    for prefix, code_col in (('HT_', 'HT_code'), ('AT_', 'AT_code')):
+        keys = pd.MultiIndex.from_arrays([merged_df['match_id'], merged_df[code_col]])
+        positions = final_players_stats.index.get_indexer(keys)
+        side_stats.append(pd.DataFrame(
+            values[positions],
+            columns=[f'{prefix}{col}' for col in final_players_stats.columns],
+            index=merged_df.index
+        ))
+    return pd.concat([merged_df] + side_stats, axis=1)
+
 def load_merge_data(all_data: Tuple[pd.DataFrame, pd.DataFrame,
                                     pd.DataFrame, pd.DataFrame,
                                     pd.DataFrame, pd.DataFrame]) -> pd.DataFrame:
@@ -61,57 +104,10 @@ def load_merge_data(all_data: Tuple[pd.DataFrame, pd.DataFrame,
         'MID':fe_mid,
         'FWD':fe_fwd
     }
-
-    # converting player-level rolling form into team-level positional strength
-    aggregated_data = []
-    for position, stats in player_stats_df.items():
-        print(f"Aggregating {position} stats...")
-        rolling_cols = [col for col in stats.columns if col.startswith('L5_Avg')]
-        agg_df = stats.groupby(['match_id', 'team_code'])[rolling_cols].mean().reset_index()
-        print(f"{position} stats aggregated successfully! Shape: {agg_df.shape}\n")
-        agg_df.columns = ['match_id', 'team_code'] + [f'{position}_{col}' for col in rolling_cols]
-        aggregated_data.append(agg_df)
-        
-    final_players_stats = aggregated_data[0]
-    for data in aggregated_data[1:]:
-        final_players_stats = final_players_stats.merge(
-            data,
-            on=['match_id', 'team_code'],
-            how='outer'
-        )
-    final_players_stats = final_players_stats.fillna(0)
+    final_players_stats = aggregate_positional_stats(player_stats_df)
     print(f"Final Aggregated Players stats ready! Shape: {final_players_stats.shape}\n")
-    home_final_players_stats = final_players_stats.copy()
-    player_features = [col for col in home_final_players_stats.columns if col not in ['match_id', 'team_code']]
-    home_rename_map = {col: f'HT_TEMP_{col}' for col in player_features}
-    home_final_players_stats = home_final_players_stats.rename(columns=home_rename_map)
-    merged_2a = merged_1.merge(
-        home_final_players_stats,
-        left_on=['match_id', 'HT_code'],
-        right_on=['match_id', 'team_code'],
-        how='left'
-    )
-    home_players = [col for col in merged_2a.columns if col.startswith('HT_TEMP_')]
-    home_rename_map_final = {col: col.replace('HT_TEMP_', 'HT_') for col in home_players}
-    merged_2a = merged_2a.rename(columns=home_rename_map_final)
-    merged_2a = merged_2a.drop(columns=['team_code'], errors='ignore')
-    print("Home Team Player stats merged successfully!")
-    away_final_players_stats = final_players_stats.copy()
-    player_features = [col for col in away_final_players_stats.columns if col not in ['match_id', 'team_code']]
-    away_rename_map = {col: f'AT_TEMP_{col}' for col in player_features}
-    away_final_players_stats = away_final_players_stats.rename(columns=away_rename_map)
-    merged_2b = merged_2a.merge(
-        away_final_players_stats,
-        left_on=['match_id', 'AT_code'],
-        right_on=['match_id', 'team_code'],
-        how='left'
-    )
-    away_players = [col for col in merged_2b.columns if col.startswith('AT_TEMP_')]
-    away_rename_map_final = {col: col.replace('AT_TEMP_', 'AT_') for col in away_players}
-    merged_2b = merged_2b.rename(columns=away_rename_map_final)
-    merged_2b = merged_2b.drop(columns=['team_code'], errors='ignore')
-    print("Away Team Player stats merged successfully!\n")
-    merged_data = merged_2b.copy()
+    merged_data = attach_positional_stats(merged_1, final_players_stats)
+    print("Home & Away Team Player stats merged successfully!\n")
     print(f"Shape of the merged data: {merged_data.shape}\n")
     print(f"{" "*50}RELATIONAL DATA HAS BEEN SUCCESSFULLY MERGED WITH THE MASTER DATA!\n")
     return merged_data
\ No newline at end of file
@@ -2,6 +2,7 @@ import numpy as np
 import pandas as pd
 from typing import List
 from data_cleaning import data_cleaning
+from h2h_index import matchup_keys
 
 PROB_NORM_ODDS: List[List[str]] = [
     ['BbAvH', 'BbAvD', 'BbAvA'], ['AvgCH', 'AvgCD', 'AvgCA'], ['PSCH', 'PSCD', 'PSCA'],              
@@ -211,9 +212,7 @@ def rolling_feature_engineering(df: pd.DataFrame) -> pd.DataFrame:
     # 15
     df['HT_Points'] = np.where(df['FTR'] == 'H', 3, np.where(df['FTR'] == 'D', 1, 0))
     df['AT_Points'] = np.where(df['FTR'] == 'A', 3, np.where(df['FTR'] == 'D', 1, 0))
-    teams_array = df[['HomeTeam', 'AwayTeam']].astype(str).values
-    teams_array.sort(axis=1)
-    df['MatchUp'] = teams_array[:, 0] + "_" + teams_array[:, 1]
+    df['MatchUp'] = matchup_keys(df['HomeTeam'], df['AwayTeam'])
     df['H2H_HT_Points_L5'] = df.groupby('MatchUp')['HT_Points'].transform(lambda x: x.shift(1).rolling(5, min_periods=1).sum())
     df['H2H_AT_Points_L5'] = df.groupby('MatchUp')['AT_Points'].transform(lambda x: x.shift(1).rolling(5, min_periods=1).sum())
     df['H2H_HT_Points_L5'] = df['H2H_HT_Points_L5'].fillna(0)
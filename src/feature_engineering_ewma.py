@@ -5,6 +5,7 @@ import numpy as np
 import pandas as pd
 from typing import List
 from data_cleaning import data_cleaning
+from h2h_index import matchup_keys
 
 # multi-class odds: must normalize them
 PROB_NORM_ODDS: List[List[str]] = [
@@ -215,9 +216,7 @@ def rolling_feature_engineering_ewma(df: pd.DataFrame) -> pd.DataFrame:
     # 15. H2H Points (UNREPLACED - Keep Rolling for long-term matchup history)
     df['HT_Points'] = np.where(df['FTR'] == 'H', 3, np.where(df['FTR'] == 'D', 1, 0))
     df['AT_Points'] = np.where(df['FTR'] == 'A', 3, np.where(df['FTR'] == 'D', 1, 0))
-    teams_array = df[['HomeTeam', 'AwayTeam']].astype(str).values
-    teams_array.sort(axis=1) 
-    df['MatchUp'] = teams_array[:, 0] + "_" + teams_array[:, 1]
+    df['MatchUp'] = matchup_keys(df['HomeTeam'], df['AwayTeam'])
     df['H2H_HT_Points_L5'] = df.groupby('MatchUp')['HT_Points'].transform(lambda x: x.shift(1).rolling(5, min_periods=1).sum())
     df['H2H_AT_Points_L5'] = df.groupby('MatchUp')['AT_Points'].transform(lambda x: x.shift(1).rolling(5, min_periods=1).sum())
     df['H2H_HT_Points_L5'] = df['H2H_HT_Points_L5'].fillna(0)
@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# Bases whose difference gets the venue / strength-of-schedule / quality adjustments
+ADJUST_TARGETS = ['touches_in_opposition_box', 'expected_goals', 'big_chances', 'possession']
+
+# Features written directly by calculate_features (not read from a team's history)
+DERIVED_FEATURES = ['HT_Home_Comfort', 'AT_Away_Resilience', 'SoS_Ratio', 'Elo_Gap_Diff', 'Elo_Gap_Absolute',
+                    'Elo_Symmetry', 'HT_xG_Season_Base', 'AT_xG_Season_Base', 'Season_Class_Diff',
+                    'Rest_Days_Diff', 'Quality_Index_Diff', 'expected_goals_Diff']
+
+
+class FeaturePlanError(ValueError):
+    pass
+
+
+@dataclass
+class TeamRows:
+    """
+    Point-in-time index of one team: MAIN_DF positions of its matches, its home flags and the
+    match dates, all chronological, so the history as of any date is a binary search away.
+    """
+    rows: np.ndarray
+    is_home: np.ndarray
+    dates: np.ndarray
+
+    # accepts a window and an optional cut-off, returns the last `window` rows played strictly before it
+    def window(self, window: int, as_of: Optional[pd.Timestamp] = None) -> Tuple[np.ndarray, np.ndarray]:
+        end = len(self.rows) if as_of is None else int(np.searchsorted(self.dates, np.datetime64(as_of, 'ns'), side='left'))
+        start = max(0, end - window)
+        return self.rows[start:end], self.is_home[start:end]
+
+
+EMPTY_TEAM_ROWS = TeamRows(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool), np.zeros(0, dtype='datetime64[ns]'))
+
+
+@dataclass
+class FeaturePlan:
+    """
+    Everything calculate_features needs to know about the feature list, resolved once per
+    artifact load: which slot every feature fills and which MAIN_DF columns feed it.
+    """
+    features: List[str]
+    columns: pd.Index
+    base_features: List[str]
+    static_features: List[str]
+    # one entry per base feature: target slot of '<base>_Diff', adjustment flag, HT_/AT_ source availability
+    diff_slots: np.ndarray
+    adjust_mask: np.ndarray
+    has_source: np.ndarray
+    # (n_rows x n_bases) HT_<base> / AT_<base> values of MAIN_DF, NaN where a base has no source columns
+    home_source: np.ndarray
+    away_source: np.ndarray
+    # one entry per static feature: target slot and MAIN_DF positions of HT_<col>, AT_<col>, <col> (-1 if missing)
+    static_slots: np.ndarray
+    static_ht_pos: np.ndarray
+    static_at_pos: np.ndarray
+    static_plain_pos: np.ndarray
+    # slot of every derived feature, -1 when the feature list does not use it
+    derived_slots: Dict[str, int] = field(default_factory=dict)
+    # per-team point-in-time index of MAIN_DF
+    team_index: Dict[str, TeamRows] = field(default_factory=dict)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.features)
+
+
+# accepts the prepared MAIN_DF (sorted by Date), returns {team: TeamRows} built with one sort of the (team, row) pairs
+def build_team_index(main_df: pd.DataFrame) -> Dict[str, TeamRows]:
+    n = len(main_df)
+    teams = np.concatenate([main_df['HomeTeam'].to_numpy(), main_df['AwayTeam'].to_numpy()])
+    positions = np.concatenate([np.arange(n), np.arange(n)])
+    is_home = np.concatenate([np.ones(n, dtype=bool), np.zeros(n, dtype=bool)])
+    codes, uniques = pd.factorize(teams)
+    order = np.lexsort((positions, codes))
+    bounds = np.cumsum(np.bincount(codes, minlength=len(uniques)))
+    dates = main_df['Date'].to_numpy(dtype='datetime64[ns]')
+
+    index = {}
+    for code, (start, stop) in enumerate(zip(np.r_[0, bounds[:-1]], bounds)):
+        rows = positions[order[start:stop]]
+        index[uniques[code]] = TeamRows(rows, is_home[order[start:stop]], dates[rows])
+    return index
+
+
+# accepts the final feature list and the prepared MAIN_DF, returns the compiled feature plan
+def compile_feature_plan(features: List[str], main_df: pd.DataFrame) -> FeaturePlan:
+    if len(set(features)) != len(features):
+        raise FeaturePlanError("Feature list contains duplicate names.")
+    index = {col: i for i, col in enumerate(features)}
+    col_pos = {col: i for i, col in enumerate(main_df.columns)}
+
+    diff_features = [col for col in features if col.endswith('_Diff')]
+    base_features = sorted(set(col.replace('_Diff', '') for col in diff_features))
+    static_features = [col for col in features if not col.endswith('_Diff')]
+
+    has_source = np.array([f'HT_{b}' in col_pos and f'AT_{b}' in col_pos for b in base_features], dtype=bool)
+    home_source = np.full((len(main_df), len(base_features)), np.nan)
+    away_source = np.full((len(main_df), len(base_features)), np.nan)
+    for j, base in enumerate(base_features):
+        if not has_source[j]:
+            continue
+        try:
+            home_source[:, j] = main_df[f'HT_{base}'].to_numpy(dtype=np.float64)
+            away_source[:, j] = main_df[f'AT_{base}'].to_numpy(dtype=np.float64)
+        except (TypeError, ValueError):
+            raise FeaturePlanError(f"Source columns HT_{base}/AT_{base} are not numeric.")
+
+    missing_sources = [b for b, ok in zip(base_features, has_source) if not ok]
+    if missing_sources:
+        print(f"Warning: no HT_/AT_ source columns for {len(missing_sources)} diff features, they stay 0.0: {missing_sources}")
+
+    return FeaturePlan(
+        features=list(features),
+        columns=pd.Index(features),
+        base_features=base_features,
+        static_features=static_features,
+        diff_slots=np.array([index.get(f'{b}_Diff', -1) for b in base_features], dtype=np.int64),
+        adjust_mask=np.array([b.lower() in ADJUST_TARGETS for b in base_features], dtype=bool),
+        has_source=has_source,
+        home_source=home_source,
+        away_source=away_source,
+        static_slots=np.array([index[c] for c in static_features], dtype=np.int64),
+        static_ht_pos=np.array([col_pos.get(f'HT_{c}', -1) for c in static_features], dtype=np.int64),
+        static_at_pos=np.array([col_pos.get(f'AT_{c}', -1) for c in static_features], dtype=np.int64),
+        static_plain_pos=np.array([col_pos.get(c, -1) for c in static_features], dtype=np.int64),
+        derived_slots={name: index.get(name, -1) for name in DERIVED_FEATURES},
+        team_index=build_team_index(main_df),
+    )
+
+
+def _check_names(owner: str, names: Any, features: List[str]):
+    if names is None:
+        return
+    names = list(names)
+    if names != features:
+        mismatched = next((i for i, (a, b) in enumerate(zip(names, features)) if a != b), min(len(names), len(features)))
+        raise FeaturePlanError(f"{owner} feature names differ from the feature list at position {mismatched}.")
+
+
+# accepts a compiled plan and the loaded models, raises FeaturePlanError on any mismatch
+def validate_feature_plan(plan: FeaturePlan, models: Dict[str, Any]):
+    n = plan.n_features
+    scaler = models.get('scaler')
+    if scaler is not None:
+        if getattr(scaler, 'n_features_in_', n) != n:
+            raise FeaturePlanError(f"Scaler expects {scaler.n_features_in_} features, the feature list has {n}.")
+        _check_names('Scaler', getattr(scaler, 'feature_names_in_', None), plan.features)
+
+    c_model = models.get('classification_model')
+    if c_model is not None:
+        booster = c_model.get_booster()
+        if booster.num_features() != n:
+            raise FeaturePlanError(f"Classifier expects {booster.num_features()} features, the feature list has {n}.")
+        _check_names('Classifier', booster.feature_names, plan.features)
+
+    for name in ('regression_home_model', 'regression_away_model'):
+        model = models.get(name)
+        if model is None:
+            continue
+        if getattr(model, 'n_features_in_', n) != n:
+            raise FeaturePlanError(f"{name} expects {model.n_features_in_} features, the feature list has {n}.")
+        _check_names(name, getattr(model, 'feature_names_in_', None), plan.features)
+
+
+# accepts the MAIN_DF row positions of a team's recent matches (chronological) and its home flags
+# returns the EWMA of every base feature (0.0 for bases without sources), same as pandas ewm(span, adjust=True)
+def ewma_base_stats(plan: FeaturePlan, rows: np.ndarray, is_home: np.ndarray, span: int) -> np.ndarray:
+    if len(rows) == 0:
+        return np.zeros(len(plan.base_features))
+    vals = np.where(is_home[:, None], plan.home_source[rows], plan.away_source[rows])
+    alpha = 2.0 / (span + 1.0)
+    weights = (1.0 - alpha) ** np.arange(len(rows) - 1, -1, -1, dtype=np.float64)
+    valid = ~np.isnan(vals)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats = np.where(valid, vals, 0.0).T @ weights / (valid.T @ weights)
+    return np.where(plan.has_source, stats, 0.0)
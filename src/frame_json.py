@@ -0,0 +1,62 @@
+import json
+import numpy as np
+import pandas as pd
+from typing import Any, List, Mapping, Optional
+from starlette.responses import Response
+
+
+# accepts one column, returns the JSON text of every cell (NaN / NaT / None as null, datetimes in ISO 8601)
+# each column is converted with one vectorised pass per dtype, the cells are never boxed into a dict
+def encode_column(col: pd.Series) -> List[str]:
+    values = col.to_numpy()
+    kind = values.dtype.kind
+    if kind in 'iu':
+        return [str(v) for v in values.tolist()]
+    if kind == 'b':
+        return ['true' if v else 'false' for v in values.tolist()]
+    if kind == 'M':
+        # same text as Timestamp.isoformat() for naive, whole-second timestamps
+        cells = np.char.add(np.char.add('"', np.datetime_as_string(values, unit='s')), '"').tolist()
+        missing = np.isnat(values)
+    elif kind == 'f':
+        # float.__repr__ is what json.dumps writes; inf has no JSON form either
+        cells = [repr(v) for v in values.tolist()]
+        missing = ~np.isfinite(values)
+    else:
+        return ['null' if v is None or v is pd.NaT or (isinstance(v, float) and v != v)
+                else json.dumps(v.isoformat() if isinstance(v, pd.Timestamp) else v, ensure_ascii=False)
+                for v in values.tolist()]
+    for i in np.flatnonzero(missing):
+        cells[i] = 'null'
+    return cells
+
+
+# accepts a frame, returns its rows as a JSON array of objects (as bytes)
+def encode_records(df: pd.DataFrame) -> bytes:
+    if len(df) == 0:
+        return b'[]'
+    keys = [json.dumps(str(c), ensure_ascii=False) + ':' for c in df.columns]
+    columns = [[key + cell for cell in encode_column(df.iloc[:, i])] for i, key in enumerate(keys)]
+    return ('[' + ','.join('{' + ','.join(row) + '}' for row in zip(*columns)) + ']').encode('utf-8')
+
+
+# accepts a frame with exactly one row, returns that row as a JSON object (as bytes)
+def encode_row(df: pd.DataFrame) -> bytes:
+    return encode_records(df)[1:-1]
+
+
+class DataFrameJSONResponse(Response):
+    """
+    JSON response for stats frames, encoded column-wise straight to bytes instead of through
+    to_dict(orient="records") and jsonable_encoder. single_row=True renders a one-row frame as an object.
+    """
+    media_type = "application/json"
+
+    def __init__(self, content: pd.DataFrame, single_row: bool = False, status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None, **kwargs: Any):
+        self.single_row = single_row
+        super().__init__(content, status_code=status_code, headers=headers, **kwargs)
+
+    def render(self, content: pd.DataFrame) -> bytes:
+        return encode_row(content) if self.single_row else encode_records(content)
+
@@ -0,0 +1,122 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+H2H_INDEX_FILE = 'h2h_index.pkl'
+H2H_COLUMNS = ['Date', 'season', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 'FTR', 'HTHG', 'HTAG']
+
+
+# accepts home / away team columns, returns the order-insensitive MatchUp key of every match ("Arsenal_Chelsea")
+def matchup_keys(home: pd.Series, away: pd.Series) -> np.ndarray:
+    teams_array = np.column_stack([home.astype(str).to_numpy(), away.astype(str).to_numpy()])
+    teams_array.sort(axis=1)
+    return np.char.add(np.char.add(teams_array[:, 0].astype(str), "_"), teams_array[:, 1].astype(str))
+
+
+# accepts the match history (raw PL data from data_ingestion1.py or any frame with the H2H columns)
+# returns the H2H index: every match ordered by (MatchUp, Date) as columnar arrays plus {MatchUp: (start, stop)}
+def build_h2h_index(df: pd.DataFrame) -> Dict[str, Any]:
+    df = df.dropna(subset=['HomeTeam', 'AwayTeam', 'FTR']).copy()
+    if not pd.api.types.is_datetime64_any_dtype(df['Date']):
+        df['Date'] = pd.to_datetime(df['Date'], format='mixed', dayfirst=True)
+    if 'season' not in df.columns:
+        # season named after its starting year, a season starts in August
+        df['season'] = np.where(df['Date'].dt.month >= 8, df['Date'].dt.year, df['Date'].dt.year - 1)
+    for col in H2H_COLUMNS:
+        if col not in df.columns:
+            df[col] = np.nan
+
+    df['MatchUp'] = matchup_keys(df['HomeTeam'], df['AwayTeam'])
+    df = df.sort_values(['MatchUp', 'Date'], kind='stable').reset_index(drop=True)
+
+    keys = df['MatchUp'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+    stops = np.r_[starts[1:], len(keys)]
+
+    teams = pd.unique(np.concatenate([df['HomeTeam'].to_numpy(), df['AwayTeam'].to_numpy()]))
+    return {
+        'columns': {
+            'date': df['Date'].dt.strftime('%Y-%m-%d').to_numpy(),
+            'season': df['season'].to_numpy(dtype=np.int64),
+            'home': df['HomeTeam'].to_numpy(),
+            'away': df['AwayTeam'].to_numpy(),
+            'home_goals': df['FTHG'].to_numpy(dtype=np.float64),
+            'away_goals': df['FTAG'].to_numpy(dtype=np.float64),
+            'result': df['FTR'].to_numpy(),
+            'home_goals_ht': df['HTHG'].to_numpy(dtype=np.float64),
+            'away_goals_ht': df['HTAG'].to_numpy(dtype=np.float64),
+        },
+        'offsets': {key: (int(start), int(stop)) for key, start, stop in zip(keys[starts], starts, stops)},
+        # lower-cased name -> name as stored, for case-insensitive lookups
+        'teams': {str(team).lower(): str(team) for team in teams},
+    }
+
+
+def save_h2h_index(index: Dict[str, Any], output_dir: str = 'data_artifacts'):
+    os.makedirs(output_dir, exist_ok=True)
+    joblib.dump(index, os.path.join(output_dir, H2H_INDEX_FILE))
+    print(f"H2H index saved: {len(index['offsets'])} pairings, {len(index['columns']['date'])} matches.")
+
+
+def load_h2h_index(path: str) -> Optional[Dict[str, Any]]:
+    return joblib.load(path) if os.path.exists(path) else None
+
+
+def _goals(value: float) -> Optional[int]:
+    return None if np.isnan(value) else int(value)
+
+
+# accepts the H2H index, two teams (any order) and how many recent meetings to list
+# returns None for an unknown team, otherwise the aggregates from team_a's point of view and the last `last_n` meetings
+def head_to_head(index: Dict[str, Any], team_a: str, team_b: str, last_n: int = 5,
+                 since_season: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    team_a, team_b = index['teams'].get(team_a.lower()), index['teams'].get(team_b.lower())
+    if team_a is None or team_b is None:
+        return None
+    start, stop = index['offsets'].get(matchup_keys(pd.Series([team_a]), pd.Series([team_b]))[0], (0, 0))
+    cols = index['columns']
+    if since_season is not None:
+        # meetings are chronological within a pairing
+        start += int(np.searchsorted(cols['season'][start:stop], since_season, side='left'))
+
+    home = cols['home'][start:stop]
+    home_goals, away_goals = cols['home_goals'][start:stop], cols['away_goals'][start:stop]
+    result = cols['result'][start:stop]
+    a_home = home == team_a
+    a_goals = np.where(a_home, home_goals, away_goals)
+    b_goals = np.where(a_home, away_goals, home_goals)
+    a_won = (result == 'H') & a_home | (result == 'A') & ~a_home
+    drawn = result == 'D'
+
+    meetings: List[Dict[str, Any]] = []
+    for i in range(stop - 1, max(start, stop - last_n) - 1, -1):
+        meetings.append({
+            "date": cols['date'][i],
+            "season": int(cols['season'][i]),
+            "home_team": cols['home'][i],
+            "away_team": cols['away'][i],
+            "home_goals": _goals(cols['home_goals'][i]),
+            "away_goals": _goals(cols['away_goals'][i]),
+            "half_time": None if np.isnan(cols['home_goals_ht'][i])
+            else f"{_goals(cols['home_goals_ht'][i])} - {_goals(cols['away_goals_ht'][i])}",
+            "result": cols['result'][i],
+        })
+
+    return {
+        "team_a": team_a,
+        "team_b": team_b,
+        "meetings": int(stop - start),
+        "first_meeting": cols['date'][start] if stop > start else None,
+        "team_a_wins": int(a_won.sum()),
+        "team_b_wins": int((~a_won & ~drawn).sum()),
+        "draws": int(drawn.sum()),
+        "team_a_goals": int(np.nansum(a_goals)),
+        "team_b_goals": int(np.nansum(b_goals)),
+        "team_a_home": {"played": int(a_home.sum()), "wins": int((a_won & a_home).sum()),
+                        "draws": int((drawn & a_home).sum())},
+        "team_a_away": {"played": int((~a_home).sum()), "wins": int((a_won & ~a_home).sum()),
+                        "draws": int((drawn & ~a_home).sum())},
+        "last_meetings": meetings,
+    }
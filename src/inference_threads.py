@@ -0,0 +1,53 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Serving Thread Policy
+# -----------------------------
+# Every model is evaluated single-threaded: a one-row prediction never pays for a worker pool and
+# concurrent requests cannot oversubscribe the CPU. Batches of at least PARALLEL_BATCH_SIZE rows are
+# split into chunks that run on one process-wide pool of SERVING_THREADS threads (tree / booster
+# prediction releases the GIL), so all parallel inference together never uses more than that.
+SERVING_THREADS = int(os.environ.get('SERVING_THREADS', 0)) or (os.cpu_count() or 1)
+PARALLEL_BATCH_SIZE = int(os.environ.get('PARALLEL_BATCH_SIZE', 256))
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+# accepts the loaded models ({name: model}), pins every model to one thread in place
+# called by the loaders before the models are published, so no request ever sees a half-configured model
+def apply_serving_thread_policy(models: Dict[str, Any]) -> Dict[str, Any]:
+    for model in models.values():
+        params = model.get_params() if hasattr(model, 'get_params') else {}
+        if 'n_jobs' in params:
+            model.set_params(n_jobs=1)
+        if hasattr(model, 'get_booster'):
+            # the booster keeps the thread count it was trained with (0 = all cores)
+            model.get_booster().set_param('nthread', 1)
+    return models
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=SERVING_THREADS, thread_name_prefix='inference')
+        return _POOL
+
+
+# accepts a prediction function (model.predict / model.predict_proba) and its input rows
+# returns fn(X): inline for small batches, chunked over the shared pool for large ones
+def run_inference(fn: Callable[[Any], np.ndarray], X: Any) -> np.ndarray:
+    n_rows = len(X)
+    if n_rows < PARALLEL_BATCH_SIZE or SERVING_THREADS == 1:
+        return fn(X)
+    n_chunks = min(SERVING_THREADS, -(-n_rows // (PARALLEL_BATCH_SIZE // 2 or 1)))
+    bounds = np.linspace(0, n_rows, n_chunks + 1).astype(np.int64)
+    take = (lambda a, b: X.iloc[a:b]) if isinstance(X, pd.DataFrame) else (lambda a, b: X[a:b])
+    futures = [_get_pool().submit(fn, take(a, b)) for a, b in zip(bounds[:-1], bounds[1:])]
+    return np.concatenate([f.result() for f in futures])
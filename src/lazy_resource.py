@@ -0,0 +1,122 @@
+import time
+import importlib
+import threading
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+# a failed load is retried after 1s, 2s, 4s, ... (at most every 60s); calls in between re-raise the cached error
+BACKOFF_INITIAL_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+_RESOURCES: List["LazyResource"] = []
+_RESOURCES_LOCK = threading.Lock()
+
+
+class LazyResource(Generic[T]):
+    """
+    A value loaded on first use, exactly once however many threads ask for it at the same time:
+    the first caller runs the loader, the others wait on a condition and are woken with its result.
+    A failed load is cached and re-raised until its backoff expires, then the next caller retries.
+    Once loaded, get() is a single attribute read.
+    """
+    def __init__(self, name: str, loader: Callable[[], T]):
+        self.name = name
+        self.loader = loader
+        self._cond = threading.Condition()
+        self._ready = False
+        self._loading = False
+        self._value: Optional[T] = None
+        self._error: Optional[BaseException] = None
+        self._retry_at = 0.0
+        self._backoff = BACKOFF_INITIAL_SECONDS
+        self._loads = 0
+        self._failures = 0
+        self._last_load_seconds: Optional[float] = None
+        self._waiters = 0
+        self._max_waiters = 0
+        self._total_waits = 0
+        with _RESOURCES_LOCK:
+            _RESOURCES.append(self)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def get(self) -> T:
+        if self._ready:
+            return self._value
+        with self._cond:
+            while self._loading:
+                self._waiters += 1
+                self._total_waits += 1
+                self._max_waiters = max(self._max_waiters, self._waiters)
+                try:
+                    self._cond.wait()
+                finally:
+                    self._waiters -= 1
+            if self._ready:
+                return self._value
+            if self._error is not None and time.monotonic() < self._retry_at:
+                raise self._error
+            self._loading = True
+
+        start = time.perf_counter()
+        try:
+            value = self.loader()
+        except BaseException as e:
+            with self._cond:
+                self._failures += 1
+                self._error = e
+                self._retry_at = time.monotonic() + self._backoff
+                self._backoff = min(self._backoff * 2, BACKOFF_MAX_SECONDS)
+                self._last_load_seconds = time.perf_counter() - start
+                self._loading = False
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._loads += 1
+            self._value, self._ready, self._error = value, True, None
+            self._backoff = BACKOFF_INITIAL_SECONDS
+            self._last_load_seconds = time.perf_counter() - start
+            self._loading = False
+            self._cond.notify_all()
+        return value
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            state = 'ready' if self._ready else 'loading' if self._loading else 'failed' if self._error else 'idle'
+            return {
+                "name": self.name,
+                "state": state,
+                "loads": self._loads,
+                "failures": self._failures,
+                "last_load_seconds": self._last_load_seconds,
+                "waiting": self._waiters,
+                "max_waiting": self._max_waiters,
+                "total_waits": self._total_waits,
+                "last_error": repr(self._error) if self._error is not None else None,
+                "retry_in_seconds": max(0.0, self._retry_at - time.monotonic()) if self._error is not None else None,
+            }
+
+
+def resource_metrics() -> List[Dict[str, Any]]:
+    with _RESOURCES_LOCK:
+        resources = list(_RESOURCES)
+    return [r.metrics() for r in resources]
+
+
+class LazyModule:
+    """
+    Stands in for a module that is imported on first attribute access, so a serving module can
+    reference heavy dependencies (pandas, the model code) without paying for them at startup.
+    """
+    def __init__(self, name: str):
+        self._resource = LazyResource(f"import:{name}", lambda: importlib.import_module(name))
+
+    @property
+    def loaded(self) -> bool:
+        return self._resource.ready
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._resource.get(), attr)
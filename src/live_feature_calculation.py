@@ -1,14 +1,41 @@
 import math
+import logging
 import numpy as np
 import pandas as pd
 import os
 import joblib
 import time
-from typing import List, Tuple, Dict, Union
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import List, Tuple, Dict, Union, Optional
+
+from src.artifact_registry import (
+    REGISTRY_DIR,
+    REGISTRY_POLL_SECONDS,
+    SwapLock,
+    RegistryWatcher,
+    read_current_version,
+    load_version,
+)
+from src.feature_plan import (
+    FeaturePlan,
+    EMPTY_TEAM_ROWS,
+    compile_feature_plan,
+    validate_feature_plan,
+    ewma_base_stats,
+)
+from src.inference_threads import apply_serving_thread_policy, run_inference
+from src.single_flight import SingleFlight
+from src.micro_batching import MicroBatcher
+from src.lazy_resource import LazyResource
 
 # -----------------------------
 # Configuration & Globals
 # -----------------------------
+# per-fixture blending details, off the serving path unless DEBUG logging is enabled for this module
+logger = logging.getLogger(__name__)
+
 MODEL_ARTIFACTS = 'model_artifacts'
 DATA_ARTIFACTS = 'data_artifacts'
 MASTER_DATA = 'master_data_transformed.pkl'
@@ -18,6 +45,35 @@ MAIN_DF: pd.DataFrame = pd.DataFrame()
 FEATURE_LIST: List[str] = []
 MODELS: Dict[str, any] = {}
 LABELS = ['Away Win', 'Draw', 'Home Win']
+# Compiled (and validated against the scaler/models) whenever new artifacts are loaded
+FEATURE_PLAN: Optional[FeaturePlan] = None
+
+# Registry version currently served (None when serving the flat artifact folders)
+ACTIVE_VERSION: Optional[str] = None
+ACTIVE_MANIFEST: Dict[str, any] = {}
+# Requests read MAIN_DF/FEATURE_LIST/MODELS under the shared side, a hot swap replaces them under the exclusive side
+ARTIFACT_LOCK = SwapLock()
+# One activation at a time: the first-request load and the registry watcher both go through activate_version
+_ACTIVATION_LOCK = threading.Lock()
+_REGISTRY_WATCHER: Optional[RegistryWatcher] = None
+
+# Predictions (with their goal rates and derived markets) per (version, home, away, day)
+PREDICTION_CACHE_SIZE = 1024
+_PREDICTION_CACHE: "OrderedDict[Tuple, Dict[str, any]]" = OrderedDict()
+_PREDICTION_CACHE_LOCK = threading.Lock()
+# Concurrent cache misses of the same key share one computation
+PREDICTION_FLIGHT = SingleFlight()
+
+# Market lines exposed by the scoreline endpoint
+GOAL_LINES = [0.5, 1.5, 2.5, 3.5, 4.5]
+
+# All-pairs prediction matrix of the current clubs per (version, day), concurrent cold requests share one build
+_MATRIX_CACHE: Dict[Tuple, Dict[str, any]] = {}
+_MATRIX_CACHE_LOCK = threading.Lock()
+MATRIX_FLIGHT = SingleFlight()
+
+# SHARPENING: Use a lower T (more aggressive) for elite teams or mismatches (any other mode: T = 1)
+MODE_TEMPERATURE = {"ELITE": 0.8, "MISMATCH": 0.9, "GRIND": 0.7}
 
 # -----------------------------
 # Column Renaming Map
@@ -40,6 +96,41 @@ def poisson_prob(lmbda: float, k: int) -> float:
     if lmbda <= 0: return 1.0 if k == 0 else 0.0
     return math.exp(-lmbda) * (lmbda ** k) / math.factorial(k)
 
+def poisson_pmf(lambdas: np.ndarray, max_goals: int = 10) -> np.ndarray:
+    # vectorized poisson_prob: one row of P(k goals), k = 0..max_goals, per rate (rates <= 0 score 0 goals)
+    lambdas = np.maximum(0.0, np.asarray(lambdas, dtype=np.float64))[..., None]
+    k = np.arange(max_goals + 1)
+    factorials = np.array([math.factorial(i) for i in k], dtype=np.float64)
+    return np.exp(-lambdas) * lambdas ** k / factorials
+
+def scoreline_matrix(home_xg: np.ndarray, away_xg: np.ndarray, max_goals: int = 10) -> np.ndarray:
+    # P(home scores i, away scores j) for every fixture, shape (n_fixtures, max_goals + 1, max_goals + 1)
+    return poisson_pmf(home_xg, max_goals)[:, :, None] * poisson_pmf(away_xg, max_goals)[:, None, :]
+
+def scoreline_markets(home_xg: np.ndarray, away_xg: np.ndarray, max_goals: int = 10) -> Dict[str, np.ndarray]:
+    """
+    All scoreline-derived markets of many fixtures from one (n, max_goals+1, max_goals+1) matrix:
+    exact-score order, over/under lines, both teams to score and clean sheets.
+    """
+    M = scoreline_matrix(home_xg, away_xg, max_goals)
+    goals = np.arange(max_goals + 1)
+    total_goals = goals[:, None] + goals[None, :]
+    n = M.shape[0]
+    flat = M.reshape(n, -1)
+    over = np.stack([flat[:, (total_goals > line).ravel()].sum(axis=1) for line in GOAL_LINES], axis=1)
+    return {
+        'matrix': M,
+        'score_order': np.argsort(-flat, axis=1, kind='stable'),
+        'over': over,
+        'under': flat.sum(axis=1)[:, None] - over,
+        'btts': M[:, 1:, 1:].sum(axis=(1, 2)),
+        'home_clean_sheet': M[:, :, 0].sum(axis=1),
+        'away_clean_sheet': M[:, 0, :].sum(axis=1),
+        'home_win': np.tril(np.ones((max_goals + 1, max_goals + 1)), -1).ravel() @ flat.T,
+        'draw': np.trace(M, axis1=1, axis2=2),
+        'away_win': np.triu(np.ones((max_goals + 1, max_goals + 1)), 1).ravel() @ flat.T,
+    }
+
 def regression_to_outcome_prob(home_xg: float, away_xg: float, max_goals: int = 10) -> Dict[str, float]:
     home_win, draw, away_win = 0.0, 0.0, 0.0
     h_lambda = max(0, home_xg)
@@ -65,29 +156,84 @@ def blend_probabilities(class_probs: Dict[str, float], reg_probs: Dict[str, floa
 
     # SHARPENING: Use a lower T (more aggressive) for elite teams or mismatches
     # T=0.6 makes the leader MUCH more prominent
-    if mode == "ELITE":
-        T = 0.8
-    elif mode == "MISMATCH":
-        T = 0.9
-    elif mode == "GRIND":
-        T = 0.7
-    else: T = 1
+    T = MODE_TEMPERATURE.get(mode, 1)
     
     keys = list(blended.keys())
     vals = np.array([blended[k] for k in keys]) + 1e-9
     log_p = np.log(vals)
     sharpened = np.exp(log_p / T)
     sharpened /= sharpened.sum()
-    print(f"Temperature = {T}")
+    logger.debug("Temperature = %s", T)
 
     return dict(zip(keys, sharpened))
 
+def blend_probabilities_batch(class_probs: np.ndarray, reg_probs: np.ndarray, weight_class: np.ndarray,
+                              temperature: np.ndarray) -> np.ndarray:
+    # blend_probabilities for many fixtures, columns are (home_win, draw, away_win)
+    weight_class = weight_class[:, None]
+    blended = class_probs * weight_class + reg_probs * (1 - weight_class)
+    sharpened = np.exp(np.log(blended + 1e-9) / temperature[:, None])
+    return sharpened / sharpened.sum(axis=1, keepdims=True)
+
 # -----------------------------
 # Data & Model Loaders
 # -----------------------------
-def load_data_once():
-    global MAIN_DF, FEATURE_LIST
-    if not MAIN_DF.empty and FEATURE_LIST:
+def _prepare_master_df(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns=RENAME_MAP)
+    # Clean special characters from column names to match training
+    df.columns = [c.replace('>', '_GT_').replace('<', '_LT_').replace('.', '_') for c in df.columns]
+    
+    # Crucial: Fix date types to prevent infinite loading hangs
+    df['Date'] = pd.to_datetime(df['Date']).dt.tz_localize(None)
+    return df.sort_values('Date').reset_index(drop=True)
+
+def activate_version(version: str):
+    """
+    Loads a registry version completely (outside the swap lock), then swaps MODELS, MAIN_DF and
+    FEATURE_LIST together. In-flight requests finish on the artifacts they started with.
+    Activations are serialized, a version that is already active by the time it gets its turn is not loaded again.
+    """
+    global MAIN_DF, FEATURE_LIST, FEATURE_PLAN, MODELS, ACTIVE_VERSION, ACTIVE_MANIFEST
+    with _ACTIVATION_LOCK:
+        if version == ACTIVE_VERSION:
+            return
+        bundle = load_version(version, REGISTRY_DIR)
+        main_df = _prepare_master_df(bundle['master_df'])
+        plan = compile_feature_plan(bundle['features'], main_df)
+        validate_feature_plan(plan, bundle['models'])
+        apply_serving_thread_policy(bundle['models'])
+        print(f"Model version {version} loaded, swapping it in.")
+        with ARTIFACT_LOCK.swapping():
+            MAIN_DF = main_df
+            FEATURE_LIST = bundle['features']
+            FEATURE_PLAN = plan
+            MODELS = bundle['models']
+            ACTIVE_VERSION = version
+            ACTIVE_MANIFEST = bundle['manifest']
+
+def _load_from_registry() -> bool:
+    if ACTIVE_VERSION is not None:
+        return True
+    version = read_current_version(REGISTRY_DIR)
+    if version is None:
+        return False
+    activate_version(version)
+    return True
+
+def _load_from_registry_once() -> bool:
+    # True when the registry provided (data and models of) a version
+    return _REGISTRY_RESOURCE.get()
+
+def start_registry_watcher(interval: float = REGISTRY_POLL_SECONDS) -> RegistryWatcher:
+    global _REGISTRY_WATCHER
+    if _REGISTRY_WATCHER is None or not _REGISTRY_WATCHER.is_alive():
+        _REGISTRY_WATCHER = RegistryWatcher(activate_version, lambda: ACTIVE_VERSION, REGISTRY_DIR, interval)
+        _REGISTRY_WATCHER.start()
+    return _REGISTRY_WATCHER
+
+def _load_data():
+    global MAIN_DF, FEATURE_LIST, FEATURE_PLAN
+    if _load_from_registry_once():
         return
     
     data_path = os.path.join(DATA_ARTIFACTS, MASTER_DATA)
@@ -96,102 +242,83 @@ def load_data_once():
     if not os.path.exists(data_path) or not os.path.exists(features_path):
         raise FileNotFoundError("Critical data artifacts missing in data_artifacts folder.")
 
-    df = joblib.load(data_path)
-    df = df.rename(columns=RENAME_MAP)
-    # Clean special characters from column names to match training
-    df.columns = [c.replace('>', '_GT_').replace('<', '_LT_').replace('.', '_') for c in df.columns]
-    
-    # Crucial: Fix date types to prevent infinite loading hangs
-    df['Date'] = pd.to_datetime(df['Date']).dt.tz_localize(None)
-    MAIN_DF = df.sort_values('Date').reset_index(drop=True)
-    FEATURE_LIST = joblib.load(features_path)
+    main_df = _prepare_master_df(joblib.load(data_path))
+    features = joblib.load(features_path)
+    # a feature list that does not fit the data fails here, not on a request (the models are checked when they load)
+    plan = compile_feature_plan(features, main_df)
+    MAIN_DF, FEATURE_LIST, FEATURE_PLAN = main_df, features, plan
 
-def load_model_once():
+def load_data_once():
+    _DATA_RESOURCE.get()
+
+def _load_models():
     global MODELS
-    if MODELS: return
+    if _load_from_registry_once():
+        # picks up newly published model versions without a restart, once there are models to replace
+        start_registry_watcher()
+        return
+    # the models are validated against the feature plan, so the data comes first
+    load_data_once()
     model_dict = {
         'classification_model': os.path.join(MODEL_ARTIFACTS, 'xgb_model1.joblib'),
         'regression_home_model': os.path.join(MODEL_ARTIFACTS, 'rfr_home1.joblib'),
         'regression_away_model': os.path.join(MODEL_ARTIFACTS, 'rfr_away1.joblib'),
         'scaler': os.path.join(MODEL_ARTIFACTS, 'scaler1.joblib'),
     }
+    models = {}
     for name, path in model_dict.items():
         if os.path.exists(path):
-            MODELS[name] = joblib.load(path)
+            models[name] = joblib.load(path)
         else:
             print(f"Warning: Model file {path} not found.")
+    validate_feature_plan(FEATURE_PLAN, models)
+    MODELS = apply_serving_thread_policy(models)
+    start_registry_watcher()
+
+def load_model_once():
+    _MODEL_RESOURCE.get()
+
+# Each artifact set is loaded once, however many first requests arrive together
+_REGISTRY_RESOURCE = LazyResource('model_registry', _load_from_registry)
+_DATA_RESOURCE = LazyResource('prediction_data', _load_data)
+_MODEL_RESOURCE = LazyResource('prediction_models', _load_models)
 
 # -----------------------------
 # API Helper Functions
 # -----------------------------
 def get_all_teams() -> List[str]:
     load_data_once()
-    if MAIN_DF.empty: return []
-    teams = pd.concat([MAIN_DF['HomeTeam'], MAIN_DF['AwayTeam']]).unique()
+    df = MAIN_DF
+    if df.empty: return []
+    teams = pd.concat([df['HomeTeam'], df['AwayTeam']]).unique()
     return sorted(teams.tolist())
 
+def get_current_clubs() -> List[str]:
+    load_data_once()
+    df = MAIN_DF
+    current = df[df['season'] == df['season'].max()]
+    return sorted(set(current['HomeTeam']) | set(current['AwayTeam']))
+
 def get_base_features() -> Tuple[List[str], List[str]]:
-    diff_features = [col for col in FEATURE_LIST if col.endswith('_Diff')]
-    base_names = [col.replace('_Diff', '') for col in diff_features]
-    static_features = [col for col in FEATURE_LIST if not col.endswith('_Diff')]
-    return sorted(list(set(base_names))), static_features
+    load_data_once()
+    return FEATURE_PLAN.base_features, FEATURE_PLAN.static_features
 
 # -----------------------------
 # Internal Feature Extractors
 # -----------------------------
-def _get_historical_series(team: str, col_name: str, window: int) -> float:
-    mask = (MAIN_DF['HomeTeam'] == team) | (MAIN_DF['AwayTeam'] == team)
-    team_data = MAIN_DF[mask].tail(window)
-    if team_data.empty: return 0.0
-    vals = np.where(team_data['HomeTeam'] == team, team_data[f'HT_{col_name}'], team_data[f'AT_{col_name}'])
-    return float(np.nanmean(vals))
-
-def _get_rolling_team_stats(team: str, base_features: List[str], window: int = 8) -> Dict[str, float]:
-    mask = (MAIN_DF['HomeTeam'] == team) | (MAIN_DF['AwayTeam'] == team)
-    team_history = MAIN_DF[mask].tail(window)
-    if team_history.empty: return {base: 0.0 for base in base_features}
-    
-    is_home = (team_history['HomeTeam'] == team).values
-    stats = {}
-    for base in base_features:
-        h_col, a_col = f'HT_{base}', f'AT_{base}'
-        if h_col in team_history.columns and a_col in team_history.columns:
-            vals = np.where(is_home, team_history[h_col].values, team_history[a_col].values)
-            stats[base] = float(np.nanmean(vals))
-        else:
-            stats[base] = 0.0
-    return stats
-
-def _get_ewma_team_stats(team: str, base_features: List[str], span: int = 15) -> Dict[str, float]:
-    # We pull 7 games to ensure the EWMA calculation has enough historical 'momentum'
-    mask = (MAIN_DF['HomeTeam'] == team) | (MAIN_DF['AwayTeam'] == team)
-    team_history = MAIN_DF[mask].tail(10)
-    
-    if team_history.empty:
-        return {base: 0.0 for base in base_features}
-    
-    is_home = (team_history['HomeTeam'] == team).values
-    stats = {}
-    
-    for base in base_features:
-        h_col, a_col = f'HT_{base}', f'AT_{base}'
-        if h_col in team_history.columns and a_col in team_history.columns:
-            # Create a single chronological series of the team's performance
-            vals = pd.Series(np.where(is_home, team_history[h_col].values, team_history[a_col].values))
-            # Calculate Exponential Weighted Moving Average
-            # Using adjust=True ensures that we account for the relative weight of the start of the series
-            stats[base] = float(vals.ewm(span=span, adjust=True).mean().iloc[-1])
-        else:
-            stats[base] = 0.0
-            
-    return stats
-
-def _get_latest_metadata(team: str) -> Tuple[pd.Series, str]:
-    mask = (MAIN_DF['HomeTeam'] == team) | (MAIN_DF['AwayTeam'] == team)
-    team_history = MAIN_DF[mask]
-    if team_history.empty: raise ValueError(f"No metadata for team: {team}")
-    latest_row = team_history.iloc[-1]
-    prefix = 'HT_' if latest_row['HomeTeam'] == team else 'AT_'
+def _as_of_timestamp(as_of: Optional[Union[str, date, pd.Timestamp]]) -> Optional[pd.Timestamp]:
+    # point-in-time cut-off: only matches played strictly before it are used
+    return None if as_of is None else pd.Timestamp(as_of).tz_localize(None)
+
+def _get_recent_rows(team: str, window: int, as_of: Optional[pd.Timestamp] = None) -> Tuple[np.ndarray, np.ndarray]:
+    # binary search in the team's point-in-time index, MAIN_DF itself is never scanned or copied
+    return FEATURE_PLAN.team_index.get(team, EMPTY_TEAM_ROWS).window(window, as_of)
+
+def _get_latest_metadata(team: str, as_of: Optional[pd.Timestamp] = None) -> Tuple[pd.Series, str]:
+    rows, is_home = _get_recent_rows(team, 1, as_of)
+    if len(rows) == 0: raise ValueError(f"No metadata for team: {team}")
+    latest_row = MAIN_DF.iloc[rows[-1]]
+    prefix = 'HT_' if is_home[-1] else 'AT_'
     return latest_row, prefix
 
 def get_venue_performance_mod(home_team, away_team):
@@ -200,6 +327,9 @@ def get_venue_performance_mod(home_team, away_team):
     
     h_elo = float(h_row.get(f'{h_pre}elo', 1500))
     a_elo = float(a_row.get(f'{a_pre}elo', 1500))
+    return venue_mods_from_elo(h_elo, a_elo)
+
+def venue_mods_from_elo(h_elo: float, a_elo: float) -> Tuple[float, float]:
     elo_diff = h_elo - a_elo
 
     # 1. JUGGERNAUT PRIORITY (Elo >= 2000)
@@ -267,159 +397,335 @@ def compute_dynamic_weight(home_elo: float, away_elo: float) -> Tuple[float, str
     return weight_class, mode
 
 
-def calculate_features(home_team: str, away_team: str) -> pd.DataFrame:
-    load_data_once()
-    base_columns, static_features = get_base_features()
-    feature_dict = {col: 0.0 for col in FEATURE_LIST}
+def team_state_from_rows(rows: np.ndarray, is_home: np.ndarray, plan: FeaturePlan) -> Dict[str, any]:
+    """
+    Everything the feature builder needs from one team's history, given the MAIN_DF positions of
+    its most recent matches (chronological, at least the last 12) and whether it was at home in each.
+    A batch of fixtures reuses one state for every fixture the team plays in.
+    """
+    row = MAIN_DF.iloc[rows[-1]]
+    prefix = 'HT_' if is_home[-1] else 'AT_'
+    elo = float(row.get(f'{prefix}elo', 1500))
+    values = row.to_numpy()
+
+    # Static features: the team's own (HT_/AT_ by its latest venue) column, else the plain column, else 0.0
+    positions = np.where(plan.static_ht_pos >= 0, plan.static_ht_pos, plan.static_plain_pos) if prefix == 'HT_' \
+        else np.where(plan.static_at_pos >= 0, plan.static_at_pos, plan.static_plain_pos)
+    static_values = np.zeros(len(positions))
+    for i, pos in enumerate(positions):
+        if pos >= 0:
+            val = values[pos]
+            static_values[i] = float(val) if isinstance(val, (int, float, np.number)) else np.nan
 
-    # 1. Load Data for both teams using EWMA (Span 10)
-    h_stats = _get_ewma_team_stats(home_team, base_columns, span=15)
-    a_stats = _get_ewma_team_stats(away_team, base_columns, span=15)
-    h_row, h_pre = _get_latest_metadata(home_team)
-    a_row, a_pre = _get_latest_metadata(away_team)
+    return {
+        'elo': elo,
+        'opp_elo': row.get(f'{prefix}Avg_Opponent_Elo_L5', 1500),
+        # EWMA (Span 15 over the last 10 matches)
+        'ewma': ewma_base_stats(plan, rows[-10:], is_home[-10:], span=15),
+        'static': static_values,
+        # season xG base: mean over the last 12 matches
+        'xg_season': float(np.nanmean(np.where(is_home[-12:], MAIN_DF['HT_expected_goals'].to_numpy()[rows[-12:]],
+                                               MAIN_DF['AT_expected_goals'].to_numpy()[rows[-12:]]))),
+        'last_date': row['Date'],
+    }
 
-    # 2. Extract Elo and Strength of Schedule (SoS)
-    h_elo = float(h_row.get(f'{h_pre}elo', 1500))
-    a_elo = float(a_row.get(f'{a_pre}elo', 1500))
-    h_opp_elo = h_row.get(f'{h_pre}Avg_Opponent_Elo_L5', 1500)
-    a_opp_elo = a_row.get(f'{a_pre}Avg_Opponent_Elo_L5', 1500)
-    
-    sos_ratio = float(h_opp_elo) / float(a_opp_elo) if a_opp_elo > 0 else 1.0
-    h_boost = 1.0 + (max(0, h_elo - 1500) / 1000)
-    a_boost = 1.0 + (max(0, a_elo - 1500) / 1000)
-
-    # 3. Apply EWMA Stats Differences with Quality Adjustments
-    # Unified Adjustment Loop (Venue -> Difference -> Quality)
-    adjust_targets = ['touches_in_opposition_box', 'expected_goals', 'big_chances', 'possession']
-    h_mod, a_mod = get_venue_performance_mod(home_team, away_team)
-
-    for base in base_columns:
-        diff_key = f"{base}_Diff"
-        if diff_key in feature_dict:
-            h_val = h_stats.get(base, 0.0)
-            a_val = a_stats.get(base, 0.0)
-
-            if base.lower() in adjust_targets:
-                # Apply our stable venue modifiers
-                h_val *= h_mod
-                a_val *= a_mod
-            
-            raw_diff = h_val - a_val
+def _get_team_state(team: str, plan: FeaturePlan, as_of: Optional[pd.Timestamp] = None) -> Dict[str, any]:
+    rows, is_home = _get_recent_rows(team, 12, as_of)
+    if len(rows) == 0: raise ValueError(f"No metadata for team: {team}")
+    return team_state_from_rows(rows, is_home, plan)
 
-            # SOS and QUALITY are the 'Long Term' anchors. Keep these!
-            if base.lower() in adjust_targets:
-                raw_diff *= sos_ratio
-                # This ensures quality (Elo) is the multiplier, not the venue.
-                raw_diff *= (h_boost / a_boost)
-                
-            feature_dict[diff_key] = raw_diff
+def build_feature_matrix(pairs: List[Tuple[str, str]], as_of: Optional[pd.Timestamp] = None) -> np.ndarray:
+    """
+    Builds the unscaled feature rows (in FEATURE_LIST order) of many fixtures at once.
+    Team states are computed once per team, the fixtures are then filled column-wise.
+    With `as_of`, every team state (and the rest days) is taken as it was on that date.
+    """
+    load_data_once()
+    states = {team: _get_team_state(team, FEATURE_PLAN, as_of) for team in dict.fromkeys(t for pair in pairs for t in pair)}
+    today = as_of if as_of is not None else pd.Timestamp.now().tz_localize(None)
+    return assemble_feature_matrix([states[h] for h, _ in pairs], [states[a] for _, a in pairs], today)
 
-    # 4. CRITICAL: Pass the "Context" features to the model
-    feature_dict['HT_Home_Comfort'] = h_mod
-    feature_dict['AT_Away_Resilience'] = a_mod
+def assemble_feature_matrix(h_states: List[Dict[str, any]], a_states: List[Dict[str, any]],
+                            today: Union[pd.Timestamp, List[pd.Timestamp]]) -> np.ndarray:
+    """
+    Fills the feature rows of fixtures from the states of their home and away teams.
+    `today` (one date, or one per fixture) is the reference date for rest days.
+    """
+    plan = FEATURE_PLAN
+    n_pairs = len(h_states)
+    X = np.zeros((n_pairs, plan.n_features))
+
+    def set_feature(name: str, values):
+        slot = plan.derived_slots.get(name, -1)
+        if slot >= 0:
+            X[:, slot] = values
+
+    # 1. Elo and Strength of Schedule (SoS)
+    h_elo = np.array([st['elo'] for st in h_states])
+    a_elo = np.array([st['elo'] for st in a_states])
+    sos_ratio = np.array([float(h['opp_elo']) / float(a['opp_elo']) if a['opp_elo'] > 0 else 1.0
+                          for h, a in zip(h_states, a_states)])
+    h_boost = 1.0 + (np.maximum(0, h_elo - 1500) / 1000)
+    a_boost = 1.0 + (np.maximum(0, a_elo - 1500) / 1000)
+    mods = np.array([venue_mods_from_elo(h, a) for h, a in zip(h_elo, a_elo)]).reshape(-1, 2)
+    h_mod, a_mod = mods[:, 0], mods[:, 1]
+
+    # 2. EWMA Stats Differences with Quality Adjustments
+    # Unified Adjustment (Venue -> Difference -> Quality), only on the adjust targets of the plan
+    h_stats = np.array([st['ewma'] for st in h_states]).reshape(n_pairs, -1)
+    a_stats = np.array([st['ewma'] for st in a_states]).reshape(n_pairs, -1)
+    adjust = plan.adjust_mask
+    raw_diff = np.where(adjust, h_stats * h_mod[:, None], h_stats) - np.where(adjust, a_stats * a_mod[:, None], a_stats)
+    # SOS and QUALITY are the 'Long Term' anchors. Keep these!
+    # This ensures quality (Elo) is the multiplier, not the venue.
+    X[:, plan.diff_slots] = np.where(adjust, raw_diff * sos_ratio[:, None] * (h_boost / a_boost)[:, None], raw_diff)
+
+    # 3. CRITICAL: Pass the "Context" features to the model
+    set_feature('HT_Home_Comfort', h_mod)
+    set_feature('AT_Away_Resilience', a_mod)
 
     # 4. Correct Static Feature Handling (The primary fix for the Draw Trap)
-    for col in static_features:
-        if feature_dict.get(col, 0.0) == 0.0:
-            # If the feature is team-specific (like elo, rating, or season points)
-            # we must provide the DIFFERENCE. If it's neutral (like league ID), use Home val.
-            h_val = h_row.get(f'{h_pre}{col}', h_row.get(col, 0.0))
-            a_val = a_row.get(f'{a_pre}{col}', a_row.get(col, 0.0))
-            
-            if isinstance(h_val, (int, float, np.number)):
-                feature_dict[col] = float(h_val) - float(a_val)
-            else:
-                feature_dict[col] = h_val
+    # Team-specific features (like elo, rating, or season points) get the DIFFERENCE,
+    # slots already filled above (the context features) are kept.
+    static_block = X[:, plan.static_slots]
+    static_diff = np.array([h['static'] for h in h_states]).reshape(n_pairs, -1) - \
+        np.array([a['static'] for a in a_states]).reshape(n_pairs, -1)
+    X[:, plan.static_slots] = np.where(static_block == 0.0, static_diff, static_block)
 
     # 5. Derived "Gold" Features
-    feature_dict['SoS_Ratio'] = sos_ratio
-    feature_dict['Elo_Gap_Diff'] = h_elo - a_elo
-    feature_dict['Elo_Gap_Absolute'] = abs(h_elo - a_elo)
-    feature_dict['Elo_Symmetry'] = np.exp(-abs(h_elo - a_elo) / 50)
+    set_feature('SoS_Ratio', sos_ratio)
+    set_feature('Elo_Gap_Diff', h_elo - a_elo)
+    set_feature('Elo_Gap_Absolute', np.abs(h_elo - a_elo))
+    set_feature('Elo_Symmetry', np.exp(-np.abs(h_elo - a_elo) / 50))
     
-    h_xg_season = _get_historical_series(home_team, 'expected_goals', 12)
-    a_xg_season = _get_historical_series(away_team, 'expected_goals', 12)
-    feature_dict['HT_xG_Season_Base'] = h_xg_season
-    feature_dict['AT_xG_Season_Base'] = a_xg_season
-    feature_dict['Season_Class_Diff'] = h_xg_season - a_xg_season
+    h_xg_season = np.array([st['xg_season'] for st in h_states])
+    a_xg_season = np.array([st['xg_season'] for st in a_states])
+    set_feature('HT_xG_Season_Base', h_xg_season)
+    set_feature('AT_xG_Season_Base', a_xg_season)
+    set_feature('Season_Class_Diff', h_xg_season - a_xg_season)
     
     # 6. Date Logic
-    today = pd.Timestamp.now().tz_localize(None)
-    h_last_date = h_row['Date']
-    a_last_date = a_row['Date']
-    feature_dict['Rest_Days_Diff'] = min(14, (today - h_last_date).days) - min(14, (today - a_last_date).days)
-    
-    feature_dict['Quality_Index_Diff'] = feature_dict.get('expected_goals_Diff', 0.0)
+    dates = today if isinstance(today, list) else [today] * n_pairs
+    h_rest = np.array([min(14, (d - st['last_date']).days) for d, st in zip(dates, h_states)])
+    a_rest = np.array([min(14, (d - st['last_date']).days) for d, st in zip(dates, a_states)])
+    set_feature('Rest_Days_Diff', h_rest - a_rest)
     
-    # 7. Scaling Clamps
-    # Clamping prevents extreme outliers but allows elite teams to stand out
-    # clip_val = 4 if (h_elo > 1875 or a_elo > 1875) else 1.5
-    # for col in ['xg_on_targetot_Diff']:
-    #     if col in feature_dict:
-    #         feature_dict[col] = np.clip(feature_dict[col], -clip_val, clip_val)
-
-    # 8. Final DataFrame Assembly
-    final_df = pd.DataFrame([feature_dict])
-    
-    # Ensure all columns exist and are in the correct order for the model
-    for col in FEATURE_LIST:
-        if col not in final_df.columns:
-            final_df[col] = 0.0
-            
-    return final_df[FEATURE_LIST].fillna(0.0)
+    xg_slot = plan.derived_slots['expected_goals_Diff']
+    set_feature('Quality_Index_Diff', X[:, xg_slot] if xg_slot >= 0 else 0.0)
+
+    # 7. Clean-up (NaN -> 0.0), columns are already complete and in model order
+    X[np.isnan(X)] = 0.0
+    return X
+
+def calculate_features(home_team: str, away_team: str, as_of: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    X = build_feature_matrix([(home_team, away_team)], as_of)
+    return pd.DataFrame(X, columns=FEATURE_PLAN.columns)
+
+def scale_features(X: np.ndarray) -> pd.DataFrame:
+    scaler = MODELS.get('scaler')
+    values = scaler.transform(pd.DataFrame(X, columns=FEATURE_PLAN.columns)) if scaler else X
+    return pd.DataFrame(values, columns=FEATURE_PLAN.columns)
+
+def predict_goal_rates(pairs: List[Tuple[str, str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Expected home/away goals (the regression λs) of many fixtures: one feature matrix build,
+    one scaler call and one call per regressor.
+    """
+    load_model_once()
+    load_data_once()
+    with ARTIFACT_LOCK.reading():
+        X_scaled = scale_features(build_feature_matrix(pairs))
+        return (run_inference(MODELS['regression_home_model'].predict, X_scaled),
+                run_inference(MODELS['regression_away_model'].predict, X_scaled))
+
+def get_artifact_version() -> str:
+    # cache key for anything derived from the served artifacts
+    return ACTIVE_VERSION or 'local'
 
 # -----------------------------
 # Public API Entry Point
 # -----------------------------
 
-def predict_match(home: str, away: str) -> Dict[str, Union[str, float, Dict[str, float]]]:
+def _get_prediction_entry(home: str, away: str, as_of: Optional[pd.Timestamp] = None) -> Dict[str, any]:
     load_model_once()
     load_data_once()
+    # the whole prediction runs against one artifact version, a concurrent hot swap waits for it
+    with ARTIFACT_LOCK.reading():
+        # rest days depend on today's date, so a live prediction is only valid for the day;
+        # a point-in-time prediction is fixed by its cut-off
+        key = (get_artifact_version(), home, away, 'live', pd.Timestamp.now().date()) if as_of is None \
+            else (get_artifact_version(), home, away, 'as_of', as_of)
+        with _PREDICTION_CACHE_LOCK:
+            entry = _PREDICTION_CACHE.get(key)
+            if entry is not None:
+                _PREDICTION_CACHE.move_to_end(key)
+                return entry
+
+        def compute() -> Dict[str, any]:
+            # batched with the other fixtures requested within the same few milliseconds
+            prediction, h_goals, a_goals = PREDICTION_BATCHER.submit((home, away, as_of))
+            entry = {'prediction': prediction, 'home_xg': float(h_goals), 'away_xg': float(a_goals)}
+            with _PREDICTION_CACHE_LOCK:
+                _PREDICTION_CACHE[key] = entry
+                while len(_PREDICTION_CACHE) > PREDICTION_CACHE_SIZE:
+                    _PREDICTION_CACHE.popitem(last=False)
+            return entry
+
+        # identical requests arriving while this one computes wait for it instead of computing again
+        return PREDICTION_FLIGHT.do(key, compute)
+
+def predict_match(home: str, away: str,
+                  as_of: Optional[Union[str, date, pd.Timestamp]] = None) -> Dict[str, Union[str, float, Dict[str, float]]]:
+    """
+    Blended prediction of home vs away. With `as_of`, both teams are taken as they were before that
+    date (only matches played strictly earlier count), e.g. what the model said before a past kickoff.
+    """
+    return _get_prediction_entry(home, away, _as_of_timestamp(as_of))['prediction']
 
-    # 1. Detect Elite/Mismatch
-    h_row, h_pre = _get_latest_metadata(home)
-    a_row, a_pre = _get_latest_metadata(away)
-    h_elo_raw = h_row.get(f'{h_pre}elo', 1500)
-    a_elo_raw = a_row.get(f'{a_pre}elo', 1500)
+def predict_matrix() -> Dict[str, any]:
+    """
+    Blended home/draw/away probabilities and expected goals for every ordered pair of current clubs,
+    in one batched pass: one feature matrix build, one scaler call and one call per model.
+    Grids are indexed [home club][away club] in the order of `clubs`, the diagonal is null.
+    """
+    load_model_once()
+    load_data_once()
+    with ARTIFACT_LOCK.reading():
+        key = (get_artifact_version(), pd.Timestamp.now().date())
+        with _MATRIX_CACHE_LOCK:
+            cached = _MATRIX_CACHE.get(key)
+        if cached is not None:
+            return cached
+        # one build per key however many cold requests arrive, the others wait for it
+        return MATRIX_FLIGHT.do(key, lambda: _build_prediction_matrix(key))
+
+def _build_prediction_matrix(key: Tuple) -> Dict[str, any]:
+    # the read side is re-entrant: called from predict_matrix, which already holds it for this version
+    with ARTIFACT_LOCK.reading():
+        clubs = get_current_clubs()
+        pairs = [(h, a) for h in clubs for a in clubs if h != a]
+        X_scaled = scale_features(build_feature_matrix(pairs))
+        c_probs = run_inference(MODELS['classification_model'].predict_proba, X_scaled)
+        h_goals = run_inference(MODELS['regression_home_model'].predict, X_scaled)
+        a_goals = run_inference(MODELS['regression_away_model'].predict, X_scaled)
+
+        elos = {}
+        for club in clubs:
+            row, prefix = _get_latest_metadata(club)
+            elos[club] = float(row.get(f'{prefix}elo', 1500))
+
+    markets = scoreline_markets(h_goals, a_goals)
+    reg_probs = np.column_stack([markets['home_win'], markets['draw'], markets['away_win']])
+    weights, temperatures = np.empty(len(pairs)), np.empty(len(pairs))
+    for i, (h, a) in enumerate(pairs):
+        weights[i], mode = compute_dynamic_weight(elos[h], elos[a])
+        temperatures[i] = MODE_TEMPERATURE.get(mode, 1)
+    # classifier columns are (away, draw, home)
+    blended = blend_probabilities_batch(c_probs[:, ::-1], reg_probs, weights, temperatures)
+
+    n = len(clubs)
+    grids = {name: [[None] * n for _ in range(n)] for name in ('home_win', 'draw', 'away_win', 'home_xg', 'away_xg')}
+    club_idx = {club: i for i, club in enumerate(clubs)}
+    for k, (h, a) in enumerate(pairs):
+        i, j = club_idx[h], club_idx[a]
+        grids['home_win'][i][j] = float(blended[k, 0])
+        grids['draw'][i][j] = float(blended[k, 1])
+        grids['away_win'][i][j] = float(blended[k, 2])
+        grids['home_xg'][i][j] = float(h_goals[k])
+        grids['away_xg'][i][j] = float(a_goals[k])
+
+    result = {"model_version": key[0], "clubs": clubs, **grids}
+    with _MATRIX_CACHE_LOCK:
+        # only the current (version, day) is kept
+        _MATRIX_CACHE.clear()
+        _MATRIX_CACHE[key] = result
+    return result
+
+def predict_scorelines(home: str, away: str, top_n: int = 10,
+                       as_of: Optional[Union[str, date, pd.Timestamp]] = None) -> Dict[str, any]:
+    """
+    Exact-score, over/under, BTTS and clean-sheet probabilities from the same regression λs as
+    predict_match. The markets are computed once and cached with the prediction.
+    """
+    entry = _get_prediction_entry(home, away, _as_of_timestamp(as_of))
+    # the entry is shared through the prediction cache, single-flight and batcher: read and store under the cache lock
+    with _PREDICTION_CACHE_LOCK:
+        markets = entry.get('markets')
+    if markets is None:
+        m = scoreline_markets(np.array([entry['home_xg']]), np.array([entry['away_xg']]))
+        size = m['matrix'].shape[1]
+        probs = m['matrix'][0].ravel()
+        markets = {
+            "expected_goals": {"home": entry['home_xg'], "away": entry['away_xg']},
+            "scorelines": [
+                {"score": f"{idx // size} - {idx % size}", "home_goals": int(idx // size),
+                 "away_goals": int(idx % size), "probability": float(probs[idx])}
+                for idx in m['score_order'][0]
+            ],
+            "over_under": {
+                str(line): {"over": float(m['over'][0, i]), "under": float(m['under'][0, i])}
+                for i, line in enumerate(GOAL_LINES)
+            },
+            "both_teams_to_score": {"yes": float(m['btts'][0]), "no": float(probs.sum() - m['btts'][0])},
+            "clean_sheet": {"home": float(m['home_clean_sheet'][0]), "away": float(m['away_clean_sheet'][0])},
+            "outcome_probabilities": {"home_win": float(m['home_win'][0]), "draw": float(m['draw'][0]),
+                                      "away_win": float(m['away_win'][0])},
+        }
+        with _PREDICTION_CACHE_LOCK:
+            # a concurrent request may have stored them meanwhile, every caller serves the same object
+            markets = entry.setdefault('markets', markets)
 
-    h_elo = float(h_elo_raw)
-    a_elo = float(a_elo_raw)
+    return {
+        "home_team": home,
+        "away_team": away,
+        "expected_goals": markets["expected_goals"],
+        "top_scorelines": markets["scorelines"][:top_n],
+        "over_under": markets["over_under"],
+        "both_teams_to_score": markets["both_teams_to_score"],
+        "clean_sheet": markets["clean_sheet"],
+        "outcome_probabilities": markets["outcome_probabilities"],
+    }
 
-    # --- SMART WEIGHTING SYSTEM ---
-    avg_elo = (h_elo + a_elo) / 2
-    elo_diff = abs(h_elo - a_elo) 
-    
-    X_live = calculate_features(home, away)
+def _predict_matches(requests: List[Tuple[str, str, Optional[pd.Timestamp]]]) -> List[Tuple[Dict[str, Union[str, float, Dict[str, float]]], float, float]]:
+    """
+    Predictions of many (home, away, as_of) requests with one scaler call and one call per model.
+    Each result is exactly what _predict_match returns for the request on its own.
+    """
+    # Columns, order and float dtype are guaranteed by the feature plan validated at load
+    X = np.zeros((len(requests), FEATURE_PLAN.n_features))
+    groups: Dict[Optional[pd.Timestamp], List[int]] = {}
+    for i, (_, _, as_of) in enumerate(requests):
+        groups.setdefault(as_of, []).append(i)
+    for as_of, idx in groups.items():
+        X[idx] = build_feature_matrix([requests[i][:2] for i in idx], as_of)
 
-    # ------------------ CRITICAL FEATURE ALIGNMENT ------------------
+    # ------------------ SCALING ------------------
+    X_scaled = scale_features(X)
 
-    # 1. Add any missing columns
-    for col in FEATURE_LIST:
-        if col not in X_live.columns:
-            X_live[col] = 0.0
+    # 3. Classification Path / 4. Regression Path
+    c_probs = run_inference(MODELS['classification_model'].predict_proba, X_scaled)
+    h_goals = run_inference(MODELS['regression_home_model'].predict, X_scaled)
+    a_goals = run_inference(MODELS['regression_away_model'].predict, X_scaled)
+    return [_format_prediction(home, away, as_of, c_probs[i], h_goals[i], a_goals[i])
+            for i, (home, away, as_of) in enumerate(requests)]
 
-    # 2. Remove extra columns
-    X_live = X_live[FEATURE_LIST]
+def _predict_match(home: str, away: str,
+                   as_of: Optional[pd.Timestamp] = None) -> Tuple[Dict[str, Union[str, float, Dict[str, float]]], float, float]:
+    return _predict_matches([(home, away, as_of)])[0]
 
-    # 3. Enforce float type (very important for scaler consistency)
-    X_live = X_live.astype(float)
+def _format_prediction(home: str, away: str, as_of: Optional[pd.Timestamp], c_probs: np.ndarray, h_goals: float,
+                       a_goals: float) -> Tuple[Dict[str, Union[str, float, Dict[str, float]]], float, float]:
 
-    # ------------------ SCALING ------------------
-    scaler = MODELS.get('scaler')
-    X_live_scaled = pd.DataFrame(
-        scaler.transform(X_live),
-        columns=FEATURE_LIST
-    ) if scaler else X_live
+    # 1. Detect Elite/Mismatch
+    h_row, h_pre = _get_latest_metadata(home, as_of)
+    a_row, a_pre = _get_latest_metadata(away, as_of)
+    h_elo_raw = h_row.get(f'{h_pre}elo', 1500)
+    a_elo_raw = a_row.get(f'{a_pre}elo', 1500)
 
+    h_elo = float(h_elo_raw)
+    a_elo = float(a_elo_raw)
 
-    # 3. Classification Path
-    c_model = MODELS['classification_model']
-    c_probs = c_model.predict_proba(X_live_scaled)[0]
     class_probs_dict = {"away_win": float(c_probs[0]), "draw": float(c_probs[1]), "home_win": float(c_probs[2])}
-
-    # 4. Regression Path
-    h_goals = MODELS['regression_home_model'].predict(X_live_scaled)[0]
-    a_goals = MODELS['regression_away_model'].predict(X_live_scaled)[0]
     reg_probs = regression_to_outcome_prob(h_goals, a_goals)
 
     # 5. Logic Evaluation
@@ -427,9 +733,9 @@ def predict_match(home: str, away: str) -> Dict[str, Union[str, float, Dict[str,
     is_mismatch = abs(elo_diff) > 150
     is_elite = (h_elo > 1875) or (a_elo > 1875)
 
-    # DEBUG PRINT: This will show you why the weight is failing
-    print(f"{home} : ({h_elo}) vs {away} : ({a_elo}) ||| ELO DIFF = {elo_diff}")
-    print(f"Elite: {is_elite}, Mismatch: {is_mismatch}")
+    # DEBUG: This will show you why the weight is failing
+    logger.debug("%s : (%s) vs %s : (%s) ||| ELO DIFF = %s", home, h_elo, away, a_elo, elo_diff)
+    logger.debug("Elite: %s, Mismatch: %s", is_elite, is_mismatch)
     weight_class, mode = compute_dynamic_weight(h_elo, a_elo)
 
     blended_probs = blend_probabilities(
@@ -437,13 +743,13 @@ def predict_match(home: str, away: str) -> Dict[str, Union[str, float, Dict[str,
         weight_class=weight_class,
         mode=mode
     )
-    print(f"Mode: {mode} | Weight: {weight_class}")
+    logger.debug("Mode: %s | Weight: %s", mode, weight_class)
 
     # 4. Final Decision
     final_label = max(blended_probs, key=blended_probs.get)
     winner_blended = away if final_label == "away_win" else home if final_label == "home_win" else "Draw"
 
-    return {
+    prediction = {
         "home_team": home,
         "away_team": away,
         "scoreline": f"{round(max(0, h_goals))} - {round(max(0, a_goals))}",
@@ -456,6 +762,9 @@ def predict_match(home: str, away: str) -> Dict[str, Union[str, float, Dict[str,
         "predicted_winner_blended": winner_blended,
         "blending_weights": {"classification": weight_class, "regression": 1 - weight_class},
     }
+    if as_of is not None:
+        prediction["as_of"] = as_of.isoformat()
+    return prediction, h_goals, a_goals
 
 
 def debug_team_modifiers(team_a: str, team_b: str):
@@ -498,5 +807,11 @@ def debug_team_modifiers(team_a: str, team_b: str):
     print(f"="*45)
 
 
+# Distinct fixtures requested concurrently share one feature matrix and one pass through the models.
+# The worker takes no lock of its own: every submitter holds ARTIFACT_LOCK.reading() while it waits,
+# so a hot swap cannot start before the batch is done.
+PREDICTION_BATCHER = MicroBatcher(_predict_matches, name='prediction-batcher')
+
+
 if __name__ == "__main__":
-    debug_team_modifiers("Tottenham", "Arsenal")
\ No newline at end of file
+    debug_team_modifiers("Tottenham", "Arsenal")
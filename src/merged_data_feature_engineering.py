@@ -1,8 +1,7 @@
-import warnings
 import numpy as np
 import pandas as pd
-from typing import Tuple
-warnings.simplefilter(action='ignore', category=pd.errors.PerformanceWarning)
+from typing import Dict, Tuple
+from relational_data import grouped_shifted_rolling_mean
 
 RAW_STATS = ['HTHG', 'HTAG', 'HTR', 'Referee', 'home_score', 'away_score', 'gameweek', 'finished', 'match_url',
        'home_total_shots', 'away_total_shots', 'home_shots_on_target', 'away_shots_on_target',
@@ -69,247 +68,195 @@ def merged_data_cleaning(merged_data: pd.DataFrame) -> pd.DataFrame:
     print(f"1. Imputed {len(cols_to_impute)} columns with 0 to handle the null values.\n")
     return merged_data
 
-import pandas as pd
+# builds one long-format timeline (one row per team per match, sorted by team and date) shared by all per-team features
+# 'row' points back at the fixture in the match-level frame so that results can be written back positionally
+def build_team_timeline(df: pd.DataFrame) -> pd.DataFrame:
+    rows = np.arange(len(df))
+    timeline = pd.DataFrame({
+        'row': np.concatenate([rows, rows]),
+        'is_home': np.repeat([True, False], len(df)),
+        'Date': np.concatenate([df['Date'].to_numpy(), df['Date'].to_numpy()]),
+        'Team': np.concatenate([df['HomeTeam'].to_numpy(), df['AwayTeam'].to_numpy()]),
+        'Opp_Elo': np.concatenate([df['AT_elo'].to_numpy(dtype=float), df['HT_elo'].to_numpy(dtype=float)]),
+        'xG': np.concatenate([
+            df['home_expected_goals_xg'].to_numpy(dtype=float),
+            df['away_expected_goals_xg'].to_numpy(dtype=float)
+        ])
+    })
+    return timeline.sort_values(['Team', 'Date'], kind='stable').reset_index(drop=True)
+
+# accepts the match-level frame sorted by date
+# returns the rest days, average opponent Elo (last 5) and xG season base (last 15) of both sides of every fixture
+def team_timeline_features(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    timeline = build_team_timeline(df)
+    teams = timeline['Team'].to_numpy()
+    is_first_match = np.ones(len(timeline), dtype=bool)
+    is_first_match[1:] = teams[1:] != teams[:-1]
+
+    # clipped at 14 as if rest days >= 14, it accounts for international break etc so the effect of fatigueness saturates
+    rest_days = timeline['Date'].diff().dt.days.to_numpy(dtype=float)
+    rest_days[is_first_match] = np.nan
+    rest_days = np.minimum(np.nan_to_num(rest_days, nan=14), 14)
+
+    # both rolling means are shifted by one match to avoid leakage
+    opponent_elo = grouped_shifted_rolling_mean(timeline[['Opp_Elo']].to_numpy(), teams, window=5)[:, 0]
+    xg_season_base = grouped_shifted_rolling_mean(timeline[['xG']].to_numpy(), teams, window=15)[:, 0]
+
+    is_home = timeline['is_home'].to_numpy()
+    home_rows = timeline['row'].to_numpy()[is_home]
+    away_rows = timeline['row'].to_numpy()[~is_home]
+    features = {}
+    for name, values, default in (('Rest', rest_days, 14), ('Avg_Opponent_Elo_L5', opponent_elo, 1500),
+                                  ('xG_Season_Base', xg_season_base, 1.2)):
+        values = np.nan_to_num(values, nan=default)
+        features[f'HT_{name}'] = np.empty(len(df))
+        features[f'AT_{name}'] = np.empty(len(df))
+        features[f'HT_{name}'][home_rows] = values[is_home]
+        features[f'AT_{name}'][away_rows] = values[~is_home]
+    return features
 
 def merged_data_feature_manipulation(clean_merged_data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
     print("Performing feature engineering and reduction:")
-    
-    # 1. REST DAYS (FATIGUE)
-    clean_merged_data['Date'] = pd.to_datetime(clean_merged_data['Date'])
-    clean_merged_data = clean_merged_data.sort_values(['Date'])
-    
-    def get_rest_days(df):
-        # Create a helper to track last match date for every team
-        mask = pd.concat([
-            df[['Date', 'HomeTeam']].rename(columns={'HomeTeam': 'Team'}),
-            df[['Date', 'AwayTeam']].rename(columns={'AwayTeam': 'Team'})
-        ]).sort_values(['Team', 'Date'])
-        
-        mask['Last_Match'] = mask.groupby('Team')['Date'].shift(1)
-        mask['Rest_Days'] = (mask['Date'] - mask['Last_Match']).dt.days.fillna(14)
-        # Only clip the numeric column, not the whole dataframe
-        # clipped at 14 as if rest days >= 14, it accounts for international break etc so the effect of fatigueness saturates
-        mask['Rest_Days'] = mask['Rest_Days'].clip(upper=14)
-        return mask
-
-    rest_df = get_rest_days(clean_merged_data)
-
-    # Merge carefully to avoid Date_x / Date_y issues
-    clean_merged_data = clean_merged_data.merge(
-        rest_df[['Date', 'Team', 'Rest_Days']], 
-        left_on=['Date', 'HomeTeam'], right_on=['Date', 'Team'], how='left'
-    ).rename(columns={'Rest_Days': 'HT_Rest'}).drop(columns='Team')
-    
-    clean_merged_data = clean_merged_data.merge(
-        rest_df[['Date', 'Team', 'Rest_Days']], 
-        left_on=['Date', 'AwayTeam'], right_on=['Date', 'Team'], how='left'
-    ).rename(columns={'Rest_Days': 'AT_Rest'}).drop(columns='Team')
-    
-    clean_merged_data['Rest_Days_Diff'] = clean_merged_data['HT_Rest'] - clean_merged_data['AT_Rest']
-
-    # 2. STRENGTH OF SCHEDULE (SoS) / AVG OPPONENT ELO
-    home_side = clean_merged_data[['Date', 'HomeTeam', 'AwayTeam', 'AT_elo']].rename(
-        columns={'HomeTeam': 'Team', 'AwayTeam': 'Opponent', 'AT_elo': 'Opp_Elo'}
-    )
-    away_side = clean_merged_data[['Date', 'AwayTeam', 'HomeTeam', 'HT_elo']].rename(
-        columns={'AwayTeam': 'Team', 'HomeTeam': 'Opponent', 'HT_elo': 'Opp_Elo'}
-    )
-    
-    all_games = pd.concat([home_side, away_side]).sort_values(['Team', 'Date'])
-    all_games['Avg_Opponent_Elo_L5'] = all_games.groupby('Team')['Opp_Elo'].transform(
-        lambda x: x.shift(1).rolling(window=5, min_periods=1).mean()
-    )
+    # every derived column is collected here and attached with a single concat at the end,
+    # instead of inserting hundreds of columns one at a time into the (fragmenting) frame
+    derived: Dict[str, np.ndarray] = {}
 
-    clean_merged_data = clean_merged_data.merge(
-        all_games[['Date', 'Team', 'Avg_Opponent_Elo_L5']], 
-        left_on=['Date', 'HomeTeam'], right_on=['Date', 'Team'], how='left'
-    ).rename(columns={'Avg_Opponent_Elo_L5': 'HT_Avg_Opponent_Elo_L5'}).drop(columns=['Team'])
+    clean_merged_data['Date'] = pd.to_datetime(clean_merged_data['Date'])
+    clean_merged_data = clean_merged_data.sort_values(['Date']).reset_index(drop=True)
+    team_features = team_timeline_features(clean_merged_data)
 
-    clean_merged_data = clean_merged_data.merge(
-        all_games[['Date', 'Team', 'Avg_Opponent_Elo_L5']], 
-        left_on=['Date', 'AwayTeam'], right_on=['Date', 'Team'], how='left'
-    ).rename(columns={'Avg_Opponent_Elo_L5': 'AT_Avg_Opponent_Elo_L5'}).drop(columns=['Team'])
+    # 1. REST DAYS (FATIGUE)
+    derived['HT_Rest'] = team_features['HT_Rest']
+    derived['AT_Rest'] = team_features['AT_Rest']
+    derived['Rest_Days_Diff'] = derived['HT_Rest'] - derived['AT_Rest']
 
-    clean_merged_data['HT_Avg_Opponent_Elo_L5'] = clean_merged_data['HT_Avg_Opponent_Elo_L5'].fillna(1500)
-    clean_merged_data['AT_Avg_Opponent_Elo_L5'] = clean_merged_data['AT_Avg_Opponent_Elo_L5'].fillna(1500)
+    # 2. STRENGTH OF SCHEDULE (SoS) / AVG OPPONENT ELO
+    derived['HT_Avg_Opponent_Elo_L5'] = team_features['HT_Avg_Opponent_Elo_L5']
+    derived['AT_Avg_Opponent_Elo_L5'] = team_features['AT_Avg_Opponent_Elo_L5']
 
     # 3. STRENGTH OF SCHEDULE NORMALIZATION
     # useful in analyzing if the home team has faced tougher or weaker opponents in the last 5 matches, compared to the away team
-    clean_merged_data['SoS_Ratio'] = clean_merged_data['HT_Avg_Opponent_Elo_L5'] / clean_merged_data['AT_Avg_Opponent_Elo_L5']
+    # clipped to keep SoS stable
+    derived['SoS_Ratio'] = np.clip(derived['HT_Avg_Opponent_Elo_L5'] / derived['AT_Avg_Opponent_Elo_L5'], 0.7, 1.3)
 
     # 4. ELO QUALITY GAP
     if 'ht_match_elo' in clean_merged_data.columns and 'at_match_elo' in clean_merged_data.columns:
-        clean_merged_data['Elo_Gap_Diff'] = clean_merged_data['ht_match_elo'] - clean_merged_data['at_match_elo']
-        clean_merged_data['Elo_Gap_Absolute'] = clean_merged_data['Elo_Gap_Diff'].abs()
+        derived['Elo_Gap_Diff'] = (clean_merged_data['ht_match_elo'] - clean_merged_data['at_match_elo']).to_numpy()
+        derived['Elo_Gap_Absolute'] = np.abs(derived['Elo_Gap_Diff'])
 
     # 5. HOME ADVANTAGE / VENUE STRENGTH
     if 'HG_HT_AvgGF_L5' in clean_merged_data.columns and 'AG_AT_AvgGF_L5' in clean_merged_data.columns:
-        clean_merged_data['Venue_GF_Diff'] = clean_merged_data['HG_HT_AvgGF_L5'] - clean_merged_data['AG_AT_AvgGF_L5']
-        clean_merged_data['Venue_GA_Diff'] = clean_merged_data['HG_HT_AvgGA_L5'] - clean_merged_data['AG_AT_AvgGA_L5']
+        derived['Venue_GF_Diff'] = (clean_merged_data['HG_HT_AvgGF_L5'] - clean_merged_data['AG_AT_AvgGF_L5']).to_numpy()
+        derived['Venue_GA_Diff'] = (clean_merged_data['HG_HT_AvgGA_L5'] - clean_merged_data['AG_AT_AvgGA_L5']).to_numpy()
 
     # 6. GOALKEEPER EFFICIENCY
     if 'HT_GK_L5_Avg_xgot_faced' in clean_merged_data.columns:
         ht_eff = clean_merged_data['HT_GK_L5_Avg_xgot_faced'] - clean_merged_data['HT_GK_L5_Avg_goals_conceded']
         at_eff = clean_merged_data['AT_GK_L5_Avg_xgot_faced'] - clean_merged_data['AT_GK_L5_Avg_goals_conceded']
-        clean_merged_data['GK_Efficiency_Diff'] = ht_eff - at_eff
+        derived['GK_Efficiency_Diff'] = (ht_eff - at_eff).to_numpy()
 
     # 7. FIELD TILT
     # accounts for territorial dominance and not just mere possession 
     ht_tilt = clean_merged_data['home_touches_in_opposition_box'].fillna(0) / (clean_merged_data['home_possession'].fillna(50) + 1)
     at_tilt = clean_merged_data['away_touches_in_opposition_box'].fillna(0) / (clean_merged_data['away_possession'].fillna(50) + 1)
-    clean_merged_data['Field_Tilt_Diff'] = ht_tilt - at_tilt
+    derived['Field_Tilt_Diff'] = (ht_tilt - at_tilt).to_numpy()
 
     # 8. DRAW PROPENSITY FEATURES
-    if 'Elo_Gap_Absolute' in clean_merged_data.columns:
-        clean_merged_data['Elo_Symmetry'] = np.exp(-clean_merged_data['Elo_Gap_Absolute'] / 50)
+    if 'Elo_Gap_Absolute' in derived:
+        derived['Elo_Symmetry'] = np.exp(-derived['Elo_Gap_Absolute'] / 50)
 
     if all(c in clean_merged_data.columns for c in ['HT_AvgGF_L5', 'AT_AvgGF_L5', 'HT_CS_L5', 'AT_CS_L5']):
-        clean_merged_data['Stalemate_Score'] = (
+        derived['Stalemate_Score'] = (
             (clean_merged_data['HT_CS_L5'] + clean_merged_data['AT_CS_L5']) -
             (clean_merged_data['HT_AvgGF_L5'] + clean_merged_data['AT_AvgGF_L5'])
-        )
+        ).to_numpy()
 
     if all(c in clean_merged_data.columns for c in ['NormIP_BbAvH', 'NormIP_BbAvD', 'NormIP_BbAvA']):
-        clean_merged_data['Market_Uncertainty'] = (
+        derived['Market_Uncertainty'] = (
             clean_merged_data['NormIP_BbAvH'] *
             clean_merged_data['NormIP_BbAvD'] *
             clean_merged_data['NormIP_BbAvA']
-        )
+        ).to_numpy()
 
     # 9. DIFFERENTIAL FEATURES 
+    # all the home - away pairs (team stats, player stats, match stats) are aligned first and subtracted as one matrix
     player_base_features = [
         col.replace('HT_', '') for col in clean_merged_data.columns
         if col.startswith(('HT_GK', 'HT_DEF', 'HT_MID', 'HT_FWD'))
     ]
     player_base_features = sorted(list(set(player_base_features)))
 
-    original_cols_to_drop = []
+    diff_names, home_cols, away_cols = [], [], []
 
     # Team stats diff
     for home_col in TEAMS_STATS:
         base_col = home_col.replace('HT_', '')
         away_col = f'AT_{base_col}'
         if away_col in clean_merged_data.columns:
-            clean_merged_data[f'{base_col}_Diff'] = (
-                clean_merged_data[home_col] - clean_merged_data[away_col]
-            )
-            original_cols_to_drop.extend([home_col, away_col])
+            diff_names.append(f'{base_col}_Diff')
+            home_cols.append(home_col)
+            away_cols.append(away_col)
 
     # Player stats diff
     for features in player_base_features:
         home = f'HT_{features}'
         away = f'AT_{features}'
         if home in clean_merged_data.columns and away in clean_merged_data.columns:
-            clean_merged_data[f'{features}_Diff'] = (
-                clean_merged_data[home] - clean_merged_data[away]
-            )
-            original_cols_to_drop.extend([home, away])
+            diff_names.append(f'{features}_Diff')
+            home_cols.append(home)
+            away_cols.append(away)
 
     # Match stats diff (FIXED NAMING)
     for idx in range(0, len(MATCH_FEATURES), 2):
         home_col = MATCH_FEATURES[idx]
         away_col = MATCH_FEATURES[idx + 1]
         base = home_col.replace('home_', '')
-        new_col = f"{base}_Diff"
-        clean_merged_data[new_col] = (
-            clean_merged_data[home_col] - clean_merged_data[away_col]
-        )
-        original_cols_to_drop.extend([home_col, away_col])
-
+        diff_names.append(f"{base}_Diff")
+        home_cols.append(home_col)
+        away_cols.append(away_col)
+
+    home_block = clean_merged_data[home_cols]
+    away_block = clean_merged_data[away_cols]
+    diff_block = home_block.to_numpy(dtype=float) - away_block.to_numpy(dtype=float)
+    for idx, name in enumerate(diff_names):
+        # integer pairs (e.g. strength) keep their integer dtype, as a plain column subtraction would
+        if pd.api.types.is_integer_dtype(home_block.dtypes.iloc[idx]) and pd.api.types.is_integer_dtype(away_block.dtypes.iloc[idx]):
+            derived[name] = diff_block[:, idx].astype(np.int64)
+        else:
+            derived[name] = diff_block[:, idx]
+
+    original_cols_to_drop = home_cols + away_cols
     original_cols_to_drop.extend(ELO_FEATURES)
     original_cols_to_drop.extend(['HT_Rest', 'AT_Rest', 'home_xg_on_target_xgot', 'away_xg_on_target_xgot', 'xg_on_target_xgot_Diff'])
 
     # 10. LONG-TERM ANCHOR (Anti-Fluke)
-    # Calculate average xG over 15 matches to capture the true team class over short-run form
-
-    # Prepare home-side xG
-    home_side_long = clean_merged_data[['Date', 'HomeTeam', 'home_expected_goals_xg']].rename(
-        columns={
-            'HomeTeam': 'Team',
-            'home_expected_goals_xg': 'xG'
-        }
-    )
-
-    # Prepare away-side xG
-    away_side_long = clean_merged_data[['Date', 'AwayTeam', 'away_expected_goals_xg']].rename(
-        columns={
-            'AwayTeam': 'Team',
-            'away_expected_goals_xg': 'xG'
-        }
-    )
-
-    # Combine all matches into one timeline per team
-    all_games_long = pd.concat([home_side_long, away_side_long]) \
-        .sort_values(['Team', 'Date'])
-    
-    # Rolling long-term xG baseline (shifted to avoid leakage)
-    all_games_long['xG_Season_Base'] = (
-        all_games_long
-            .groupby('Team')['xG']
-            .transform(
-                lambda x: x.shift(1).rolling(window=15, min_periods=1).mean()
-            )
-    )
-
-    all_games_long['xG_Season_Base'] = all_games_long['xG_Season_Base'].fillna(1.2)
-
-
-    # Merge back for Home Team
-    clean_merged_data = clean_merged_data.merge(
-        all_games_long[['Date', 'Team', 'xG_Season_Base']],
-        left_on=['Date', 'HomeTeam'],
-        right_on=['Date', 'Team'],
-        how='left'
-    ).rename(
-        columns={'xG_Season_Base': 'HT_xG_Season_Base'}
-    ).drop(columns=['Team'])
-
-    # Merge back for Away Team
-    clean_merged_data = clean_merged_data.merge(
-        all_games_long[['Date', 'Team', 'xG_Season_Base']],
-        left_on=['Date', 'AwayTeam'],
-        right_on=['Date', 'Team'],
-        how='left'
-    ).rename(
-        columns={'xG_Season_Base': 'AT_xG_Season_Base'}
-    ).drop(columns=['Team'])
+    # average xG over 15 matches (shifted to avoid leakage) to capture the true team class over short-run form
+    derived['HT_xG_Season_Base'] = team_features['HT_xG_Season_Base']
+    derived['AT_xG_Season_Base'] = team_features['AT_xG_Season_Base']
 
     # Difference in long-term season class between teams
-    clean_merged_data['Season_Class_Diff'] = (
-        clean_merged_data['HT_xG_Season_Base'] -
-        clean_merged_data['AT_xG_Season_Base']
-    )
+    derived['Season_Class_Diff'] = derived['HT_xG_Season_Base'] - derived['AT_xG_Season_Base']
 
 
     # ================= STABLE OFFLINE ADJUSTMENT =================
 
-    clean_merged_data['HT_Quality_Boost'] = 1.0
-    clean_merged_data['AT_Quality_Boost'] = 1.0
+    derived['HT_Quality_Boost'] = np.ones(len(clean_merged_data))
+    derived['AT_Quality_Boost'] = np.ones(len(clean_merged_data))
 
     if 'ht_match_elo' in clean_merged_data.columns:
-        clean_merged_data['HT_Quality_Boost'] = 1.0 + (
-            np.maximum(0, clean_merged_data['ht_match_elo'] - 1500) / 1000
+        derived['HT_Quality_Boost'] = 1.0 + (
+            np.maximum(0, clean_merged_data['ht_match_elo'].to_numpy(dtype=float) - 1500) / 1000
         )
-        clean_merged_data['AT_Quality_Boost'] = 1.0 + (
-            np.maximum(0, clean_merged_data['at_match_elo'] - 1500) / 1000
+        derived['AT_Quality_Boost'] = 1.0 + (
+            np.maximum(0, clean_merged_data['at_match_elo'].to_numpy(dtype=float) - 1500) / 1000
         )
 
-    clean_merged_data['HT_Home_Comfort'] = 1.05
-    clean_merged_data['AT_Away_Resilience'] = 0.95
+    derived['HT_Home_Comfort'] = np.full(len(clean_merged_data), 1.05)
+    derived['AT_Away_Resilience'] = np.full(len(clean_merged_data), 0.95)
 
     if 'ht_match_elo' in clean_merged_data.columns:
-        clean_merged_data.loc[
-            clean_merged_data['ht_match_elo'] < 1700, 'HT_Home_Comfort'
-        ] = 1.0
-        clean_merged_data.loc[
-            clean_merged_data['at_match_elo'] > 1900, 'AT_Away_Resilience'
-        ] = 1.0
-
-    # Ensure SoS is stable
-    if 'SoS_Ratio' in clean_merged_data.columns:
-        clean_merged_data['SoS_Ratio'] = clean_merged_data['SoS_Ratio'].clip(0.7, 1.3)
-    else:
-        clean_merged_data['SoS_Ratio'] = 1.0
+        derived['HT_Home_Comfort'][clean_merged_data['ht_match_elo'].to_numpy() < 1700] = 1.0
+        derived['AT_Away_Resilience'][clean_merged_data['at_match_elo'].to_numpy() > 1900] = 1.0
 
     adjust_targets = [
         'expected_goals_xg',
@@ -318,24 +265,19 @@ def merged_data_feature_manipulation(clean_merged_data: pd.DataFrame) -> Tuple[p
         'possession'
     ]
 
+    boost_factor = derived['HT_Quality_Boost'] / derived['AT_Quality_Boost']
     for base in adjust_targets:
         diff_col = f'{base}_Diff'
         h_col = f'home_{base}'
         a_col = f'away_{base}'
 
         if h_col in clean_merged_data.columns and a_col in clean_merged_data.columns:
-            h_val = clean_merged_data[h_col] * clean_merged_data['HT_Home_Comfort']
-            a_val = clean_merged_data[a_col] * clean_merged_data['AT_Away_Resilience']
+            h_val = clean_merged_data[h_col].to_numpy(dtype=float) * derived['HT_Home_Comfort']
+            a_val = clean_merged_data[a_col].to_numpy(dtype=float) * derived['AT_Away_Resilience']
             raw_diff = h_val - a_val
-            boost_factor = (
-                clean_merged_data['HT_Quality_Boost'] /
-                clean_merged_data['AT_Quality_Boost']
-            )
-            clean_merged_data[diff_col] = (
-                raw_diff * boost_factor * clean_merged_data['SoS_Ratio']
-            )
+            derived[diff_col] = raw_diff * boost_factor * derived['SoS_Ratio']
 
-    clean_merged_data['Quality_Index_Diff'] = clean_merged_data['expected_goals_xg_Diff']
+    derived['Quality_Index_Diff'] = derived['expected_goals_xg_Diff']
 
     # # Proper clipping 
     # if 'xg_on_target_xgot_Diff' in clean_merged_data.columns:
@@ -349,6 +291,15 @@ def merged_data_feature_manipulation(clean_merged_data: pd.DataFrame) -> Tuple[p
     #         clean_merged_data['xg_on_target_xgot_Diff'].clip(-1.5, 1.5)
     #     )
 
+    # derived columns that already exist in the input replace it in place, the rest are attached in one go
+    overlapping = [col for col in derived if col in clean_merged_data.columns]
+    for col in overlapping:
+        clean_merged_data[col] = derived.pop(col)
+    clean_merged_data = pd.concat(
+        [clean_merged_data, pd.DataFrame(derived, index=clean_merged_data.index)],
+        axis=1
+    )
+
     # ================= FINAL DROP =================
 
     original_cols_to_drop = list(set(original_cols_to_drop))
@@ -0,0 +1,111 @@
+import os
+import time
+import queue
+import threading
+from bisect import bisect_left
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+# -----------------------------
+# Configuration
+# -----------------------------
+PREDICT_BATCH_WINDOW_MS = float(os.environ.get('PREDICT_BATCH_WINDOW_MS', 2.0))
+PREDICT_MAX_BATCH = int(os.environ.get('PREDICT_MAX_BATCH', 32))
+
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+
+
+class Histogram:
+    """Fixed-bucket histogram: counts per upper bound (the last bucket is everything above)."""
+    def __init__(self, bounds: List[float]):
+        self.bounds = list(bounds)
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect_left(self.bounds, value)] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+            return {
+                "count": self._count,
+                "mean": self._sum / self._count if self._count else 0.0,
+                "buckets": dict(zip(labels, self._counts)),
+            }
+
+
+class MicroBatcher:
+    """
+    Collects concurrent submissions for up to `window_ms` (or until `max_batch` are queued) and hands
+    them to `process_batch` in one call on a background thread; every caller gets its own result back.
+    `process_batch` returns one result per item; if it raises, the items are retried one by one so an
+    invalid item only fails its own caller.
+    """
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], window_ms: float = PREDICT_BATCH_WINDOW_MS,
+                 max_batch: int = PREDICT_MAX_BATCH, name: str = 'micro-batcher'):
+        self.process_batch = process_batch
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.name = name
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def submit(self, item: Any) -> Any:
+        self._ensure_worker()
+        future: Future = Future()
+        start = time.perf_counter()
+        self._queue.put((item, future))
+        try:
+            return future.result()
+        finally:
+            self.latency_ms.observe((time.perf_counter() - start) * 1000.0)
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.batch_size.observe(len(batch))
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Any]):
+        try:
+            results = self.process_batch([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+            else:
+                for entry in batch:
+                    self._dispatch([entry])
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "latency_ms": self.latency_ms.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+        }
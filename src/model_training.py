@@ -1,6 +1,7 @@
+import time
 import pandas as pd
 import numpy as np
-from typing import Tuple
+from typing import Any, Dict, Tuple
 from sklearn.metrics import accuracy_score, classification_report 
 from sklearn.ensemble import RandomForestRegressor 
 from sklearn.metrics import mean_absolute_error, mean_squared_error 
@@ -12,6 +13,28 @@ np.random.seed(RANDOM_STATE)
 # Type alias for clarity
 rfr_model = RandomForestRegressor
 
+# Parameters optimized for 3-class football outcome (H, D, A)
+XGB_PARAMS = dict(
+    learning_rate=0.03,        # LOWERED (from 0.09) - forces slower, more careful learning
+    max_depth=4,               # LOWERED (from default) - prevents the model from finding "complex" fluke patterns
+    reg_lambda=10,
+    reg_alpha=5,
+    min_child_weight=5,        # INCREASED - prevents the model from creating rules based on just 1 or 2 outlier matches
+    colsample_bytree=0.6,      # NEW - forces the model to ignore 40% of features (like touches) in each tree
+    subsample=0.7,             # NEW - trains on random subsets of data to prevent overfitting
+    gamma=1,                   # NEW - makes the model more conservative
+    num_class=3, 
+    eval_metric='mlogloss',
+    random_state=42
+)
+
+# Histogram training mode: the last VALIDATION_RATIO of the (chronological) training split is held out
+# and boosting stops once its log-loss has not improved for EARLY_STOPPING_ROUNDS rounds
+XGB_MAX_ROUNDS = 1000
+XGB_N_THREADS = -1
+VALIDATION_RATIO = 0.15
+EARLY_STOPPING_ROUNDS = 50
+
 def training_XGB(classification_tuples: Tuple[
     pd.DataFrame, pd.DataFrame, np.ndarray, np.ndarray, np.ndarray
     ]) -> Tuple[xgb.XGBClassifier, np.ndarray, float, str]:
@@ -26,21 +49,10 @@ def training_XGB(classification_tuples: Tuple[
     X_train_final, X_test_final, y_train_classification, y_test_classification, sample_weight = classification_tuples
     
     print("1. Initializing the XGBoost Ensemble Model.")
-    # Parameters optimized for 3-class football outcome (H, D, A)
     xgb_model = xgb.XGBClassifier(
         objective='multi:softmax',
-        n_estimators=1000,
-        learning_rate=0.03,        # LOWERED (from 0.09) - forces slower, more careful learning
-        max_depth=4,               # LOWERED (from default) - prevents the model from finding "complex" fluke patterns
-        reg_lambda=10,
-        reg_alpha=5,
-        min_child_weight=5,        # INCREASED - prevents the model from creating rules based on just 1 or 2 outlier matches
-        colsample_bytree=0.6,      # NEW - forces the model to ignore 40% of features (like touches) in each tree
-        subsample=0.7,             # NEW - trains on random subsets of data to prevent overfitting
-        gamma=1,                   # NEW - makes the model more conservative
-        num_class=3, 
-        eval_metric='mlogloss',
-        random_state=42
+        n_estimators=XGB_MAX_ROUNDS,
+        **XGB_PARAMS
     )
     
     print("2. Training the model now with advanced sample weighting.")
@@ -60,6 +72,88 @@ def training_XGB(classification_tuples: Tuple[
     
     return xgb_model, prediction, accuracy, report
 
+def training_XGB_hist(classification_tuples: Tuple[
+    pd.DataFrame, pd.DataFrame, np.ndarray, np.ndarray, np.ndarray
+    ], n_threads: int = XGB_N_THREADS) -> Tuple[xgb.XGBClassifier, np.ndarray, float, str, Dict[str, Any]]:
+    """
+    Trains the XGBoost Classification model with histogram tree construction. Early stopping on a
+    chronological validation fold (the tail of the training split) picks the round count, then a fresh
+    model with that many rounds is refit on the whole training split, the most recent matches included.
+    Also returns the training metadata (round count, fit windows, training time) for the artifacts.
+    """
+    print("="*156)
+    print("="*156)
+    print()
+    print(f"{' '*55}TRAINING THE CLASSIFICATION MODEL NOW! (HISTOGRAM MODE)\n")
+    
+    X_train_final, X_test_final, y_train_classification, y_test_classification, sample_weight = classification_tuples
+    
+    # the training split is already in date order, so its tail is the most recent slice before the test split
+    split_point = int(len(X_train_final) * (1 - VALIDATION_RATIO))
+    X_fit, X_val = X_train_final.iloc[:split_point], X_train_final.iloc[split_point:]
+    y_fit, y_val = y_train_classification[:split_point], y_train_classification[split_point:]
+    w_fit, w_val = sample_weight[:split_point], sample_weight[split_point:]
+    
+    print("1. Initializing the XGBoost Ensemble Model (tree_method='hist').")
+    # multi:softprob instead of multi:softmax: serving calls predict_proba and early stopping scores
+    # probabilities, the probabilities themselves are identical for both objectives
+    xgb_model = xgb.XGBClassifier(
+        objective='multi:softprob',
+        n_estimators=XGB_MAX_ROUNDS,
+        tree_method='hist',
+        n_jobs=n_threads,
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        **XGB_PARAMS
+    )
+    
+    print(f"2. Training on {len(X_fit)} matches, early stopping on the next {len(X_val)} matches.")
+    start = time.perf_counter()
+    xgb_model.fit(X_fit, y_fit, sample_weight=w_fit,
+                  eval_set=[(X_val, y_val)], sample_weight_eval_set=[w_val], verbose=False)
+    best_rounds = xgb_model.best_iteration + 1
+    best_score = float(xgb_model.best_score)
+    print(f"   Best round count: {best_rounds} of {XGB_MAX_ROUNDS} ({time.perf_counter() - start:.2f}s)")
+    
+    # the early-stopping model never saw the validation fold, the stored model is refit on all of it
+    print(f"   Refitting {best_rounds} rounds on all {len(X_train_final)} training matches.")
+    xgb_model = xgb.XGBClassifier(
+        objective='multi:softprob',
+        n_estimators=best_rounds,
+        tree_method='hist',
+        n_jobs=n_threads,
+        **XGB_PARAMS
+    )
+    xgb_model.fit(X_train_final, y_train_classification, sample_weight=sample_weight, verbose=False)
+    training_seconds = time.perf_counter() - start
+    
+    print("3. Predicting on test data.")
+    prediction = xgb_model.predict(X_test_final)
+    
+    print("4. Evaluating the performance of the model.\n")
+    accuracy = accuracy_score(y_test_classification, prediction) 
+    print(f"ACCURACY: {accuracy * 100:.4f}%")
+    
+    report = classification_report(y_test_classification, prediction)
+    print(f"CLASSIFICATION REPORT (Histogram / Early Stopping):")
+    print(report)
+    
+    training_metadata = {
+        'tree_method': 'hist',
+        'objective': 'multi:softprob',
+        'n_threads': n_threads,
+        'max_rounds': XGB_MAX_ROUNDS,
+        'best_rounds': best_rounds,
+        'best_validation_mlogloss': best_score,
+        'early_stopping_rounds': EARLY_STOPPING_ROUNDS,
+        # rows of the chronological training split: the early-stopping fit, its validation fold, the stored refit
+        'early_stopping_fit_matches': len(X_fit),
+        'validation_matches': len(X_val),
+        'refit_matches': len(X_train_final),
+        'training_seconds': round(training_seconds, 3),
+        'test_accuracy': float(accuracy),
+    }
+    return xgb_model, prediction, accuracy, report, training_metadata
+
 def training_RFR_home(regression_home_tuples: Tuple[
     pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]) -> Tuple[rfr_model, np.ndarray, float, float]:
     """
@@ -0,0 +1,259 @@
+import os
+import time
+import hashlib
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import log_loss, mean_absolute_error
+from sklearn.preprocessing import StandardScaler
+from sklearn.utils.class_weight import compute_sample_weight
+import xgboost as xgb
+
+from model_training import RANDOM_STATE, VALIDATION_RATIO
+
+OUTPUT_TUNING_DIR = 'tuning_artifacts'
+FOLD_CACHE_DIR = os.path.join(OUTPUT_TUNING_DIR, 'fold_cache')
+
+# walk-forward layout over (season, gameweek): each of the last FOLD_SEASONS seasons is cut into validation
+# windows of FOLD_GAMEWEEKS gameweeks (38 / 19 = both halves of a season, the first one across the season
+# boundary), and every fold trains on everything before its window. At least MIN_TRAIN_SEASONS seasons train the first fold.
+SEASON_START_MONTH = 8
+FOLD_SEASONS = 5
+FOLD_GAMEWEEKS = 19
+MIN_TRAIN_SEASONS = 1
+
+# total cores the search may occupy (workers x threads per worker never exceeds it)
+CPU_BUDGET = max(1, (os.cpu_count() or 1) - 1)
+THREADS_PER_WORKER = 1
+
+# successive halving: every rung keeps 1/HALVING_FACTOR of the configs and multiplies their tree budget
+HALVING_FACTOR = 3
+MIN_TREES = {'xgb': 100, 'rfr': 100}
+MAX_TREES = {'xgb': 1000, 'rfr': 1000}
+EARLY_STOPPING_ROUNDS = 50
+
+OUTCOME_LABELS = np.array(['A', 'D', 'H'])
+
+XGB_PARAM_GRID = {
+    'learning_rate': [0.03, 0.06],
+    'max_depth': [3, 4, 5],
+    'min_child_weight': [5, 10],
+    'colsample_bytree': [0.6, 0.8],
+    'subsample': [0.7],
+    'reg_lambda': [10],
+    'reg_alpha': [5],
+    'gamma': [1],
+}
+
+RFR_PARAM_GRID = {
+    'max_depth': [6, 10, 14],
+    'min_samples_leaf': [1, 5, 10],
+    'max_features': [1.0, 0.5, 'sqrt'],
+}
+
+
+# accepts a parameter grid, returns every combination of it as a list of parameter dictionaries
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    keys = list(grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+# accepts the match dates of the model data (the season / gameweek columns are dropped by then)
+# returns the season (starting year, seasons start in August) and gameweek of every row,
+# the gameweek recovered as the ordinal of its match week within the season (1 = opening week)
+def season_gameweeks(dates: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    dates = pd.to_datetime(dates)
+    seasons = np.where(dates.dt.month >= SEASON_START_MONTH, dates.dt.year, dates.dt.year - 1)
+    weeks = dates.dt.to_period('W-MON').dt.start_time.to_numpy()
+    gameweeks = np.zeros(len(dates), dtype=np.int64)
+    for season in np.unique(seasons):
+        rows = np.flatnonzero(seasons == season)
+        gameweeks[rows] = np.unique(weeks[rows], return_inverse=True)[1] + 1
+    return seasons, gameweeks
+
+
+# accepts the season and gameweek of every row
+# returns the (train_rows, validation_rows) positions of each expanding walk-forward fold, oldest first:
+# FOLD_GAMEWEEKS-gameweek windows over the last FOLD_SEASONS seasons, each trained on every earlier match
+def walk_forward_folds(seasons: np.ndarray, gameweeks: np.ndarray, fold_seasons: int = FOLD_SEASONS,
+                       fold_gameweeks: int = FOLD_GAMEWEEKS,
+                       min_train_seasons: int = MIN_TRAIN_SEASONS) -> List[Tuple[np.ndarray, np.ndarray]]:
+    all_seasons = np.unique(seasons)
+    folds = []
+    for season in all_seasons[min_train_seasons:][-fold_seasons:]:
+        in_season = seasons == season
+        for start in range(1, int(gameweeks[in_season].max()) + 1, fold_gameweeks):
+            window = in_season & (gameweeks >= start) & (gameweeks < start + fold_gameweeks)
+            train_rows = np.flatnonzero((seasons < season) | (in_season & (gameweeks < start)))
+            val_rows = np.flatnonzero(window)
+            if len(val_rows):
+                folds.append((train_rows, val_rows))
+    return folds
+
+
+# accepts the raw feature frame, targets and one fold, returns the scaled matrices of that fold
+def build_fold_matrices(X: pd.DataFrame, y_outcome: np.ndarray, y_home: np.ndarray, y_away: np.ndarray,
+                        fold: Tuple[np.ndarray, np.ndarray]) -> Dict[str, np.ndarray]:
+    train_rows, val_rows = fold
+    values = X.to_numpy(dtype=np.float64)
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(values[train_rows])
+    X_val = scaler.transform(values[val_rows])
+    return {
+        'X_train': X_train, 'X_val': X_val,
+        'y_train_outcome': y_outcome[train_rows], 'y_val_outcome': y_outcome[val_rows],
+        'y_train_home': y_home[train_rows], 'y_val_home': y_home[val_rows],
+        'y_train_away': y_away[train_rows], 'y_val_away': y_away[val_rows],
+        'sample_weight': compute_sample_weight(class_weight='balanced', y=y_outcome[train_rows]),
+    }
+
+
+# accepts the model data and the folds, writes every fold to the cache (once per data/fold layout)
+# returns the paths of the cached folds, so the workers never rebuild or receive the matrices
+def cache_fold_matrices(X: pd.DataFrame, y_outcome: np.ndarray, y_home: np.ndarray, y_away: np.ndarray,
+                        folds: List[Tuple[np.ndarray, np.ndarray]], cache_dir: str = FOLD_CACHE_DIR) -> List[str]:
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = hashlib.sha1()
+    digest.update('|'.join(X.columns).encode())
+    digest.update(np.ascontiguousarray(X.to_numpy(dtype=np.float64)).tobytes())
+    for target in (y_outcome, y_home, y_away):
+        digest.update(np.ascontiguousarray(target).tobytes())
+    data_key = digest.hexdigest()[:12]
+
+    paths = []
+    for train_rows, val_rows in folds:
+        path = os.path.join(cache_dir, f"{data_key}_{len(train_rows)}_{len(val_rows)}.npz")
+        if not os.path.exists(path):
+            matrices = build_fold_matrices(X, y_outcome, y_home, y_away, (train_rows, val_rows))
+            np.savez(path, **matrices)
+        paths.append(path)
+    return paths
+
+
+# accepts a model kind, its parameters, the tree budget, the cached fold paths and a thread count
+# returns the mean validation score, mean training time and mean boosting rounds over the folds
+# (runs inside a worker process)
+def evaluate_config(task: Tuple[str, Dict[str, Any], int, List[str], int]) -> Dict[str, Any]:
+    kind, params, n_trees, fold_paths, n_threads = task
+    scores, fit_seconds, rounds = [], [], []
+    for path in fold_paths:
+        fold = np.load(path)
+        start = time.perf_counter()
+        if kind == 'xgb':
+            # multi:softprob so the folds can be scored on log-loss; serving reads predict_proba either way
+            model = xgb.XGBClassifier(objective='multi:softprob', num_class=3, eval_metric='mlogloss',
+                                      n_estimators=n_trees, tree_method='hist', n_jobs=n_threads,
+                                      early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                                      random_state=RANDOM_STATE, **params)
+            # the boosting rounds are picked on the most recent tail of the training window, so the
+            # validation fold stays untouched until it is scored
+            stop = int(len(fold['X_train']) * (1 - VALIDATION_RATIO))
+            model.fit(fold['X_train'][:stop], fold['y_train_outcome'][:stop], sample_weight=fold['sample_weight'][:stop],
+                      eval_set=[(fold['X_train'][stop:], fold['y_train_outcome'][stop:])], verbose=False)
+            fit_seconds.append(time.perf_counter() - start)
+            rounds.append(model.best_iteration + 1)
+            probs = model.predict_proba(fold['X_val'], iteration_range=(0, model.best_iteration + 1))
+            scores.append(log_loss(fold['y_val_outcome'], probs, labels=[0, 1, 2]))
+        else:
+            maes = []
+            for side in ('home', 'away'):
+                model = RandomForestRegressor(n_estimators=n_trees, n_jobs=n_threads,
+                                              random_state=RANDOM_STATE, **params)
+                model.fit(fold['X_train'], fold[f'y_train_{side}'])
+                maes.append(mean_absolute_error(fold[f'y_val_{side}'], model.predict(fold['X_val'])))
+            fit_seconds.append(time.perf_counter() - start)
+            rounds.append(n_trees)
+            scores.append(float(np.mean(maes)))
+    return {'model': kind, 'params': params, 'n_trees': n_trees,
+            'score': float(np.mean(scores)), 'train_seconds': float(np.mean(fit_seconds)),
+            'rounds': float(np.mean(rounds))}
+
+
+# accepts a model kind and its candidate configurations
+# returns one leaderboard row per evaluation, after successive halving over the tree budget
+def successive_halving(kind: str, configs: List[Dict[str, Any]], fold_paths: List[str],
+                       executor: ProcessPoolExecutor, n_threads: int) -> List[Dict[str, Any]]:
+    results = []
+    survivors = configs
+    n_trees = MIN_TREES[kind]
+    rung = 0
+    while survivors:
+        tasks = [(kind, params, n_trees, fold_paths, n_threads) for params in survivors]
+        rung_results = list(executor.map(evaluate_config, tasks))
+        for result in rung_results:
+            result['rung'] = rung
+        results.extend(rung_results)
+        print(f"{kind.upper()} rung {rung}: {len(survivors)} configs at {n_trees} trees, "
+              f"best score {min(r['score'] for r in rung_results):.4f}")
+
+        if len(survivors) == 1 or n_trees >= MAX_TREES[kind]:
+            break
+        rung_results.sort(key=lambda r: r['score'])
+        keep = max(1, len(survivors) // HALVING_FACTOR)
+        survivors = [r['params'] for r in rung_results[:keep]]
+        n_trees = min(n_trees * HALVING_FACTOR, MAX_TREES[kind])
+        rung += 1
+    return results
+
+
+# main function!
+# accepts the output of data_preparation (with the Date column still present)
+# returns the leaderboard of every evaluated configuration and writes it to OUTPUT_TUNING_DIR
+def run_hyperparameter_search(output_tuples: Tuple[pd.DataFrame, pd.Series, pd.Series, pd.Series],
+                              xgb_grid: Dict[str, List[Any]] = XGB_PARAM_GRID,
+                              rfr_grid: Dict[str, List[Any]] = RFR_PARAM_GRID,
+                              cpu_budget: int = CPU_BUDGET,
+                              threads_per_worker: int = THREADS_PER_WORKER,
+                              output_dir: str = OUTPUT_TUNING_DIR) -> pd.DataFrame:
+    print("="*156)
+    print("="*156)
+    print()
+    print(f"{' '*59}TUNING THE CLASSIFICATION AND REGRESSION MODELS NOW!\n")
+
+    df, classification_output, regression_output_home, regression_output_away = output_tuples
+    order = np.argsort(pd.to_datetime(df['Date']).to_numpy(), kind='stable')
+    df = df.iloc[order].reset_index(drop=True)
+
+    X = df.drop(columns=['Date', 'HomeTeam', 'AwayTeam', 'FTR'], errors='ignore')
+    X.columns = X.columns.str.replace('>', '_GT_', regex=False).str.replace('<', '_LT_', regex=False).str.replace('.', '_', regex=False)
+    y_outcome = np.searchsorted(OUTCOME_LABELS, np.asarray(classification_output)[order])
+    y_home = np.asarray(regression_output_home, dtype=np.float64)[order]
+    y_away = np.asarray(regression_output_away, dtype=np.float64)[order]
+
+    print("1. Building the walk-forward folds (expanding window by season and gameweek).\n")
+    seasons, gameweeks = season_gameweeks(df['Date'])
+    folds = walk_forward_folds(seasons, gameweeks)
+    if not folds:
+        raise ValueError(f"Not enough seasons for walk-forward validation (need more than {MIN_TRAIN_SEASONS}).")
+    for i, (train_rows, val_rows) in enumerate(folds):
+        print(f"   Fold {i + 1}: {len(train_rows)} training matches, {len(val_rows)} validation matches "
+              f"(season {seasons[val_rows[0]]}/{seasons[val_rows[0]] + 1}, gameweeks {gameweeks[val_rows].min()}-{gameweeks[val_rows].max()})")
+
+    print("\n2. Caching the scaled feature matrices of every fold.\n")
+    fold_paths = cache_fold_matrices(X, y_outcome, y_home, y_away, folds, os.path.join(output_dir, 'fold_cache'))
+
+    n_threads = max(1, min(threads_per_worker, cpu_budget))
+    n_workers = max(1, cpu_budget // n_threads)
+    print(f"3. Searching with {n_workers} worker(s) x {n_threads} thread(s) (CPU budget {cpu_budget}).\n")
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        results = successive_halving('xgb', expand_grid(xgb_grid), fold_paths, executor, n_threads)
+        results += successive_halving('rfr', expand_grid(rfr_grid), fold_paths, executor, n_threads)
+
+    leaderboard = pd.DataFrame(results)
+    leaderboard['metric'] = np.where(leaderboard['model'] == 'xgb', 'log_loss', 'mae')
+    leaderboard['params'] = leaderboard['params'].astype(str)
+    leaderboard = leaderboard.sort_values(['model', 'rung', 'score'], ascending=[True, False, True]).reset_index(drop=True)
+    leaderboard = leaderboard[['model', 'metric', 'score', 'train_seconds', 'rounds', 'n_trees', 'rung', 'params']]
+
+    os.makedirs(output_dir, exist_ok=True)
+    leaderboard.to_csv(os.path.join(output_dir, 'leaderboard.csv'), index=False)
+
+    print("\nBEST CONFIGURATIONS:")
+    for kind, group in leaderboard.groupby('model'):
+        best = group.iloc[0]
+        print(f"{kind.upper()}: {best['metric']}={best['score']:.4f} in {best['train_seconds']:.2f}s -> {best['params']}")
+    print()
+    return leaderboard
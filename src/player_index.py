@@ -0,0 +1,189 @@
+import unicodedata
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Stats served by the leaderboards (columns of the player season rows, 0.0 where a season lacks the column)
+LEADERBOARD_STATS = ['goals', 'assists', 'xg', 'xa']
+# every index also counts the matches in which the player scored or assisted
+INDEX_STATS = LEADERBOARD_STATS + ['contributing_matches']
+
+
+def normalise_name(name: str) -> str:
+    # case- and accent-insensitive search key: "Ødegaard" and "odegaard" share a prefix
+    decomposed = unicodedata.normalize('NFKD', str(name).replace('Ø', 'O').replace('ø', 'o'))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+
+@dataclass
+class PlayerSeasonIndex:
+    """
+    Read-only indexes over one season of player-match rows, built once at load.
+    An entry is a (player, club) pair so a mid-season transfer counts for each club separately.
+    """
+    season: int
+    max_gameweek: int
+    # one value per entry
+    player_ids: np.ndarray
+    player_names: np.ndarray
+    clubs: np.ndarray
+    positions: np.ndarray
+    # entry -> player row (a player with several clubs has several entries)
+    entry_player: np.ndarray
+    # (n_entries x max_gameweek + 1 x n_stats): totals up to and including every gameweek, gameweek 0 is all zeros
+    cumulative: np.ndarray
+    # sorted normalised name keys (full name and surname) and the entry each belongs to
+    search_keys: np.ndarray
+    search_entries: np.ndarray
+    # latest entry of every player, i.e. the club and position reported for the player as a whole
+    player_latest_entry: np.ndarray
+    # player -> entries: the entries of player p are player_entries[player_offsets[p]:player_offsets[p + 1]]
+    player_entries: np.ndarray
+    player_offsets: np.ndarray
+    # entries per lower-cased club / position
+    club_partitions: Dict[str, np.ndarray] = field(default_factory=dict)
+    position_partitions: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def range_totals(self, gw_from: int, gw_to: int, entries: Optional[np.ndarray] = None) -> np.ndarray:
+        # O(1) per entry: difference of two cumulative rows
+        gw_from = min(max(gw_from, 1), self.max_gameweek + 1)
+        gw_to = min(max(gw_to, gw_from - 1), self.max_gameweek)
+        cum = self.cumulative if entries is None else self.cumulative[entries]
+        return cum[:, gw_to] - cum[:, gw_from - 1]
+
+    def entries_of(self, player: int) -> np.ndarray:
+        return self.player_entries[self.player_offsets[player]:self.player_offsets[player + 1]]
+
+
+# accepts one season of player-match rows, returns its PlayerSeasonIndex
+# the rows must be every match played (prepare_player_season_rows), not only the goal contributions of
+# PLAYERS_MATCHES, otherwise the xG / xA totals only cover the matches with a goal or an assist
+def build_player_index(df: pd.DataFrame, season: int) -> PlayerSeasonIndex:
+    df = df.reset_index(drop=True)
+    gameweeks = df['gameweek'].to_numpy(dtype=np.int64)
+    max_gameweek = int(gameweeks.max()) if len(df) else 0
+
+    stats = [pd.to_numeric(df[col], errors='coerce').fillna(0.0).to_numpy(dtype=np.float64) if col in df.columns
+             else np.zeros(len(df)) for col in LEADERBOARD_STATS]
+    contributed = ((stats[0] > 0) | (stats[1] > 0)).astype(np.float64)
+    values = np.column_stack(stats + [contributed]) if len(df) else np.zeros((0, len(INDEX_STATS)))
+
+    clubs = df['name'].fillna('').astype(str).to_numpy()
+    entry_codes, _ = pd.factorize(pd.MultiIndex.from_arrays([df['player_id'].to_numpy(), clubs]))
+    player_codes, player_uniques = pd.factorize(df['player_id'])
+    n_entries = int(entry_codes.max()) + 1 if len(df) else 0
+
+    cumulative = np.zeros((n_entries, max_gameweek + 1, len(INDEX_STATS)))
+    np.add.at(cumulative, (entry_codes, gameweeks), values)
+    np.cumsum(cumulative, axis=1, out=cumulative)
+
+    # first row of every entry carries its name / club / position, the last row of every player its latest entry
+    first_row = np.full(n_entries, -1, dtype=np.int64)
+    first_row[entry_codes[::-1]] = np.arange(len(df))[::-1]
+    order = np.lexsort((np.arange(len(df)), gameweeks))
+    player_latest_entry = np.zeros(len(player_uniques), dtype=np.int64)
+    player_latest_entry[player_codes[order]] = entry_codes[order]
+    entry_player = np.zeros(n_entries, dtype=np.int64)
+    entry_player[entry_codes] = player_codes
+    # entries grouped by player, each player's block located by the running count of entries per player
+    player_entries = np.argsort(entry_player, kind='stable')
+    player_offsets = np.r_[0, np.cumsum(np.bincount(entry_player, minlength=len(player_uniques)))]
+
+    names = df['player_name'].fillna('').astype(str).to_numpy()[first_row]
+    positions = df['position'].fillna('').astype(str).to_numpy()[first_row]
+    surnames = df['second_name'].fillna('').astype(str).to_numpy()[first_row]
+
+    keys = np.array([normalise_name(n) for n in names] + [normalise_name(s) for s in surnames], dtype=str)
+    key_entries = np.concatenate([np.arange(n_entries), np.arange(n_entries)])
+    key_order = np.argsort(keys, kind='stable')
+
+    def partitions(labels: np.ndarray) -> Dict[str, np.ndarray]:
+        lowered = pd.Series(labels).str.lower()
+        return {label: np.asarray(idx, dtype=np.int64) for label, idx in lowered.groupby(lowered).indices.items() if label}
+
+    return PlayerSeasonIndex(
+        season=season,
+        max_gameweek=max_gameweek,
+        player_ids=df['player_id'].to_numpy()[first_row],
+        player_names=names,
+        clubs=clubs[first_row],
+        positions=positions,
+        entry_player=entry_player,
+        cumulative=cumulative,
+        search_keys=keys[key_order],
+        search_entries=key_entries[key_order],
+        player_latest_entry=player_latest_entry,
+        player_entries=player_entries,
+        player_offsets=player_offsets,
+        club_partitions=partitions(clubs[first_row]),
+        position_partitions=partitions(positions),
+    )
+
+
+def _entry_record(index: PlayerSeasonIndex, entry: int, totals: np.ndarray) -> Dict[str, Any]:
+    record = {
+        "player_id": int(index.player_ids[entry]),
+        "player_name": str(index.player_names[entry]),
+        "club": str(index.clubs[entry]),
+        "position": str(index.positions[entry]),
+    }
+    for i, stat in enumerate(INDEX_STATS):
+        record[stat] = int(totals[i]) if stat in ('goals', 'assists', 'contributing_matches') else round(float(totals[i]), 2)
+    return record
+
+
+# accepts a name prefix (matched against full names and surnames), returns the matching players with their season totals
+def search_players(index: PlayerSeasonIndex, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+    key = normalise_name(prefix)
+    if not key:
+        return []
+    # binary search for the block of keys starting with the prefix
+    start = np.searchsorted(index.search_keys, key, side='left')
+    stop = np.searchsorted(index.search_keys, key + '\U0010ffff', side='left')
+
+    players = dict.fromkeys(index.entry_player[index.search_entries[start:stop]])
+    results = []
+    for player in players:
+        entries = index.entries_of(player)
+        latest = index.player_latest_entry[player]
+        totals = index.range_totals(1, index.max_gameweek, entries).sum(axis=0)
+        results.append(_entry_record(index, latest, totals))
+        if len(results) == limit:
+            break
+    results.sort(key=lambda r: r["player_name"])
+    return results
+
+
+# accepts a stat, a gameweek range and optional club / position filters
+# returns the top `limit` players of that range (per club entry when a club is given, per player otherwise)
+def player_leaderboard(index: PlayerSeasonIndex, stat: str, gw_from: int = 1, gw_to: Optional[int] = None,
+                       club: Optional[str] = None, position: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    if stat not in LEADERBOARD_STATS:
+        raise ValueError(f"Unknown stat '{stat}', expected one of {LEADERBOARD_STATS}")
+    gw_to = index.max_gameweek if gw_to is None else gw_to
+    stat_pos = INDEX_STATS.index(stat)
+    empty = np.zeros(0, dtype=np.int64)
+
+    if club is not None:
+        entries = index.club_partitions.get(club.lower(), empty)
+        if position is not None:
+            entries = np.intersect1d(entries, index.position_partitions.get(position.lower(), empty))
+        totals = index.range_totals(gw_from, gw_to, entries)
+        labels = entries
+    else:
+        # a player's entries at every club add up
+        all_totals = index.range_totals(gw_from, gw_to)
+        n_players = len(index.player_latest_entry)
+        totals = np.column_stack([np.bincount(index.entry_player, all_totals[:, i], n_players)
+                                  for i in range(len(INDEX_STATS))])
+        labels = index.player_latest_entry
+        if position is not None:
+            keep = np.flatnonzero(np.char.lower(index.positions[labels].astype(str)) == position.lower())
+            totals, labels = totals[keep], labels[keep]
+
+    # drop players without a contribution in the range, then order by the stat (ties by name)
+    keep = np.flatnonzero(totals[:, stat_pos] > 0)
+    totals, labels = totals[keep], labels[keep]
+    order = np.lexsort((index.player_names[labels], -totals[:, stat_pos]))[:limit]
+    return [_entry_record(index, int(labels[i]), totals[i]) for i in order]
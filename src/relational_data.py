@@ -7,6 +7,53 @@ import os
 OUTPUT_DIR = "data_artifacts"
 MIN_MINUTES_PLAYED = 60 
 
+POSITION_MAP = {
+    'Goalkeeper':'GK',
+    'Defender':'DEF',
+    'Midfielder':'MID',
+    'Forward':'FWD',
+    'Unknown':'NA'
+}
+POSITION_GROUPS = ['GK', 'DEF', 'MID', 'FWD']
+
+# projected columns of every position ('tackles' is only carried to derive the DEF tackles_won_percentage)
+POSITION_COLUMNS: Dict[str, List[str]] = {
+    'GK': ['player_id', 'team_code', 'match_id', 'Game Week', 'minutes_played', 
+           'gk_accurate_passes', 'gk_accurate_long_balls', 
+           'saves', 'saves_inside_box', 
+           'goals_conceded', 'team_goals_conceded',
+           'xgot_faced', 'goals_prevented',
+           'sweeper_actions', 'high_claim'],
+    'DEF': ['player_id', 'match_id', 'team_code', 'Game Week', 'minutes_played', 'xg', 'xa',
+            'accurate_passes', 'accurate_long_balls', 'final_third_passes',
+            'tackles_won', 'interceptions', 'recoveries', 'blocks', 'clearances', 
+            'headed_clearances', 'dribbled_past', 'duels_won',
+            'ground_duels_won', 'aerial_duels_won', 'was_fouled', 'fouls_committed',
+            'tackles'],
+    'MID': ['player_id', 'match_id', 'team_code', 'Game Week', 'minutes_played',
+            'goals', 'assists', 'xg', 'xa',
+            'accurate_passes', 'accurate_crosses', 'accurate_long_balls', 'final_third_passes',
+            'total_shots', 'shots_on_target',
+            'chances_created', 'touches',
+            'successful_dribbles', 'corners',
+            'penalties_scored', 'penalties_missed',
+            'tackles_won', 'interceptions', 'recoveries', 'blocks', 'clearances',
+            'dribbled_past', 'duels_won', 'ground_duels_won', 'aerial_duels_won',
+            'was_fouled', 'fouls_committed'],
+    'FWD': ['player_id', 'match_id', 'team_code', 'Game Week', 'minutes_played',
+            'goals', 'assists', 'xg', 'xa', 'xgot',
+            'accurate_passes', 'final_third_passes',
+            'total_shots', 'shots_on_target',
+            'chances_created', 'big_chances_missed', 'touches', 'touches_opposition_box',
+            'successful_dribbles', 'corners', 'offsides',
+            'penalties_scored', 'penalties_missed',
+            'duels_won', 'ground_duels_won', 'aerial_duels_won',
+            'was_fouled', 'fouls_committed']
+}
+
+# null columns imputed with 0 (wherever the position projects them)
+IMPUTE_COLUMNS = ['saves_inside_box', 'tackles_won_percentage', 'corners']
+
 # combine and concatenate all the relational data (24/25 & 25/26), by keeping only the columns which are common to both sets of data
 def relational_data(dictionary: Dict[str, pd.DataFrame]) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     try:
@@ -77,137 +124,99 @@ def merge_pms_players(combined_pms: pd.DataFrame, combined_players: pd.DataFrame
     return pms_players
 
 # accepts the combined data of pms and players returned from merge_pms_players
-# returns the set of dataframes respective of the position of players 
-def positional_classification(pms_players: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    print("Dividing the merged data into position specific stats...\n")
-    position_map = {
-    'Goalkeeper':'GK',
-    'Defender':'DEF',
-    'Midfielder':'MID',
-    'Forward':'FWD',
-    'Unknown':'NA'
-    }
-    pms_players['position_group'] = pms_players['position'].map(position_map)
-    df1 = pms_players[pms_players['position_group']=='GK'].copy()
-    df2 = pms_players[pms_players['position_group']=='DEF'].copy()
-    df3 = pms_players[pms_players['position_group']=='MID'].copy()
-    df4 = pms_players[pms_players['position_group']=='FWD'].copy()
-
-    df1 = df1[['player_id', 'team_code', 'match_id', 'Game Week', 'minutes_played', 
-                           'gk_accurate_passes', 'gk_accurate_long_balls', 
-                           'saves', 'saves_inside_box', 
-                           'goals_conceded', 'team_goals_conceded',
-                           'xgot_faced', 'goals_prevented',
-                           'sweeper_actions', 'high_claim']].copy()
-
-    df2 = df2[['player_id', 'match_id', 'team_code', 'Game Week', 'minutes_played', 'xg', 'xa',
-                                'accurate_passes', 'accurate_long_balls', 'final_third_passes',
-                                'tackles_won', 'interceptions', 'recoveries', 'blocks', 'clearances', 
-                                'headed_clearances', 'dribbled_past', 'duels_won',
-                                'ground_duels_won', 'aerial_duels_won', 'was_fouled', 'fouls_committed',
-                                'tackles', 'distance_covered', 'defensive_contributions']].copy()
-    df2['tackles_won_percentage'] = np.divide(
-        df2['tackles_won'].to_numpy(dtype=float),
-        df2['tackles'].to_numpy(dtype=float),
-        out=np.zeros(len(df2), dtype=float),
-        where=df2['tackles'].to_numpy() != 0
+# returns the set of dataframes respective of the position of players (GK, DEF, MID, FWD), cleaned and sorted by player and Game Week
+# the data is sorted only once by (position_group, player_id, Game Week); every position is then taken from its own contiguous
+# segment of that order with only its projected columns, so each row is materialised exactly once
+def positional_partitioning(pms_players: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    print("Dividing the merged data into position specific stats:")
+    pms_players['position_group'] = pms_players['position'].map(POSITION_MAP)
+    group_codes = pms_players['position_group'].map(
+        {group: code for code, group in enumerate(POSITION_GROUPS)}
+    ).to_numpy(dtype=float)
+
+    print(f"1. Extracting players who have played atleast {MIN_MINUTES_PLAYED} minutes of a game")
+    kept_rows = np.flatnonzero(
+        ~np.isnan(group_codes) & (pms_players['minutes_played'].to_numpy() >= MIN_MINUTES_PLAYED)
     )
-    df2 = df2.drop(columns='tackles', errors='ignore')
-
-    df3 = df3[['player_id', 'match_id', 'team_code', 'Game Week', 'minutes_played',
-                                'goals', 'assists', 'xg', 'xa',
-                                'accurate_passes', 'accurate_crosses', 'accurate_long_balls', 'final_third_passes',
-                                'total_shots', 'shots_on_target',
-                                'chances_created', 'touches',
-                                'successful_dribbles', 'corners',
-                                'penalties_scored', 'penalties_missed',
-                                'tackles_won', 'interceptions', 'recoveries', 'blocks', 'clearances',
-                                'dribbled_past', 'duels_won', 'ground_duels_won', 'aerial_duels_won',
-                                'was_fouled', 'fouls_committed',
-                                'distance_covered', 'defensive_contributions']].copy()
-    
-    df4 = df4[['player_id', 'match_id', 'team_code', 'Game Week', 'minutes_played',
-                                'goals', 'assists', 'xg', 'xa', 'xgot',
-                                'accurate_passes', 'final_third_passes',
-                                'total_shots', 'shots_on_target',
-                                'chances_created', 'big_chances_missed', 'touches', 'touches_opposition_box',
-                                'successful_dribbles', 'corners', 'offsides',
-                                'penalties_scored', 'penalties_missed',
-                                'duels_won', 'ground_duels_won', 'aerial_duels_won',
-                                'was_fouled', 'fouls_committed', 'dispossessed']].copy()
-
-    return df1, df2, df3, df4
-
-
-def positional_data_cleaning(multiple_df: Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]
-                             ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    print("Cleaning the positional data now:\n")
-    df1, df2, df3, df4 = multiple_df
-
-    def_mid_drop_columns = ['defensive_contributions', 'distance_covered']
-    fwd_drop_columns = ['dispossessed']
-
-    df2 = df2.drop(columns=def_mid_drop_columns, errors='ignore')
-    df3 = df3.drop(columns=def_mid_drop_columns, errors='ignore')
-    print(f"{len(def_mid_drop_columns)} dropped from DEF & MID data")
-
-    df4 = df4.drop(columns=fwd_drop_columns, errors='ignore')
-    print(f"{len(fwd_drop_columns)} dropped from FWD data")
-
-    df1['saves_inside_box'] = df1['saves_inside_box'].fillna(0)
-    df2['tackles_won_percentage'] = df2['tackles_won_percentage'].fillna(0)
-    df3['corners'] = df3['corners'].fillna(0)
-    df4['corners'] = df4['corners'].fillna(0)
-    print("Null columns were imputed with 0\n")
-
-    return df1, df2, df3, df4
 
+    print("2. Sorting the players by their position, ID and Game Week")
+    order = np.lexsort((
+        pms_players['Game Week'].to_numpy()[kept_rows],
+        pms_players['player_id'].to_numpy()[kept_rows],
+        group_codes[kept_rows]
+    ))
+    sorted_rows = kept_rows[order]
+    boundaries = np.searchsorted(group_codes[sorted_rows], np.arange(len(POSITION_GROUPS) + 1))
+
+    partitions = []
+    for code, group in enumerate(POSITION_GROUPS):
+        rows = sorted_rows[boundaries[code]:boundaries[code + 1]]
+        columns = pms_players.columns.get_indexer(POSITION_COLUMNS[group])
+        # get_indexer marks a missing column with -1, which .iloc would read as the last column
+        if (columns < 0).any():
+            missing = [col for col, i in zip(POSITION_COLUMNS[group], columns) if i < 0]
+            raise KeyError(f"{group} stats missing from the player-match data: {missing}")
+        df = pms_players.iloc[rows, columns].reset_index(drop=True)
+        if group == 'DEF':
+            df['tackles_won_percentage'] = np.divide(
+                df['tackles_won'].to_numpy(dtype=float),
+                df['tackles'].to_numpy(dtype=float),
+                out=np.zeros(len(df), dtype=float),
+                where=df['tackles'].to_numpy() != 0
+            )
+            del df['tackles']
+        impute_columns = [col for col in IMPUTE_COLUMNS if col in df.columns]
+        df[impute_columns] = df[impute_columns].fillna(0)
+        partitions.append(df)
+    print("3. Null columns were imputed with 0\n")
+
+    return tuple(partitions)
+
+# accepts a 2D block of values sorted by group (and chronologically within each group) along with the group key of every row
+# returns the mean of the previous `window` rows of the same group for every row (NaN for the first row of a group)
+# one cumulative sum over the whole block is enough: each window is clamped to its group start, which resets the sum at the boundary
+def grouped_shifted_rolling_mean(values: np.ndarray, group_keys: np.ndarray, window: int = 5) -> np.ndarray:
+    n_rows, n_cols = values.shape
+    result = np.full((n_rows, n_cols), np.nan)
+    if n_rows == 0:
+        return result
+
+    # NaNs are skipped exactly like pandas rolling(min_periods=1): they add nothing to the sum and nothing to the count
+    valid = ~np.isnan(values)
+    cum_sum = np.zeros((n_rows + 1, n_cols))
+    cum_count = np.zeros((n_rows + 1, n_cols))
+    np.cumsum(np.where(valid, values, 0.0), axis=0, out=cum_sum[1:])
+    np.cumsum(valid, axis=0, out=cum_count[1:])
+
+    positions = np.arange(n_rows)
+    is_group_start = np.ones(n_rows, dtype=bool)
+    is_group_start[1:] = group_keys[1:] != group_keys[:-1]
+    group_start = np.maximum.accumulate(np.where(is_group_start, positions, 0))
+
+    # window of row i is [max(group start, i - window), i), i.e. strictly before the current match
+    lower = np.maximum(group_start, positions - window)
+    window_sum = cum_sum[positions] - cum_sum[lower]
+    window_count = cum_count[positions] - cum_count[lower]
+    np.divide(window_sum, window_count, out=result, where=window_count > 0)
+    return result
+
+# accepts position-wise data sorted by player and Game Week
+# returns the same data with the previous-5-match average of every rolling column appended (aligned row by row, no merge)
 def rolling_features(df: pd.DataFrame, rolling: List[str], groupedby: str = 'player_id', prefix: str = 'L5_Avg_') -> pd.DataFrame:
-    rolling_df = df.groupby(groupedby)[rolling].rolling(window=5, min_periods=1).mean().shift(1).reset_index()
-    new_cols = ['player_id', 'chron_idx'] + [prefix + col for col in rolling]
-    rolling_df.columns = new_cols
-    # first match nullification to ensure temporal correctness since first match has no historic data 
-    first_row_idx = df.groupby(groupedby)['chron_idx'].min().values
-    rolling_df['is_first_match'] = rolling_df['chron_idx'].isin(first_row_idx)
-    for col in rolling_df.columns:
-        if col.startswith(prefix):
-            rolling_df.loc[rolling_df['is_first_match'], col] = np.nan
-    # chronological index is used to merge dataframes since dates can be multiple (multiple matches on a single day)
-    merged_df = df.merge(
-        rolling_df.drop(columns='is_first_match', errors='ignore'),
-        on=['player_id', 'chron_idx'], 
-        how='left'
-    ).drop(columns='chron_idx')
-    return merged_df
+    df = df.drop(columns='chron_idx', errors='ignore').reset_index(drop=True)
+    rolling_values = grouped_shifted_rolling_mean(
+        df[rolling].to_numpy(dtype=float),
+        df[groupedby].to_numpy()
+    )
+    rolling_df = pd.DataFrame(rolling_values, columns=[prefix + col for col in rolling])
+    return pd.concat([df, rolling_df], axis=1)
 
-# accepts the position-wise data of players returned from positional_classification
+# accepts the position-wise data of players returned from positional_partitioning (already filtered and sorted)
 # returns the feature-engineered position-wise data 
 def relational_data_feature_engineering(multiple_df: Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]
                              ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     print("Starting feature engineering:")
-    print("1. Extracting players who have played atleast 60 minutes of a game")
     df1, df2, df3, df4 = multiple_df
-    # gk
-    df1 = df1[df1['minutes_played'] >= MIN_MINUTES_PLAYED].copy()
-    df1 = df1.sort_values(by=['player_id', 'Game Week'])
-    df1 = df1.reset_index(drop=True)
-    df1['chron_idx'] = df1.index
-    # def    
-    df2 = df2[df2['minutes_played'] >= MIN_MINUTES_PLAYED].copy()
-    df2 = df2.sort_values(by=['player_id', 'Game Week'])
-    df2 = df2.reset_index(drop=True)
-    df2['chron_idx'] = df2.index
-    # mid
-    df3 = df3[df3['minutes_played'] >= MIN_MINUTES_PLAYED].copy()
-    df3 = df3.sort_values(by=['player_id', 'Game Week'])
-    df3 = df3.reset_index(drop=True)
-    df3['chron_idx'] = df3.index
-    # fwd
-    df4 = df4[df4['minutes_played'] >= MIN_MINUTES_PLAYED].copy()
-    df4 = df4.sort_values(by=['player_id', 'Game Week'])
-    df4 = df4.reset_index(drop=True)
-    print("2. Sorting the players by their ID and Game Week")
-    df4['chron_idx'] = df4.index
     gk_rolling = ['gk_accurate_passes', 'gk_accurate_long_balls', 
               'saves', 'saves_inside_box', 
               'goals_conceded', 'team_goals_conceded', 
@@ -231,7 +240,7 @@ def relational_data_feature_engineering(multiple_df: Tuple[pd.DataFrame, pd.Data
                 'touches', 'touches_opposition_box', 'successful_dribbles', 'corners', 'offsides',
                 'penalties_scored', 'penalties_missed', 'duels_won', 'ground_duels_won',
                 'aerial_duels_won', 'was_fouled', 'fouls_committed']
-    print("3. Creating engineered features for each positions for last 5 matches\n")
+    print("Creating engineered features for each positions for last 5 matches\n")
     fe_df1 = rolling_features(df1, gk_rolling)
     fe_df2 = rolling_features(df2, def_rolling)
     fe_df3 = rolling_features(df3, mid_rolling)
@@ -321,8 +330,7 @@ def work_with_relational_data(dictionary: Dict[str, pd.DataFrame]) -> Tuple[pd.D
     print(f"{" "*40}(INVOLVES DATA CONSOLIDATING, MERGING, DIVIDING, CLEANING AND FEATURE ENGINEERING)\n")
     combined_pms, combined_players, combined_matches, combined_teams = relational_data(dictionary)
     pms_players = merge_pms_players(combined_pms, combined_players)
-    gk_stats, def_stats, mid_stats, fwd_stats = positional_classification(pms_players)
-    gk_stats, def_stats, mid_stats, fwd_stats = positional_data_cleaning((gk_stats, def_stats, mid_stats, fwd_stats))
+    gk_stats, def_stats, mid_stats, fwd_stats = positional_partitioning(pms_players)
     fe_gk_stats, fe_def_stats, fe_mid_stats, fe_fwd_stats = relational_data_feature_engineering((gk_stats, def_stats, mid_stats, fwd_stats))
     teams_matches = merge_teams_matches(combined_matches, combined_teams)
     final_teams_matches = teams_matches_data_cleaning(teams_matches)
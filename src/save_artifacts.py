@@ -1,8 +1,9 @@
 import joblib
+import json
 import os
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
-from typing import Any, List
+from typing import Any, Dict, List, Optional
 
 OUTPUT_ARTIFACTS_DIR = 'model_artifacts'
 OUTPUT_DATA_DIR = 'data_artifacts'
@@ -41,7 +42,8 @@ FEATURES = ['Date', 'HomeTeam', 'AwayTeam', 'FTR',
             'big_chances_Diff', 'big_chances_missed_Diff', 'xg_open_play_Diff', 'xg_set_play_Diff', 'non_penalty_Diff', 
             'xg_on_targetot_Diff', 'touches_in_opposition_box_Diff']
 
-def save_model_artifacts(xgb_model: Any, rfr_home: Any, rfr_away: Any, scaler: StandardScaler, output_dir: str = OUTPUT_ARTIFACTS_DIR):
+def save_model_artifacts(xgb_model: Any, rfr_home: Any, rfr_away: Any, scaler: StandardScaler, output_dir: str = OUTPUT_ARTIFACTS_DIR,
+                         training_metadata: Optional[Dict[str, Any]] = None):
     print("="*156)
     print("="*156)
     print(f"\n{" "*60}SAVING ALL THE MODEL ARTIFACTS NOW!\n")
@@ -56,6 +58,10 @@ def save_model_artifacts(xgb_model: Any, rfr_home: Any, rfr_away: Any, scaler: S
         print("RFR Away model saved successfully!\n")
         joblib.dump(scaler, os.path.join(output_dir, 'scaler1.joblib'))
         print("Scaler saved successfully!\n")
+        if training_metadata is not None:
+            with open(os.path.join(output_dir, 'model_metadata.json'), 'w') as f:
+                json.dump(training_metadata, f, indent=2)
+            print("Training metadata saved successfully!\n")
     except Exception as e:
         print(f"Error: {e}\n")
     print(f"{" "*53}ALL THE MODEL ARTIFACTS HAVE BEEN SAVED SUCCESSFULLY!\n")
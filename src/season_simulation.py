@@ -0,0 +1,170 @@
+import time
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Tuple
+
+from src import live_feature_calculation as live
+
+# -----------------------------
+# Configuration
+# -----------------------------
+DEFAULT_SIMULATIONS = 100_000
+DEFAULT_SEED = 42               # fixed by default so repeated requests hit the cache
+SIMULATION_CHUNK = 10_000       # seasons sampled and ranked per block, memory is O(SIMULATION_CHUNK) whatever n_sims is
+MAX_GOALS = 10                  # same truncation as regression_to_outcome_prob
+TOP_N = 4
+RELEGATION_SPOTS = 3
+CACHE_SIZE = 8
+
+_SIMULATION_CACHE: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+
+
+# accepts the master data, returns the current season's clubs and their table so far
+# (points, goal difference, goals for, matches played) plus the set of fixtures already played
+def current_standings(df: pd.DataFrame) -> Tuple[List[str], Dict[str, np.ndarray], set]:
+    season = df['season'].max()
+    played = df[df['season'] == season]
+    clubs = sorted(set(played['HomeTeam']) | set(played['AwayTeam']))
+    club_idx = {club: i for i, club in enumerate(clubs)}
+
+    h = played['HomeTeam'].map(club_idx).to_numpy()
+    a = played['AwayTeam'].map(club_idx).to_numpy()
+    hg = played['FTHG'].to_numpy(dtype=np.int64)
+    ag = played['FTAG'].to_numpy(dtype=np.int64)
+    h_pts = np.where(hg > ag, 3, np.where(hg == ag, 1, 0))
+    a_pts = np.where(ag > hg, 3, np.where(hg == ag, 1, 0))
+
+    n = len(clubs)
+    table = {
+        'points': np.bincount(h, h_pts, n) + np.bincount(a, a_pts, n),
+        'goal_difference': np.bincount(h, hg - ag, n) + np.bincount(a, ag - hg, n),
+        'goals_for': np.bincount(h, hg, n) + np.bincount(a, ag, n),
+        'played': np.bincount(h, minlength=n) + np.bincount(a, minlength=n),
+    }
+    table = {k: v.astype(np.int64) for k, v in table.items()}
+    played_pairs = set(zip(played['HomeTeam'], played['AwayTeam']))
+    return clubs, table, played_pairs
+
+
+# accepts the clubs and the fixtures already played, returns the rest of the double round-robin
+def remaining_fixtures(clubs: List[str], played_pairs: set) -> List[Tuple[str, str]]:
+    return [(h, a) for h in clubs for a in clubs if h != a and (h, a) not in played_pairs]
+
+
+def _goal_cdfs(lambdas: np.ndarray) -> np.ndarray:
+    # per-fixture CDF of the truncated Poisson goal distribution, renormalised so the last entry is exactly 1
+    pmf = live.poisson_pmf(lambdas, MAX_GOALS)
+    cdf = np.cumsum(pmf / pmf.sum(axis=1, keepdims=True), axis=1)
+    cdf[:, -1] = 1.0
+    return cdf
+
+
+# accepts the current table, the remaining fixtures (as club indices) and their goal rates
+# yields the final points, goal difference and goals for of the simulated seasons block by block, shape (block, n_clubs)
+def sample_seasons(table: Dict[str, np.ndarray], home_idx: np.ndarray, away_idx: np.ndarray,
+                   home_xg: np.ndarray, away_xg: np.ndarray, n_sims: int, rng: np.random.Generator) -> Iterator[Dict[str, np.ndarray]]:
+    n_clubs = len(table['points'])
+    n_fixtures = len(home_idx)
+    home_cdf, away_cdf = _goal_cdfs(home_xg), _goal_cdfs(away_xg)
+
+    # incidence matrices turn per-fixture results into per-club totals with one matrix product
+    home_inc = np.zeros((n_fixtures, n_clubs))
+    away_inc = np.zeros((n_fixtures, n_clubs))
+    home_inc[np.arange(n_fixtures), home_idx] = 1.0
+    away_inc[np.arange(n_fixtures), away_idx] = 1.0
+
+    for start in range(0, n_sims, SIMULATION_CHUNK):
+        stop = min(start + SIMULATION_CHUNK, n_sims)
+        size = stop - start
+        # inverse-CDF sampling of both scores of every fixture in every season of the block
+        hg = (rng.random((size, n_fixtures, 1)) > home_cdf[None, :, :-1]).sum(axis=2).astype(np.float64)
+        ag = (rng.random((size, n_fixtures, 1)) > away_cdf[None, :, :-1]).sum(axis=2).astype(np.float64)
+        h_pts = np.where(hg > ag, 3.0, np.where(hg == ag, 1.0, 0.0))
+        a_pts = np.where(ag > hg, 3.0, np.where(hg == ag, 1.0, 0.0))
+
+        yield {
+            'points': table['points'] + np.rint(h_pts @ home_inc + a_pts @ away_inc).astype(np.int64),
+            'goal_difference': table['goal_difference'] + np.rint((hg - ag) @ home_inc + (ag - hg) @ away_inc).astype(np.int64),
+            'goals_for': table['goals_for'] + np.rint(hg @ home_inc + ag @ away_inc).astype(np.int64),
+        }
+
+
+# accepts the simulated season totals, returns the final position (0 = champions) of every club in every season
+# ordering: points, then goal difference, then goals for, remaining ties split at random
+def rank_seasons(seasons: Dict[str, np.ndarray], rng: np.random.Generator) -> np.ndarray:
+    points, goal_diff, goals_for = seasons['points'], seasons['goal_difference'], seasons['goals_for']
+    key = (points * 1_000_000 + (goal_diff + 500) * 1_000 + goals_for).astype(np.float64)
+    key += rng.random(key.shape)
+    order = np.argsort(-key, axis=1)
+    positions = np.empty_like(order)
+    np.put_along_axis(positions, order, np.arange(order.shape[1])[None, :], axis=1)
+    return positions
+
+
+# main function!
+# accepts the number of seasons to simulate and a seed
+# returns the projected table with title / top-4 / relegation odds and expected points of every club
+def simulate_season(n_sims: int = DEFAULT_SIMULATIONS, seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    live.load_model_once()
+    live.load_data_once()
+    with live.ARTIFACT_LOCK.reading():
+        cache_key = (live.get_artifact_version(), n_sims, seed)
+        if cache_key in _SIMULATION_CACHE:
+            _SIMULATION_CACHE.move_to_end(cache_key)
+            return _SIMULATION_CACHE[cache_key]
+
+        start = time.perf_counter()
+        clubs, table, played_pairs = current_standings(live.MAIN_DF)
+        fixtures = remaining_fixtures(clubs, played_pairs)
+        # the per-fixture scoreline distributions come from one batched pass through the regressors
+        home_xg, away_xg = live.predict_goal_rates(fixtures) if fixtures else (np.zeros(0), np.zeros(0))
+        version = live.get_artifact_version()
+
+    club_idx = {club: i for i, club in enumerate(clubs)}
+    home_idx = np.array([club_idx[h] for h, _ in fixtures], dtype=np.int64)
+    away_idx = np.array([club_idx[a] for _, a in fixtures], dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    n_clubs = len(clubs)
+    # every block is ranked as soon as it is sampled, only per-club sums and position counts are kept
+    position_counts = np.zeros((n_clubs, n_clubs), dtype=np.int64)
+    points_sum = np.zeros(n_clubs)
+    goal_diff_sum = np.zeros(n_clubs)
+    position_sum = np.zeros(n_clubs)
+    club_offsets = np.arange(n_clubs)[None, :] * n_clubs
+    for block in sample_seasons(table, home_idx, away_idx, home_xg, away_xg, n_sims, rng):
+        positions = rank_seasons(block, rng)
+        position_counts += np.bincount((club_offsets + positions).ravel(), minlength=n_clubs * n_clubs).reshape(n_clubs, n_clubs)
+        points_sum += block['points'].sum(axis=0)
+        goal_diff_sum += block['goal_difference'].sum(axis=0)
+        position_sum += positions.sum(axis=0)
+    position_probs = position_counts / n_sims
+    projected = []
+    for i, club in enumerate(clubs):
+        projected.append({
+            "club": club,
+            "played": int(table['played'][i]),
+            "points": int(table['points'][i]),
+            "expected_points": float(points_sum[i] / n_sims),
+            "expected_goal_difference": float(goal_diff_sum[i] / n_sims),
+            "expected_position": float(position_sum[i] / n_sims + 1),
+            "title_probability": float(position_probs[i, 0]),
+            "top4_probability": float(position_probs[i, :TOP_N].sum()),
+            "relegation_probability": float(position_probs[i, n_clubs - RELEGATION_SPOTS:].sum()),
+            "position_probabilities": position_probs[i].round(6).tolist(),
+        })
+    projected.sort(key=lambda row: (-row["expected_points"], row["expected_position"]))
+
+    result = {
+        "model_version": version,
+        "simulations": n_sims,
+        "seed": seed,
+        "remaining_fixtures": len(fixtures),
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+        "table": projected,
+    }
+    _SIMULATION_CACHE[(version, n_sims, seed)] = result
+    while len(_SIMULATION_CACHE) > CACHE_SIZE:
+        _SIMULATION_CACHE.popitem(last=False)
+    return result
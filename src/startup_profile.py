@@ -0,0 +1,81 @@
+import os
+import sys
+import subprocess
+from typing import Dict, List, Tuple
+
+# -----------------------------
+# Configuration
+# -----------------------------
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_MODULE = 'api.main'
+RUNS = 5
+TOP_N = 15
+# after the startup event, background threads it started get this long to import whatever they import
+STARTUP_SETTLE_SECONDS = 2.0
+# none of these may be imported before the first request that needs them
+DEFERRED_MODULES = ['numpy', 'pandas', 'sklearn', 'xgboost', 'joblib', 'src.live_feature_calculation', 'src.stats_data_loader']
+
+
+# the startup a server runs: import the module, then its app's startup event (lifespan), then let its threads settle
+STARTUP_CODE = """
+import asyncio, sys, time, {module} as startup_module
+async def start():
+    async with startup_module.app.router.lifespan_context(startup_module.app):
+        pass
+asyncio.run(start())
+time.sleep({settle})
+print(','.join(sorted(sys.modules)))
+"""
+
+
+# accepts the module to import, returns the -X importtime report of one fresh interpreter (import + startup event)
+# {module: (self µs, cumulative µs)} in import order, plus the set of every module it imported
+def profile_import(module: str) -> Tuple[Dict[str, Tuple[int, int]], set]:
+    code = STARTUP_CODE.format(module=module, settle=STARTUP_SETTLE_SECONDS)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT_DIR,
+                          capture_output=True, text=True, check=True)
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings, set(proc.stdout.strip().split(','))
+
+
+# accepts the reports of several runs, returns the median cumulative time per module (largest first)
+def median_cumulative(runs: List[Dict[str, Tuple[int, int]]]) -> List[Tuple[str, float]]:
+    medians = {}
+    for name in runs[0]:
+        values = sorted(run[name][1] for run in runs if name in run)
+        medians[name] = values[len(values) // 2] / 1000.0
+    return sorted(medians.items(), key=lambda item: item[1], reverse=True)
+
+
+# main function!
+def run_startup_profile(module: str = STARTUP_MODULE, runs: int = RUNS, top_n: int = TOP_N) -> bool:
+    reports, imported = [], set()
+    for _ in range(runs):
+        timings, modules = profile_import(module)
+        reports.append(timings)
+        imported |= modules
+    ranked = median_cumulative(reports)
+    total = dict(ranked)[module]
+
+    print("="*156)
+    print(f"Import profile of {module} (median of {runs} fresh interpreters, startup event included): {total:.1f} ms")
+    print("="*156)
+    for name, ms in ranked[:top_n]:
+        print(f"{name:<60} {ms:>10.1f} ms")
+
+    leaked = [m for m in DEFERRED_MODULES if m in imported]
+    print("="*156)
+    if leaked:
+        print(f"FAIL: imported at startup (import or startup event), should be deferred: {leaked}")
+    else:
+        print(f"OK: none of {DEFERRED_MODULES} imported at startup.")
+    return not leaked
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_startup_profile() else 1)
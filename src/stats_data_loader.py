@@ -94,6 +94,30 @@ def prepare_master_data(
     return final_master, final_master[basic_stats], final_master[rolling_features], required_cols
 
 
+# accepts one season's raw player-match rows, its players and its teams (players_25 is keyed per gameweek)
+# returns every player-match row, not only the goal contributions, with name, position and club: the basis of season totals
+def prepare_player_season_rows(
+    pms: pd.DataFrame,
+    players: pd.DataFrame,
+    teams: pd.DataFrame,
+    by_gameweek: bool
+) -> pd.DataFrame:
+    pms = pms.rename(columns={'Game Week': 'gameweek'}, errors='ignore')
+    players = players.rename(columns={'team_code': 'code', 'Game Week': 'gameweek'}, errors='ignore')
+    keys = ['player_id', 'gameweek'] if by_gameweek else ['player_id']
+    stat_cols = [c for c in ('goals', 'assists', 'xg', 'xa') if c in pms.columns]
+
+    rows = pms[['player_id', 'gameweek'] + stat_cols].merge(
+        players[keys + ['first_name', 'second_name', 'position', 'code']],
+        on=keys,
+        how='left',
+        validate='m:1'
+    )
+    rows = rows.merge(teams[['code', 'name']], on='code', how='left')
+    rows["player_name"] = (rows["first_name"] + " " + rows["second_name"])
+    return rows
+
+
 def prepare_players_match_data(
     pms_24: pd.DataFrame,
     pms_25: pd.DataFrame,
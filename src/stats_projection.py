@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from typing import Optional, Tuple
+
+PROJECTION_CACHE_SIZE = 256
+
+
+# accepts a comma separated field list, returns it without blanks and duplicates ("," or " " select nothing: None)
+def normalize_fields(fields: Optional[str]) -> Optional[str]:
+    selected = list(dict.fromkeys(f.strip() for f in (fields or "").split(",") if f.strip()))
+    return ",".join(selected) if selected else None
+
+
+# accepts a frame's columns and a comma separated field list ("HomeTeam,FTHG"; None or no field names = every column)
+# returns the positions and names of the requested columns, resolved once per (columns, fields) and cached
+@lru_cache(maxsize=PROJECTION_CACHE_SIZE)
+def resolve_projection(columns: Tuple[str, ...], fields: Optional[str]) -> Tuple[Tuple[int, ...], Tuple[str, ...]]:
+    fields = normalize_fields(fields)
+    if fields is None:
+        return tuple(range(len(columns))), columns
+    selected = fields.split(",")
+    position = {name: i for i, name in enumerate(columns)}
+    unknown = [f for f in selected if f not in position]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}")
+    return tuple(position[f] for f in selected), tuple(selected)
+
+
+# accepts a frame, the positions of the matching rows, the field list and the page (cursor = offset, limit = page size)
+# returns the rows of the page with only the requested columns, and the cursor of the next page (None on the last)
+def project_page(df: pd.DataFrame, rows: np.ndarray, fields: Optional[str] = None, cursor: int = 0,
+                 limit: Optional[int] = None) -> Tuple[pd.DataFrame, Optional[int]]:
+    positions, _ = resolve_projection(tuple(df.columns), fields)
+    stop = len(rows) if limit is None else min(cursor + limit, len(rows))
+    page = df.iloc[rows[cursor:stop], list(positions)]
+    return page, (stop if stop < len(rows) else None)
+
+
+# accepts a frame, one row position and the field list, returns that row (as a one-row frame) with only the requested columns
+def project_row(df: pd.DataFrame, row: int, fields: Optional[str] = None) -> pd.DataFrame:
+    positions, _ = resolve_projection(tuple(df.columns), fields)
+    return df.iloc[[row], list(positions)]
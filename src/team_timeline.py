@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+# timeline field -> (home-side column, away-side column) of the stats master
+# a team's value is read from its own side, the opponent's from the other side
+TIMELINE_FIELDS = {
+    'goals_for': ('FTHG', 'FTAG'),
+    'goals_against': ('FTAG', 'FTHG'),
+    'xg': ('home_expected_goals_xg', 'away_expected_goals_xg'),
+    'xg_against': ('away_expected_goals_xg', 'home_expected_goals_xg'),
+    'possession': ('home_possession', 'away_possession'),
+    'elo': ('ht_match_elo', 'at_match_elo'),
+    'goals_for_l5': ('HT_AvgGF_L5', 'AT_AvgGF_L5'),
+    'goals_against_l5': ('HT_AvgGA_L5', 'AT_AvgGA_L5'),
+    'win_rate_l5': ('HT_WinRate_L5', 'AT_WinRate_L5'),
+}
+# always returned, whatever the projection
+KEY_FIELDS = ['date', 'season', 'gameweek', 'opponent', 'venue']
+
+
+# accepts the stats master (plus optional extra columns such as the match Elos, aligned on its index)
+# returns {team: {field: np.ndarray}}, every team's matches in chronological order, unpivoted from home/away
+def build_team_timelines(stats_master: pd.DataFrame, extra: Optional[pd.DataFrame] = None) -> Dict[str, Dict[str, np.ndarray]]:
+    df = stats_master if extra is None else stats_master.join(extra[[c for c in extra.columns if c not in stats_master.columns]])
+    n = len(df)
+    home, away = df['HomeTeam'].to_numpy(), df['AwayTeam'].to_numpy()
+    dates = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d').to_numpy()
+
+    columns = {
+        'team': np.concatenate([home, away]),
+        'date': np.concatenate([dates, dates]),
+        'season': np.tile(df['season'].to_numpy(), 2),
+        'gameweek': np.tile(df['gameweek'].to_numpy(), 2),
+        'opponent': np.concatenate([away, home]),
+        'venue': np.repeat(np.array(['H', 'A']), n),
+    }
+    for field, (home_col, away_col) in TIMELINE_FIELDS.items():
+        if home_col in df.columns and away_col in df.columns:
+            columns[field] = np.concatenate([df[home_col].to_numpy(dtype=np.float64), df[away_col].to_numpy(dtype=np.float64)])
+        else:
+            columns[field] = np.full(2 * n, np.nan)
+
+    codes, teams = pd.factorize(columns['team'])
+    order = np.lexsort((columns['date'], codes))
+    bounds = np.r_[0, np.cumsum(np.bincount(codes, minlength=len(teams)))]
+
+    timelines = {}
+    for code, team in enumerate(teams):
+        rows = order[bounds[code]:bounds[code + 1]]
+        timelines[team] = {field: values[rows] for field, values in columns.items() if field != 'team'}
+    return timelines
+
+
+# accepts a team's timeline, an optional season, a projection and a maximum number of points
+# returns the columnar series (NaN -> None), evenly downsampled when longer than max_points (the latest match is always kept)
+def slice_timeline(timeline: Dict[str, np.ndarray], season: Optional[int] = None, fields: Optional[List[str]] = None,
+                   max_points: Optional[int] = None) -> Dict[str, List[Any]]:
+    start, stop = 0, len(timeline['season'])
+    if season is not None:
+        # matches are chronological, so a season is one contiguous block
+        start = int(np.searchsorted(timeline['season'], season, side='left'))
+        stop = int(np.searchsorted(timeline['season'], season, side='right'))
+    positions = np.arange(start, stop)
+    if max_points is not None and len(positions) > max_points:
+        positions = positions[np.unique(np.linspace(0, len(positions) - 1, max_points).round().astype(np.int64))]
+
+    selected = KEY_FIELDS + [f for f in (fields if fields is not None else TIMELINE_FIELDS) if f not in KEY_FIELDS]
+    series = {}
+    for field in selected:
+        values = timeline[field][positions]
+        if values.dtype.kind == 'f':
+            series[field] = [None if np.isnan(v) else round(float(v), 4) for v in values]
+        else:
+            series[field] = values.tolist()
+    return series
@@ -0,0 +1,103 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from src import live_feature_calculation as live
+from src import backtest
+from src.feature_plan import compile_feature_plan
+
+TEAMS = ['Arsenal', 'Chelsea', 'Everton', 'Fulham']
+FEATURES = ['form_Diff', 'Stat', 'Elo_Gap_Diff', 'Season_Class_Diff', 'Rest_Days_Diff']
+
+
+# accepts a seed, returns a small MAIN_DF (sorted by Date) with two fixtures a day over 30 match days,
+# long enough for HISTORY_WINDOW to cut every team's history; on one day Arsenal plays twice
+def synthetic_main_df(seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    fixtures = []
+    for day in range(30):
+        date = pd.Timestamp('2024-08-01') + pd.Timedelta(days=3 * day + int(rng.integers(0, 2)))
+        home_a, away_a, home_b, away_b = rng.permutation(TEAMS)
+        fixtures += [(date, home_a, away_a, day), (date, home_b, away_b, day)]
+        if day == 20:
+            fixtures.append((date, 'Arsenal', 'Everton' if 'Everton' not in (home_a, away_a) else 'Chelsea', day))
+    df = pd.DataFrame(fixtures, columns=['Date', 'HomeTeam', 'AwayTeam', 'gameweek'])
+    n = len(df)
+    df['season'] = np.where(df['gameweek'] < 15, 2024, 2025)
+    for prefix in ('HT_', 'AT_'):
+        df[f'{prefix}elo'] = rng.normal(1600, 120, n)
+        df[f'{prefix}Avg_Opponent_Elo_L5'] = rng.normal(1550, 60, n)
+        df[f'{prefix}expected_goals'] = rng.gamma(2.0, 0.7, n)
+        df[f'{prefix}form'] = rng.normal(1.5, 0.8, n)
+        df[f'{prefix}Stat'] = rng.normal(50, 10, n)
+    return df.sort_values('Date', kind='stable').reset_index(drop=True)
+
+
+# the definition the replay has to match: restrict MAIN_DF to the matches played before `day`,
+# then build the team's state from its last HISTORY_WINDOW matches
+def naive_state(df: pd.DataFrame, team: str, day: pd.Timestamp, plan):
+    before = np.flatnonzero(((df['HomeTeam'] == team) | (df['AwayTeam'] == team)).to_numpy() & (df['Date'] < day).to_numpy())
+    rows = before[-backtest.HISTORY_WINDOW:]
+    return rows, live.team_state_from_rows(rows, (df['HomeTeam'].to_numpy()[rows] == team), plan)
+
+
+class BacktestReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = (live.MAIN_DF, live.FEATURE_PLAN)
+        self.df = synthetic_main_df()
+        self.plan = compile_feature_plan(FEATURES, self.df)
+        live.MAIN_DF, live.FEATURE_PLAN = self.df, self.plan
+
+    def tearDown(self):
+        live.MAIN_DF, live.FEATURE_PLAN = self.saved
+
+    def assertSameState(self, state, expected):
+        self.assertEqual(state.keys(), expected.keys())
+        for key in state:
+            np.testing.assert_array_equal(np.asarray(state[key]), np.asarray(expected[key]), err_msg=key)
+
+    def test_states_exclude_same_day_and_later_matches(self):
+        history = backtest.TeamHistory(self.df)
+        checked = 0
+        for day, positions in backtest.date_batches(self.df):
+            for team in dict.fromkeys(np.r_[self.df['HomeTeam'].to_numpy()[positions], self.df['AwayTeam'].to_numpy()[positions]]):
+                if history.count(team) == 0:
+                    continue
+                rows = np.array(history.rows[team][-backtest.HISTORY_WINDOW:])
+                self.assertTrue((self.df['Date'].to_numpy()[rows] < day.to_datetime64()).all())
+                expected_rows, expected = naive_state(self.df, team, day, self.plan)
+                np.testing.assert_array_equal(rows, expected_rows)
+                self.assertSameState(history.state(team, self.plan, day), expected)
+                checked += 1
+            history.append(positions)
+        self.assertGreater(checked, 100)
+
+    def test_replayed_features_match_the_date_filtered_definition(self):
+        X, meta = backtest.replay_features(self.df, self.plan)
+        self.assertEqual(len(X), len(meta))
+        dates = self.df['Date']
+        for features, pos in zip(X, meta['row']):
+            day, home, away = dates[pos], self.df['HomeTeam'][pos], self.df['AwayTeam'][pos]
+            h_state, a_state = naive_state(self.df, home, day, self.plan)[1], naive_state(self.df, away, day, self.plan)[1]
+            np.testing.assert_array_equal(features, live.assemble_feature_matrix([h_state], [a_state], day)[0])
+        # the three fixtures of the day Arsenal plays twice are replayed together, none sees the others
+        arsenal = self.df[(self.df['HomeTeam'] == 'Arsenal') | (self.df['AwayTeam'] == 'Arsenal')]
+        double_day = arsenal['Date'][arsenal['Date'].duplicated()].iloc[0]
+        self.assertEqual(int((dates[meta['row']] == double_day).sum()), 3)
+
+    def test_leaking_state_is_rejected(self):
+        history = backtest.TeamHistory(self.df)
+        batches = backtest.date_batches(self.df)
+        for _, positions in batches[:5]:
+            history.append(positions)
+        day, positions = batches[5]
+        # a same-day result forged into the history
+        history.append(positions)
+        team = self.df['HomeTeam'][positions[0]]
+        with self.assertRaises(RuntimeError):
+            history.state(team, self.plan, day)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.frame_json import DataFrameJSONResponse
+
+
+# the encoding the stats endpoints used before: records through jsonable_encoder and the stock JSONResponse
+# (which rejects NaN, so missing cells go in as None, the null DataFrameJSONResponse writes for them)
+def stock_records(df: pd.DataFrame) -> bytes:
+    records = df.astype(object).where(df.notna(), None).to_dict(orient="records")
+    return JSONResponse(jsonable_encoder(records)).body
+
+
+def stock_row(df: pd.DataFrame) -> bytes:
+    row = df.iloc[0].astype(object).where(df.iloc[0].notna(), None).to_dict()
+    return JSONResponse(jsonable_encoder(row)).body
+
+
+# inf has no JSON form either: DataFrameJSONResponse writes null, the stock encoder would raise as on NaN
+def without_inf(df: pd.DataFrame) -> pd.DataFrame:
+    floats = df.select_dtypes("float").columns
+    return df.assign(**{col: df[col].replace([np.inf, -np.inf], np.nan) for col in floats})
+
+
+def sample_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "match_id": np.array([1, 2, 3], dtype=np.int64),
+        "gameweek": np.array([1, 38, 7], dtype=np.int32),
+        "finished": np.array([True, False, True]),
+        "xg": [1.25, np.nan, 0.1 + 0.2],
+        "rate": [np.inf, 2.0, -0.0],
+        "Date": pd.to_datetime(["2024-08-16 19:00:00", None, "2025-05-25 15:00:00"]),
+        "HomeTeam": ["Man United", "Nott'm Forest", None],
+        "Referee": ["A. Taylor", "Ø. \"Quote\" Ünal", np.nan],
+        "mixed": [1, "two", 3.5],
+    })
+
+
+class DataFrameJSONResponseTest(unittest.TestCase):
+
+    def test_records_match_stock_encoding(self):
+        df = sample_frame()
+        self.assertEqual(DataFrameJSONResponse(df).body, stock_records(without_inf(df)))
+
+    def test_single_row_matches_stock_encoding(self):
+        df = sample_frame()
+        for i in range(len(df)):
+            row = df.iloc[[i]]
+            self.assertEqual(DataFrameJSONResponse(row, single_row=True).body, stock_row(without_inf(row)))
+
+    def test_projection_and_empty_frame(self):
+        df = sample_frame()[["HomeTeam", "xg"]]
+        self.assertEqual(DataFrameJSONResponse(df).body, stock_records(df))
+        self.assertEqual(DataFrameJSONResponse(df.iloc[:0]).body, b"[]")
+
+    def test_missing_cells_are_null(self):
+        body = DataFrameJSONResponse(sample_frame().iloc[[1]], single_row=True).body
+        self.assertIn(b'"xg":null', body)
+        self.assertIn(b'"Date":null', body)
+        self.assertEqual(DataFrameJSONResponse(sample_frame()).media_type, "application/json")
+
+
+if __name__ == "__main__":
+    unittest.main()